@@ -0,0 +1,235 @@
+"""
+Sync / generate benchmarks against the local stand-in Spotify server.
+
+Runs a full sync, an incremental sync after changing part of the library,
+sampling over the synced tracks and a batch playlist generation, and
+reports wall time, requests, bytes received and Python peak memory for
+each one:
+
+    python benchmarks/bench.py --playlists 50 --tracks 400 --latency 0.05
+    python benchmarks/bench.py --error-429 0.02 --error-5xx 0.02 --json out.json
+
+Requests and bytes are counted by the server. Peak memory is the tracemalloc
+peak of this process (the server runs in its own), which slows the code
+under test somewhat; pass --no-memory for pure timings.
+"""
+
+import argparse
+import json
+import logging
+import os
+import sys
+import tempfile
+import time
+import tracemalloc
+import urllib.request
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import songs_roulette as sr  # noqa: E402
+from fake_spotify import add_library_arguments, server_options, start  # noqa: E402
+from spotipy import Spotify  # noqa: E402
+
+BENCH_CREDS = sr.SpotifyCreds("bench", "bench", "http://127.0.0.1/callback")
+
+
+class _StaticToken:
+    """auth_manager for the stand-in server: a fixed token, never refreshed."""
+
+    class cache_handler:
+        @staticmethod
+        def get_cached_token():
+            return None
+
+    def get_access_token(self, as_dict=False):
+        return "bench"
+
+
+def _control(base_url: str, name: str, payload: dict = None) -> dict:
+    """Call one of the server's control endpoints (/_stats, /_reset, /_mutate)."""
+    url = base_url[: -len("v1/")] + name
+    data = None if payload is None else json.dumps(payload).encode()
+    with urllib.request.urlopen(urllib.request.Request(url, data=data)) as resp:
+        return json.loads(resp.read() or b"{}")
+
+
+def _connect(base_url: str):
+    """Point the shared session at the stand-in server."""
+    sp = Spotify(auth_manager=_StaticToken(), requests_session=sr._make_session())
+    sp.prefix = base_url
+    sr.SPOTIFY_SESSION.use(BENCH_CREDS, sp)
+
+
+def _measure(name: str, base_url, fn, args) -> dict:
+    """Run `fn()` with fresh limiter and server counters; return its numbers."""
+    sr.API_LIMITER = sr.RateLimiter(max_rate=args.rate)
+    if base_url:
+        _control(base_url, "_reset", {})
+    if not args.no_memory:
+        tracemalloc.start()
+    start = time.perf_counter()
+    detail = fn()
+    elapsed = time.perf_counter() - start
+    peak = None
+    if not args.no_memory:
+        peak = tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+    row = {"benchmark": name, "seconds": round(elapsed, 3), "peak_mib": None}
+    if peak is not None:
+        row["peak_mib"] = round(peak / 2**20, 1)
+    if base_url:
+        stats = _control(base_url, "_stats")
+        row.update(
+            requests=stats["requests"],
+            bytes=stats["bytes_out"],
+            connections=stats["connections"],
+            injected=stats["injected"],
+            by_endpoint=stats["by_endpoint"],
+        )
+        row["throttle_events"] = sr.API_LIMITER.stats()["throttle_events"]
+    if detail:
+        row.update(detail)
+    return row
+
+
+def run(args) -> list:
+    """Run every benchmark; return one result dict per benchmark."""
+    proc, base_url = start(**server_options(args))
+    workdir = tempfile.mkdtemp(prefix="songs-roulette-bench-")
+    results = []
+    try:
+        _connect(base_url)
+        store_path = os.path.join(
+            workdir,
+            {"json": sr.DATA_JSON, "packed": sr.DATA_PACK, "sqlite": sr.SQLITE_DB}[
+                args.storage
+            ],
+        )
+        store_cls = {
+            "json": sr.JsonStore,
+            "packed": sr.PackedStore,
+            "sqlite": sr.SqliteStore,
+        }[args.storage]
+
+        def sync(incremental, use_async=False):
+            def go():
+                store = store_cls(store_path)
+                sr.SyncJob(
+                    "en",
+                    BENCH_CREDS,
+                    store,
+                    incremental=incremental,
+                    workers=args.workers,
+                    use_async=use_async,
+                ).run()
+                return {"tracks": sum(n for _, _, n in store.playlist_summaries())}
+
+            return go
+
+        results.append(_measure("full sync", base_url, sync(False), args))
+        if args.use_async:
+            results.append(
+                _measure("full sync (async)", base_url, sync(False, True), args)
+            )
+        _control(
+            base_url, "_mutate", {"playlists": args.mutate, "liked": args.mutate_liked}
+        )
+        results.append(_measure("incremental sync", base_url, sync(True), args))
+
+        store = store_cls(store_path)
+        tracks = [t for _, t in store.iter_tracks()]
+
+        def sampling():
+            for mode in sr.SAMPLE_MODES[:3]:
+                sr.sample_playlists(
+                    tracks, args.generate_n, args.generate_playlists, mode=mode
+                )
+            return {"candidates": len(tracks)}
+
+        results.append(_measure("sampling x3 modes", None, sampling, args))
+
+        source = next(pid for pid, _, _ in store.playlist_summaries())
+
+        def generate(use_async=False):
+            def go():
+                result = sr.GenerateJob(
+                    "en",
+                    BENCH_CREDS,
+                    source,
+                    args.generate_n,
+                    "bench",
+                    store.playlist_tracks(source),
+                    playlists=args.generate_playlists,
+                    use_async=use_async,
+                ).run()
+                return {"created": len(result["playlists"])}
+
+            return go
+
+        results.append(_measure("generate playlists", base_url, generate(), args))
+        if args.use_async:
+            results.append(
+                _measure("generate playlists (async)", base_url, generate(True), args)
+            )
+    finally:
+        sr.SPOTIFY_SESSION.reset()
+        proc.terminate()
+        proc.join()
+    return results
+
+
+def _report(results: list):
+    cols = ("benchmark", "seconds", "requests", "bytes", "peak_mib", "throttle_events")
+    rows = [
+        [str(r.get(c, "-") if r.get(c) is not None else "-") for c in cols]
+        for r in results
+    ]
+    widths = [max(len(c), *(len(row[i]) for row in rows)) for i, c in enumerate(cols)]
+    print("  ".join(c.ljust(w) for c, w in zip(cols, widths)))
+    for row in rows:
+        print("  ".join(v.ljust(w) for v, w in zip(row, widths)))
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    add_library_arguments(parser)
+    parser.add_argument(
+        "--storage", choices=("json", "packed", "sqlite"), default="json"
+    )
+    parser.add_argument("--workers", type=int, default=sr.SYNC_WORKERS)
+    parser.add_argument(
+        "--async",
+        dest="use_async",
+        action="store_true",
+        help="also time the asyncio sync and generation",
+    )
+    parser.add_argument(
+        "--rate",
+        type=float,
+        default=sr.API_MAX_REQUESTS_PER_SECOND,
+        help="API_LIMITER requests/s",
+    )
+    parser.add_argument(
+        "--mutate",
+        type=float,
+        default=0.1,
+        help="share of playlists changed before the incremental sync",
+    )
+    parser.add_argument("--mutate-liked", type=int, default=20)
+    parser.add_argument("-n", "--generate-n", type=int, default=200)
+    parser.add_argument("--generate-playlists", type=int, default=3)
+    parser.add_argument("--no-memory", action="store_true", help="skip tracemalloc")
+    parser.add_argument("--json", metavar="PATH", help="also write the results here")
+    args = parser.parse_args(argv)
+
+    # Los errores inyectados no deben ensuciar la salida
+    logging.getLogger("spotipy").setLevel(logging.CRITICAL)
+    results = run(args)
+    _report(results)
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,495 @@
+"""
+Local stand-in for the parts of the Spotify Web API that Songs Roulette uses.
+
+Serves a synthetic library (playlists, Liked Songs) with configurable size,
+overlap between playlists, latency and injected 429/5xx errors, and counts
+requests and response bytes per endpoint. It runs in its own process so it
+does not share the GIL or the heap with the code being measured.
+
+    python benchmarks/fake_spotify.py --playlists 50 --tracks 400 --latency 0.05
+
+Control endpoints (not part of the Spotify API):
+    GET  /_stats    counters since the last reset
+    POST /_reset    zero the counters
+    POST /_mutate   {"playlists": 0.1, "liked": 20} change the library the way
+                    a user would between two syncs (new snapshot_ids, new
+                    saved tracks on top)
+"""
+
+import argparse
+import json
+import multiprocessing
+import random
+import re
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlsplit
+
+# ===========================
+# ---- CONFIG ----
+# ===========================
+# Mercados que se repiten en cada canción y álbum (como en la API real,
+# son buena parte del tamaño de cada respuesta)
+MARKETS = ["AR", "AU", "BR", "CA", "CL", "DE", "ES", "FR", "GB", "IT", "JP", "MX", "US"]
+RETRY_AFTER = 1  # Segundos indicados en la cabecera Retry-After de los 429
+USER_ID = "bench"
+
+
+# ===========================
+# ---- LIBRARY ----
+# ===========================
+def _id(kind: str, n: int) -> str:
+    """22-character base-62 id, as spotipy validates raw ids."""
+    return f"{kind}{n:0{22 - len(kind)}d}"
+
+
+def _track(n: int, rng: random.Random, artists: int, albums: int) -> dict:
+    """Spotify-shaped full track object."""
+    tid = _id("Track", n)
+    artist = rng.randrange(artists)
+    album = rng.randrange(albums)
+    return {
+        "id": tid,
+        "name": f"Track {n}",
+        "uri": f"spotify:track:{tid}",
+        "type": "track",
+        "duration_ms": rng.randrange(90_000, 420_000),
+        "popularity": rng.randrange(100),
+        "explicit": False,
+        "is_local": False,
+        "available_markets": MARKETS,
+        "external_urls": {"spotify": f"https://open.spotify.com/track/{tid}"},
+        "href": f"https://api.spotify.com/v1/tracks/{tid}",
+        "preview_url": None,
+        "artists": [
+            {
+                "id": _id("Artist", artist),
+                "name": f"Artist {artist}",
+                "type": "artist",
+                "uri": f"spotify:artist:{_id('Artist', artist)}",
+            }
+        ],
+        "album": {
+            "id": _id("Album", album),
+            "name": f"Album {album}",
+            "album_type": "album",
+            "available_markets": MARKETS,
+            "release_date": "2020-01-01",
+            "images": [
+                {"url": f"https://i.scdn.co/image/{album}", "height": 640, "width": 640}
+            ],
+        },
+    }
+
+
+class Library:
+    """
+    Synthetic user library. Each playlist takes `overlap` of its tracks from
+    a shared pool (so the same songs appear in several playlists) and the
+    rest from tracks of its own.
+    """
+
+    def __init__(
+        self,
+        playlists: int = 20,
+        tracks: int = 300,
+        liked: int = 1000,
+        overlap: float = 0.3,
+        artists: int = 2000,
+        albums: int = 4000,
+        seed: int = 0,
+    ):
+        self._rng = random.Random(seed)
+        self._artists = artists
+        self._albums = albums
+        self._next_track = 0
+        shared = [self._new_track() for _ in range(max(1, int(tracks * overlap)) * 3)]
+        self.playlists = {}
+        for i in range(playlists):
+            n_shared = min(int(tracks * overlap), len(shared))
+            items = self._rng.sample(shared, n_shared)
+            items += [self._new_track() for _ in range(tracks - n_shared)]
+            self._rng.shuffle(items)
+            self.playlists[_id("Playlist", i)] = {
+                "name": f"Playlist {i}",
+                "snapshot": 1,
+                "items": [self._item(t) for t in items],
+            }
+        # Más recientes primero, como devuelve me/tracks
+        self._clock = liked
+        self.liked = [
+            {"added_at": self._added_at(liked - k), "track": t}
+            for k, t in enumerate(self._new_track() for _ in range(liked))
+        ]
+        self.created = {}
+
+    def _new_track(self) -> dict:
+        track = _track(self._next_track, self._rng, self._artists, self._albums)
+        self._next_track += 1
+        return track
+
+    @staticmethod
+    def _item(track: dict) -> dict:
+        return {
+            "added_at": "2024-01-01T00:00:00Z",
+            "added_by": {"id": USER_ID, "type": "user"},
+            "is_local": False,
+            "track": track,
+        }
+
+    @staticmethod
+    def _added_at(tick: int) -> str:
+        return time.strftime(
+            "%Y-%m-%dT%H:%M:%SZ", time.gmtime(1_600_000_000 + tick * 60)
+        )
+
+    def mutate(self, playlists: float = 0.1, liked: int = 0):
+        """Add a few tracks to a share of the playlists and save `liked` new ones."""
+        ids = list(self.playlists)
+        for pid in self._rng.sample(ids, int(len(ids) * playlists)):
+            pl = self.playlists[pid]
+            pl["items"].extend(self._item(self._new_track()) for _ in range(5))
+            pl["snapshot"] += 1
+        for _ in range(liked):
+            self._clock += 1
+            self.liked.insert(
+                0, {"added_at": self._added_at(self._clock), "track": self._new_track()}
+            )
+
+
+# ===========================
+# ---- FIELDS FILTER ----
+# ===========================
+def parse_fields(spec: str) -> dict:
+    """
+    Parse a Spotify `fields` expression ("total,items(track(id,name))",
+    "tracks.total") into a nested dict; None leaves mean "whole value".
+    """
+    tree = {}
+    stack = [tree]
+    name = ""
+    for ch in spec + ",":
+        if ch in ",()":
+            if name:
+                node = stack[-1]
+                for part in name.split(".")[:-1]:
+                    node = node.setdefault(part, {})
+                last = name.split(".")[-1]
+                if ch == "(":
+                    stack.append(node.setdefault(last, {}))
+                else:
+                    node.setdefault(last, None)
+            elif ch == "(":
+                raise ValueError(f"bad fields expression: {spec}")
+            if ch == ")":
+                stack.pop()
+            name = ""
+        elif not ch.isspace():
+            name += ch
+    return tree
+
+
+def apply_fields(value, tree):
+    """Keep only the fields in `tree` (from parse_fields)."""
+    if tree is None:
+        return value
+    if isinstance(value, list):
+        return [apply_fields(v, tree) for v in value]
+    if isinstance(value, dict):
+        return {k: apply_fields(value[k], sub) for k, sub in tree.items() if k in value}
+    return value
+
+
+# ===========================
+# ---- SERVER ----
+# ===========================
+class FakeSpotify:
+    """Library + fault injection + counters, shared by the handler threads."""
+
+    def __init__(
+        self,
+        library: Library,
+        latency: float = 0.0,
+        error_429: float = 0.0,
+        error_5xx: float = 0.0,
+        retry_after: int = RETRY_AFTER,
+        seed: int = 0,
+    ):
+        self.library = library
+        self.latency = latency
+        self.error_429 = error_429
+        self.error_5xx = error_5xx
+        self.retry_after = retry_after
+        self._rng = random.Random(seed)
+        self.lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        with self.lock:
+            self.requests = {}
+            self.bytes_out = 0
+            self.bytes_in = 0
+            self.injected = {"429": 0, "5xx": 0}
+            self.connections = set()
+
+    def stats(self) -> dict:
+        with self.lock:
+            return {
+                "requests": sum(self.requests.values()),
+                "by_endpoint": dict(self.requests),
+                "bytes_out": self.bytes_out,
+                "bytes_in": self.bytes_in,
+                "injected": dict(self.injected),
+                "connections": len(self.connections),
+            }
+
+    def fault(self):
+        """Return an injected (status, headers) error, or None."""
+        with self.lock:
+            roll = self._rng.random()
+            if roll < self.error_429:
+                self.injected["429"] += 1
+                return 429, {"Retry-After": str(self.retry_after)}
+            if roll < self.error_429 + self.error_5xx:
+                self.injected["5xx"] += 1
+                return 502, {}
+        return None
+
+    # ---- API ----
+    def get(self, path: str, query: dict):
+        lib = self.library
+        limit = int(query.get("limit", 20))
+        offset = int(query.get("offset", 0))
+        if path in ("me", "me/"):
+            return 200, {"id": USER_ID, "display_name": USER_ID}
+        if path == "me/playlists":
+            items = [
+                {
+                    "id": pid,
+                    "name": pl["name"],
+                    "owner": {"id": USER_ID, "display_name": USER_ID},
+                    "snapshot_id": f"{pid}-{pl['snapshot']}",
+                    "tracks": {"total": len(pl["items"])},
+                }
+                for pid, pl in lib.playlists.items()
+            ]
+            return 200, self._page(items, limit, offset)
+        if path == "me/tracks":
+            return 200, self._page(lib.liked, limit, offset)
+        m = re.fullmatch(r"playlists/(\w+)(/tracks)?", path)
+        if m:
+            pid = m.group(1)
+            pl = lib.playlists.get(pid)
+            items = pl["items"] if pl else lib.created.get(pid)
+            if items is None:
+                return 404, {"error": {"status": 404, "message": "Not found."}}
+            if m.group(2):
+                body = self._page(items, limit, offset)
+            else:
+                body = {
+                    "id": pid,
+                    "name": pl["name"] if pl else pid,
+                    "tracks": self._page(items, 100, 0),
+                }
+            if query.get("fields"):
+                body = apply_fields(body, parse_fields(query["fields"]))
+            return 200, body
+        return 404, {"error": {"status": 404, "message": "Not found."}}
+
+    def post(self, path: str, query: dict, payload):
+        lib = self.library
+        if re.fullmatch(r"users/\w+/playlists", path):
+            with self.lock:
+                pid = _id("Created", len(lib.created))
+                lib.created[pid] = []
+            return 201, {"id": pid, "name": payload.get("name")}
+        m = re.fullmatch(r"playlists/(\w+)/tracks", path)
+        if m and m.group(1) in lib.created:
+            # spotipy manda la lista de URIs y ?position=; la API, {"uris", "position"}
+            if isinstance(payload, list):
+                payload = {"uris": payload, "position": query.get("position")}
+            with self.lock:
+                items = lib.created[m.group(1)]
+                pos = payload.get("position")
+                pos = len(items) if pos is None else int(pos)
+                if pos > len(items):
+                    return 400, {
+                        "error": {"status": 400, "message": "Index out of bounds"}
+                    }
+                items[pos:pos] = [
+                    self._item_for(uri) for uri in payload.get("uris", [])
+                ]
+            return 201, {"snapshot_id": f"{m.group(1)}-{len(items)}"}
+        return 404, {"error": {"status": 404, "message": "Not found."}}
+
+    @staticmethod
+    def _item_for(uri: str) -> dict:
+        return {"track": {"uri": uri}}
+
+    @staticmethod
+    def _page(items: list, limit: int, offset: int) -> dict:
+        return {
+            "href": None,
+            "items": items[offset : offset + limit],
+            "limit": limit,
+            "next": None if offset + limit >= len(items) else "next",
+            "offset": offset,
+            "previous": None,
+            "total": len(items),
+        }
+
+
+def make_handler(api: FakeSpotify):
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"  # keep-alive, como la API real
+
+        def log_message(self, *args):
+            pass
+
+        def _send(self, status: int, body, headers=None):
+            data = json.dumps(body).encode()
+            self.send_response(status)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(data)))
+            for k, v in (headers or {}).items():
+                self.send_header(k, v)
+            self.end_headers()
+            self.wfile.write(data)
+            with api.lock:
+                api.bytes_out += len(data)
+
+        def _route(self, method: str):
+            url = urlsplit(self.path)
+            query = {k: v[0] for k, v in parse_qs(url.query).items()}
+            length = int(self.headers.get("Content-Length") or 0)
+            raw = self.rfile.read(length) if length else b""
+            path = url.path
+            # Control del benchmark: sin latencia ni errores, no se cuenta
+            if path == "/_stats":
+                return self._send(200, api.stats())
+            if path == "/_reset":
+                api.reset()
+                return self._send(200, {})
+            if path == "/_mutate":
+                with api.lock:
+                    api.library.mutate(**json.loads(raw or b"{}"))
+                return self._send(200, {})
+
+            endpoint = re.sub(r"\w{22}", "{id}", path[len("/v1/") :])
+            with api.lock:
+                key = f"{method} {endpoint}"
+                api.requests[key] = api.requests.get(key, 0) + 1
+                api.bytes_in += len(raw)
+                api.connections.add(self.client_address)
+            if api.latency:
+                time.sleep(api.latency)
+            fault = api.fault()
+            if fault:
+                status, headers = fault
+                return self._send(
+                    status,
+                    {"error": {"status": status, "message": "injected"}},
+                    headers,
+                )
+            if method == "GET":
+                status, body = api.get(path[len("/v1/") :], query)
+            else:
+                status, body = api.post(
+                    path[len("/v1/") :], query, json.loads(raw or b"{}")
+                )
+            self._send(status, body)
+
+        def do_GET(self):
+            self._route("GET")
+
+        def do_POST(self):
+            self._route("POST")
+
+    return Handler
+
+
+class FakeSpotifyServer(ThreadingHTTPServer):
+    # AsyncSpotify abre hasta 16 conexiones de golpe (ASYNC_MAX_CONNECTIONS):
+    # con la cola de listen por defecto (5) los SYN que no caben se
+    # reintentan ~1 s después y el benchmark mediría al servidor, no al cliente
+    request_queue_size = 128
+    daemon_threads = True
+
+
+def serve(port: int = 0, ready=None, **options):
+    """
+    Build the library and serve it forever on 127.0.0.1:`port`. `ready`, a
+    multiprocessing connection, receives the base URL once listening.
+    """
+    library_keys = ("playlists", "tracks", "liked", "overlap", "seed")
+    library = Library(**{k: options.pop(k) for k in library_keys if k in options})
+    server = FakeSpotifyServer(
+        ("127.0.0.1", port), make_handler(FakeSpotify(library, **options))
+    )
+    url = f"http://127.0.0.1:{server.server_address[1]}/v1/"
+    if ready is not None:
+        ready.send(url)
+        ready.close()
+    else:
+        print(url, flush=True)
+    server.serve_forever()
+
+
+def start(**options):
+    """Run serve() in a child process; return (process, base_url)."""
+    ctx = multiprocessing.get_context("spawn")
+    parent, child = ctx.Pipe(duplex=False)
+    proc = ctx.Process(target=serve, kwargs=dict(options, ready=child), daemon=True)
+    proc.start()
+    child.close()
+    if not parent.poll(120):
+        proc.terminate()
+        raise RuntimeError("fake Spotify server did not start")
+    return proc, parent.recv()
+
+
+def add_library_arguments(parser: argparse.ArgumentParser):
+    """Library and fault-injection options, shared with bench.py."""
+    parser.add_argument("--playlists", type=int, default=20)
+    parser.add_argument("--tracks", type=int, default=300, help="tracks per playlist")
+    parser.add_argument("--liked", type=int, default=1000)
+    parser.add_argument(
+        "--overlap",
+        type=float,
+        default=0.3,
+        help="share of each playlist from a common pool",
+    )
+    parser.add_argument(
+        "--latency", type=float, default=0.0, help="seconds per request"
+    )
+    parser.add_argument(
+        "--error-429", type=float, default=0.0, help="probability per request"
+    )
+    parser.add_argument(
+        "--error-5xx", type=float, default=0.0, help="probability per request"
+    )
+    parser.add_argument("--retry-after", type=int, default=RETRY_AFTER)
+    parser.add_argument("--seed", type=int, default=0)
+
+
+def server_options(args) -> dict:
+    return {
+        "playlists": args.playlists,
+        "tracks": args.tracks,
+        "liked": args.liked,
+        "overlap": args.overlap,
+        "seed": args.seed,
+        "latency": args.latency,
+        "error_429": args.error_429,
+        "error_5xx": args.error_5xx,
+        "retry_after": args.retry_after,
+    }
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--port", type=int, default=8888)
+    add_library_arguments(parser)
+    args = parser.parse_args()
+    serve(args.port, **server_options(args))
@@ -0,0 +1,175 @@
+"""
+Startup-time benchmark for the GUI (source run or a PyInstaller build).
+
+Launches the app repeatedly with SONGS_ROULETTE_STARTUP_PROBE set, so the
+window reports when it first painted and when the local DB finished loading
+and then quits, and times both from process spawn:
+
+    python benchmarks/startup.py --runs 10 --playlists 500 --tracks 200
+    python benchmarks/startup.py --storage sqlite -- dist/SongsRoulette/SongsRoulette.exe
+
+The first launch is reported as cold and the median of the rest as warm.
+"Cold" only means first in this series: for a true cold start (nothing in
+the OS file cache, onefile builds not yet unpacked) reboot first or pass
+--drop-caches (Linux, root). Each launch runs in a scratch directory seeded
+with a synthetic library, so your own data.json is never touched.
+"""
+
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import songs_roulette as sr  # noqa: E402
+from fake_spotify import Library  # noqa: E402
+from songs_roulette_gui import STARTUP_PROBE_ENV  # noqa: E402
+
+APP = os.path.join(
+    os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "songs_roulette.py"
+)
+
+
+def seed_workdir(workdir: str, args):
+    """Write settings.json and a local DB of the synthetic library."""
+    with open(os.path.join(workdir, sr.SETTINGS_JSON), "w", encoding="utf-8") as f:
+        json.dump({"language": "en", "storage": args.storage}, f)
+    library = Library(
+        playlists=args.playlists, tracks=args.tracks, liked=0, seed=args.seed
+    )
+    path = os.path.join(
+        workdir,
+        {"json": sr.DATA_JSON, "packed": sr.DATA_PACK, "sqlite": sr.SQLITE_DB}[
+            args.storage
+        ],
+    )
+    store = {"json": sr.JsonStore, "packed": sr.PackedStore, "sqlite": sr.SqliteStore}[
+        args.storage
+    ](path)
+    store.begin_sync()
+    for pl_id, pl in library.playlists.items():
+        tracks = [sr._track_record(it["track"]) for it in pl["items"]]
+        store.put_playlist(
+            {
+                "id": pl_id,
+                "name": pl["name"],
+                "owner": "bench",
+                "snapshot_id": str(pl["snapshot"]),
+            },
+            tracks,
+        )
+    store.commit_sync(list(library.playlists))
+
+
+def drop_caches():
+    """Flush the Linux page cache (needs root) so the next launch is cold."""
+    subprocess.run(["sync"], check=False)
+    with open("/proc/sys/vm/drop_caches", "w") as f:
+        f.write("3\n")
+
+
+def launch(command: list, workdir: str, timeout: float) -> dict:
+    """Start the app once; seconds from spawn to each probe event and to exit."""
+    env = dict(os.environ, **{STARTUP_PROBE_ENV: "1"})
+    start = time.time()
+    proc = subprocess.Popen(
+        command,
+        cwd=workdir,
+        env=env,
+        stdout=subprocess.PIPE,
+        stderr=subprocess.DEVNULL,
+        text=True,
+    )
+    try:
+        out, _ = proc.communicate(timeout=timeout)
+    except subprocess.TimeoutExpired:
+        proc.kill()
+        raise RuntimeError(f"no startup events after {timeout}s: {' '.join(command)}")
+    row = {"exit": round(time.time() - start, 3)}
+    for line in out.splitlines():
+        if line.startswith("{"):
+            event = json.loads(line)
+            row[event["event"]] = round(event["t"] - start, 3)
+    return row
+
+
+def run(args) -> dict:
+    command = args.command or [sys.executable, APP]
+    workdir = tempfile.mkdtemp(prefix="songs-roulette-startup-")
+    seed_workdir(workdir, args)
+    runs = []
+    for i in range(args.runs):
+        if i == 0 and args.drop_caches:
+            drop_caches()
+        runs.append(launch(command, workdir, args.timeout))
+    events = ("first_paint", "db_ready", "exit")
+    warm = (
+        {
+            e: round(statistics.median(r[e] for r in runs[1:] if e in r), 3)
+            for e in events
+        }
+        if runs[1:]
+        else {}
+    )
+    return {"command": command, "runs": runs, "cold": runs[0], "warm": warm}
+
+
+def _report(result: dict):
+    cols = ("launch", "first_paint", "db_ready", "exit")
+    rows = [["cold", *(str(result["cold"].get(c, "-")) for c in cols[1:])]]
+    if result["warm"]:
+        rows.append(
+            [
+                f"warm (median of {len(result['runs']) - 1})",
+                *(str(result["warm"].get(c, "-")) for c in cols[1:]),
+            ]
+        )
+    widths = [max(len(c), *(len(row[i]) for row in rows)) for i, c in enumerate(cols)]
+    print("  ".join(c.ljust(w) for c, w in zip(cols, widths)))
+    for row in rows:
+        print("  ".join(v.ljust(w) for v, w in zip(row, widths)))
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument(
+        "command",
+        nargs=argparse.REMAINDER,
+        help="app to launch (default: python songs_roulette.py)",
+    )
+    parser.add_argument(
+        "--runs", type=int, default=6, help="launches, the first one cold"
+    )
+    parser.add_argument("--playlists", type=int, default=200)
+    parser.add_argument("--tracks", type=int, default=300, help="tracks per playlist")
+    parser.add_argument(
+        "--storage", choices=("json", "packed", "sqlite"), default="json"
+    )
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument(
+        "--drop-caches",
+        action="store_true",
+        help="flush the OS file cache before the cold launch (Linux, root)",
+    )
+    parser.add_argument(
+        "--timeout", type=float, default=60.0, help="seconds per launch"
+    )
+    parser.add_argument("--json", metavar="PATH", help="also write the results here")
+    args = parser.parse_args(argv)
+    if args.command[:1] == ["--"]:
+        args.command = args.command[1:]
+
+    result = run(args)
+    _report(result)
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump(result, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -2,10 +2,11 @@
 # -*- coding: utf-8 -*-
 
 """
-Spotify Random Playlists GUI
-- PyQt5 app with i18n (ES/EN/中文)
+Spotify Random Playlists
+- PyQt5 GUI (songs_roulette_gui.py) with i18n (ES/EN/中文)
+- Headless CLI: `songs_roulette.py sync|generate|sources` (no Qt import)
 - Encrypted INI storage for Spotify OAuth credentials (Fernet)
-- Updates local JSON DB with all playlists + tracks
+- Updates local DB (JSON, packed or SQLite) with all playlists + tracks
 - Generates random playlists from a source playlist
 - Safe for PyInstaller packaging; works on Windows portable and Arch Linux.
 
@@ -13,24 +14,77 @@ Author: (you)
 License: MIT
 """
 
+from __future__ import annotations
+
 import os
 import sys
 import json
+import argparse
+import asyncio
+import bisect
+import contextlib
+import math
+import mmap
+import re
 import time
+import struct
 
 # import base64
+import heapq
 import random
-import traceback
+import shutil
+import sqlite3
+import tempfile
+import threading
+import urllib.parse
+from array import array
+from itertools import chain, compress, islice
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, as_completed, wait
 from datetime import datetime
 from dataclasses import dataclass
 
+
+class _LazyModule:
+    """Stand-in for a module that `load()` imports on first attribute access."""
+
+    def __init__(self, load):
+        self._load = load
+        self._module = None
+
+    def __getattr__(self, attr):
+        if self._module is None:
+            self._module = self._load()
+        return getattr(self._module, attr)
+
+
 # ---- Third-party deps ----
-# pip install PyQt5 spotipy cryptography
-from PyQt5 import QtCore, QtGui, QtWidgets
+# pip install spotipy cryptography  (+ PyQt5 for the GUI)
+# Se importan al primer uso, así la ventana y los comandos locales (sources)
+# arrancan sin cargarlas. Los import explícitos de cada función son los que
+# ve el análisis de PyInstaller.
+@_LazyModule
+def fernet():
+    from cryptography import fernet
+
+    return fernet
+
+
+@_LazyModule
+def requests():
+    import requests
+
+    return requests
+
+
+@_LazyModule
+def spotipy():
+    import spotipy
+    import spotipy.cache_handler
+    import spotipy.oauth2
+
+    return spotipy
 
-from cryptography.fernet import Fernet, InvalidToken
-from spotipy import Spotify, SpotifyException
-from spotipy.oauth2 import SpotifyOAuth
 
 # =======================
 # ---- CONFIG GLOBAL ----
@@ -38,15 +92,78 @@ from spotipy.oauth2 import SpotifyOAuth
 
 APP_NAME = "Spotify Random Playlists"
 DATA_JSON = "data.json"  # Base de datos local
+DB_VERSION = 2  # 2 = tabla global de canciones + índices por playlist
+SQLITE_DB = "data.sqlite"  # Base de datos local con settings "storage": "sqlite"
+SQLITE_MIN_VERSION = (3, 24, 0)  # INSERT … ON CONFLICT DO UPDATE (upsert)
+DATA_PACK = "data.pack"  # Base de datos local con settings "storage": "packed"
 INI_PATH = "config.ini"  # INI cifrado (en realidad un blob Fernet)
 KEY_PATH = "key.bin"  # Clave simétrica Fernet
 SETTINGS_JSON = "settings.json"  # Preferencias no sensibles (idioma, etc.)
-
-# Tiempo de espera entre llamadas a la API (segundos). Ajustable:
-API_SLEEP_SECONDS = 0.25
+HISTORY_JSON = "history.json"  # Canciones elegidas en cada generación
+GENERATE_JOURNAL = "generate.journal"  # Generación en curso (para reanudarla)
+
+# Generaciones que se conservan en el historial y peso de las canciones
+# recientes en el modo "penalise"
+HISTORY_MAX_GENERATIONS = 1000
+HISTORY_PENALTY = 0.1
+
+# Hilos que descargan playlists en paralelo durante la sync (settings.json: "sync_workers")
+SYNC_WORKERS = 4
+
+# Sync automática en segundo plano de la GUI (settings.json:
+# "auto_sync_minutes", 0 = desactivada; "auto_sync_idle_seconds", 0 = solo
+# por intervalo). Además del intervalo, se comprueba al quedar la app
+# inactiva si la última comprobación tiene más de AUTO_SYNC_MIN_GAP_MINUTES
+AUTO_SYNC_MINUTES = 30
+AUTO_SYNC_IDLE_SECONDS = 60
+AUTO_SYNC_MIN_GAP_MINUTES = 5
+
+# Límite de peticiones por segundo a la API, compartido por todos los hilos.
+# Es la velocidad "a tope"; tras un 429/5xx el limitador baja y vuelve a subir
+# poco a poco. Ajustable:
+API_MAX_REQUESTS_PER_SECOND = 20
+
+# Reintentos por petición tras un 429/5xx antes de rendirse
+API_MAX_RETRIES = 6
+
+# Cliente asyncio (settings.json: "async_api"): URL base de la API (si el
+# cliente spotipy no trae otra) y conexiones HTTP keep-alive que comparte
+SPOTIFY_API_URL = "https://api.spotify.com/v1/"
+ASYNC_MAX_CONNECTIONS = 16
+
+# Páginas pedidas a la vez (por listado) una vez conocido el total
+PAGE_PREFETCH = 4
+
+# Solo los campos que guarda la base de datos local (parámetro "fields")
+PLAYLIST_ITEMS_FIELDS = "total,items(track(id,name,uri,artists(name),album(name)))"
+
+# Intervalo mínimo (ms) entre actualizaciones de progreso hacia la UI
+PROGRESS_INTERVAL_MS = 100
+# Pausa (ms) tras la última tecla antes de filtrar la lista de playlists
+SEARCH_DEBOUNCE_MS = 150
+
+# Métricas de cada sync / generación (una línea JSON por trabajo) y límites
+# (ms) de los buckets del histograma de latencia por endpoint
+METRICS_LOG = "metrics.jsonl"
+LATENCY_BUCKETS_MS = (10, 25, 50, 100, 250, 500, 1000, 2500, 5000)
 
 # Lote máximo que permite Spotify para add_tracks_to_playlist
 ADD_BATCH_SIZE = 100
+ADD_WINDOW = 4  # Lotes de playlist_add_items en vuelo a la vez por playlist
+# Separación mínima (s) entre envíos a una misma playlist, para que lleguen
+# en orden casi siempre y pocos lotes tengan que reintentarse
+ADD_SEND_GAP = 0.05
+
+# Modos de muestreo y máximo de canciones por artista en el modo "artist"
+SAMPLE_MODES = ("uniform", "artist", "album", "playlist")
+ARTIST_CAP = 2
+
+# ID virtual para la playlist de "Me gusta" (saved tracks)
+LIKED_ID = "__liked__"
+
+# Caché del token OAuth y margen (s) con el que se renueva antes de caducar
+TOKEN_CACHE_PATH = ".cache-spotify-rand"
+TOKEN_REFRESH_MARGIN = 120
 
 # Scopes necesarios
 SCOPES = (
@@ -67,17 +184,39 @@ LANG = {
         "menu_options": "Opciones",
         "menu_credentials": "Credenciales…",
         "menu_language": "Idioma…",
+        "menu_stats": "Estadísticas de la última ejecución…",
+        "search_playlists": "Buscar playlist…",
+        "loading_db": "Cargando base de datos local…",
+        "auto_sync_running": "Buscando cambios en tu biblioteca…",
+        "stats_empty": "Todavía no se ha ejecutado ninguna actualización ni generación.",
+        "stats_summary": "{job}: {seconds:.1f} s en total; esperas por el límite de la API: {sleep:.1f} s (sumadas entre hilos)",
+        "stats_columns": "Endpoint / fase|Llamadas|Reintentos|p50 ms|p95 ms|KB|Segundos",
         "btn_update_db": "Actualizar Base de Datos",
         "updating_db": "Actualizando base de datos…",
         "db_updated_ok": "Base de datos actualizada",
         "db_updated_ok_msg": "Se actualizó correctamente la base de datos local.",
         "random_section": "Generación de playlist aleatorias",
         "num_songs": "Número de canciones:",
+        "num_playlists": "Número de playlists:",
+        "not_enough_for_batch": "La playlist de origen no alcanza para tantas playlists sin repetir canciones.\nSe repartirán las canciones disponibles.",
+        "sample_mode": "Modo:",
+        "mode_uniform": "Aleatorio uniforme",
+        "mode_artist": "Máximo {cap} por artista",
+        "mode_album": "Equilibrado entre álbumes",
+        "mode_playlist": "Equilibrado entre playlists",
+        "avoid_recent": "Evitar canciones de las últimas N generaciones:",
         "source_playlist": "Playlist de origen:",
+        "combined_sources": "Combinar playlists:",
+        "add_source": "Añadir",
+        "remove_source": "Quitar",
+        "intersect_sources": "Solo canciones que estén en todas",
+        "no_matching_tracks": "Ninguna canción está en las playlists elegidas.",
+        "combine_after_sync": "Podrás combinar playlists en cuanto termine la actualización en segundo plano.",
         "playlist_name": "Nombre de la playlist:",
         "name_hint": "Dejar en blanco para usar: RANDOM - <fecha y hora actuales>",
         "btn_generate": "Generar playlist",
         "progress_add": "Agregando canciones…",
+        "resume_generation": "Hay una generación interrumpida ({name}, faltan {left} canciones).\n¿Quieres terminarla?",
         "playlist_done": "Playlist generada con éxito",
         "error_title": "Error",
         "credentials_title": "Credenciales de Spotify",
@@ -96,23 +235,46 @@ LANG = {
         "no_playlists": "No hay playlists disponibles en la base de datos local.\nPrimero ejecuta 'Update database'.",
         "not_enough_tracks": "La playlist de origen tiene menos canciones que las solicitadas.\nSe usarán todas las disponibles.",
         "loading": "Cargando…",
+        "progress_rate": "%p%  ·  {rate:.0f} canciones/s  ·  quedan {eta}",
     },
     "en": {
         "app_title": "Song Roulette - Random Playlist Generator for Spotify",
         "menu_options": "Options",
         "menu_credentials": "Credentials…",
         "menu_language": "Language…",
+        "menu_stats": "Last run statistics…",
+        "search_playlists": "Search playlists…",
+        "loading_db": "Loading local database…",
+        "auto_sync_running": "Checking your library for changes…",
+        "stats_empty": "No database update or generation has run yet.",
+        "stats_summary": "{job}: {seconds:.1f} s in total; waits for the API rate limit: {sleep:.1f} s (summed over threads)",
+        "stats_columns": "Endpoint / phase|Calls|Retried|p50 ms|p95 ms|KB|Seconds",
         "btn_update_db": "Update database",
         "updating_db": "Updating database…",
         "db_updated_ok": "Database updated",
         "db_updated_ok_msg": "Local database was updated successfully.",
         "random_section": "Random playlist generation",
         "num_songs": "Number of tracks:",
+        "num_playlists": "Number of playlists:",
+        "not_enough_for_batch": "Source playlist is too small for that many playlists without repeats.\nAvailable tracks will be split between them.",
+        "sample_mode": "Mode:",
+        "mode_uniform": "Uniform random",
+        "mode_artist": "At most {cap} per artist",
+        "mode_album": "Balanced across albums",
+        "mode_playlist": "Balanced across playlists",
+        "avoid_recent": "Avoid tracks from the last N generations:",
         "source_playlist": "Source playlist:",
+        "combined_sources": "Combine playlists:",
+        "add_source": "Add",
+        "remove_source": "Remove",
+        "intersect_sources": "Only tracks that are in all of them",
+        "no_matching_tracks": "No tracks are in the selected playlists.",
+        "combine_after_sync": "You can combine playlists again as soon as the background update finishes.",
         "playlist_name": "Playlist name:",
         "name_hint": "Leave empty to use: RANDOM - <current date & time>",
         "btn_generate": "Generate playlist",
         "progress_add": "Adding tracks…",
+        "resume_generation": "An interrupted generation can be finished ({name}, {left} tracks left).\nResume it?",
         "playlist_done": "Playlist created successfully",
         "error_title": "Error",
         "credentials_title": "Spotify Credentials",
@@ -131,23 +293,46 @@ LANG = {
         "no_playlists": "No playlists found in local DB.\nPlease run 'Update database' first.",
         "not_enough_tracks": "Source playlist has fewer tracks than requested.\nAll available will be used.",
         "loading": "Loading…",
+        "progress_rate": "%p%  ·  {rate:.0f} tracks/s  ·  {eta} left",
     },
     "zh": {
         "app_title": "歌曲轮盘 - Spotify 随机播放列表生成器",
         "menu_options": "选项",
         "menu_credentials": "账号凭证…",
         "menu_language": "语言…",
+        "menu_stats": "上次运行统计…",
+        "search_playlists": "搜索播放列表…",
+        "loading_db": "正在加载本地数据库…",
+        "auto_sync_running": "正在检查资料库的变化…",
+        "stats_empty": "还没有运行过数据库更新或生成。",
+        "stats_summary": "{job}：总计 {seconds:.1f} 秒；等待 API 限速：{sleep:.1f} 秒（各线程累计）",
+        "stats_columns": "接口 / 阶段|调用|重试|p50 毫秒|p95 毫秒|KB|秒",
         "btn_update_db": "更新数据库",
         "updating_db": "正在更新数据库…",
         "db_updated_ok": "数据库已更新",
         "db_updated_ok_msg": "已成功更新本地数据库。",
         "random_section": "生成随机播放列表",
         "num_songs": "歌曲数量：",
+        "num_playlists": "播放列表数量：",
+        "not_enough_for_batch": "来源播放列表的歌曲不足以生成这么多不重复的播放列表。\n将平均分配可用歌曲。",
+        "sample_mode": "模式：",
+        "mode_uniform": "均匀随机",
+        "mode_artist": "每位艺人最多 {cap} 首",
+        "mode_album": "在专辑之间均衡",
+        "mode_playlist": "在播放列表之间均衡",
+        "avoid_recent": "避免最近 N 次生成中的歌曲：",
         "source_playlist": "源播放列表：",
+        "combined_sources": "合并播放列表：",
+        "add_source": "添加",
+        "remove_source": "移除",
+        "intersect_sources": "仅限所有列表中都有的歌曲",
+        "no_matching_tracks": "所选播放列表中没有歌曲。",
+        "combine_after_sync": "后台更新完成后即可再次组合播放列表。",
         "playlist_name": "播放列表名称：",
         "name_hint": "留空则使用：RANDOM - <当前日期时间>",
         "btn_generate": "生成播放列表",
         "progress_add": "正在添加歌曲…",
+        "resume_generation": "有一次未完成的生成（{name}，还剩 {left} 首）。\n要继续完成吗？",
         "playlist_done": "播放列表创建成功",
         "error_title": "错误",
         "credentials_title": "Spotify 账号凭证",
@@ -166,6 +351,7 @@ LANG = {
         "no_playlists": "本地数据库中没有播放列表。\n请先运行“更新数据库”。",
         "not_enough_tracks": "来源播放列表的歌曲少于请求数量。\n将使用全部可用歌曲。",
         "loading": "正在加载…",
+        "progress_rate": "%p%  ·  {rate:.0f} 首/秒  ·  剩余 {eta}",
     },
 }
 
@@ -179,7 +365,7 @@ DEFAULT_LANG = "en"
 def ensure_key():
     """Ensure a Fernet key exists; create if missing."""
     if not os.path.exists(KEY_PATH):
-        key = Fernet.generate_key()
+        key = fernet.Fernet.generate_key()
         with open(KEY_PATH, "wb") as f:
             f.write(key)
     with open(KEY_PATH, "rb") as f:
@@ -189,7 +375,7 @@ def ensure_key():
 def encrypt_to_ini(plain_text: str):
     """Encrypt and write to INI_PATH."""
     key = ensure_key()
-    f = Fernet(key)
+    f = fernet.Fernet(key)
     token = f.encrypt(plain_text.encode("utf-8"))
     with open(INI_PATH, "wb") as fh:
         fh.write(token)
@@ -200,12 +386,12 @@ def decrypt_from_ini() -> str:
     if not os.path.exists(INI_PATH):
         return ""
     key = ensure_key()
-    f = Fernet(key)
+    f = fernet.Fernet(key)
     with open(INI_PATH, "rb") as fh:
         blob = fh.read()
     try:
         return f.decrypt(blob).decode("utf-8")
-    except InvalidToken:
+    except fernet.InvalidToken:
         return ""
 
 
@@ -226,6 +412,1046 @@ def save_settings(settings: dict):
         json.dump(settings, f, ensure_ascii=False, indent=2)
 
 
+class TrackTable:
+    """
+    Deduplicated track table of the local DB. Each track is stored once,
+    keyed by its id (or uri for local files); playlists keep indices into it.
+    With a `sink`, new tracks are handed to it instead of kept in memory.
+    """
+
+    def __init__(self, sink=None):
+        self.tracks = []
+        self.count = 0
+        self._index = {}
+        self._sink = sink
+
+    def add(self, track: dict) -> int:
+        """Return the index of `track`, appending it if not known yet."""
+        key = track.get("id") or track.get("uri")
+        idx = self._index.get(key) if key else None
+        if idx is None:
+            idx = self.count
+            if self._sink:
+                self._sink(track)
+            else:
+                self.tracks.append(track)
+            self.count += 1
+            if key:
+                self._index[key] = idx
+        return idx
+
+
+def normalize_db(db: dict) -> dict:
+    """
+    Migrate a v1 DB (full track dicts embedded in every playlist) to the
+    normalized layout: db["tracks"] holds each track once and every
+    playlist's "tracks" is a list of indices into it.
+    """
+    if db.get("version") == DB_VERSION:
+        return db
+    table = TrackTable()
+    for pl in db.get("playlists", []):
+        pl["tracks"] = [table.add(t) for t in pl.get("tracks", [])]
+    db["version"] = DB_VERSION
+    db["tracks"] = table.tracks
+    return db
+
+
+def playlist_tracks(db: dict, pl: dict) -> list:
+    """Resolve a playlist's track indices to track dicts."""
+    tracks = db.get("tracks", [])
+    return [tracks[i] for i in pl.get("tracks", [])]
+
+
+def load_db(path: str = DATA_JSON) -> dict or None:
+    """Load data.json, migrating (and rewriting) old layouts on the fly."""
+    if not os.path.exists(path):
+        return None
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            db = json.load(f)
+    except Exception:
+        return None
+    if db.get("version") != DB_VERSION:
+        db = normalize_db(db)
+        save_db(db, path)
+    return db
+
+
+def save_db(db: dict, path: str = DATA_JSON):
+    """Write data.json compactly (index lists would explode with indent)."""
+    tmp_path = path + ".tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(db, f, ensure_ascii=False, separators=(",", ":"))
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp_path, path)
+
+
+def _compact(obj) -> str:
+    return json.dumps(obj, ensure_ascii=False, separators=(",", ":"))
+
+
+class SyncJournal:
+    """
+    Append-only log of the playlists finished by an in-progress sync, one
+    JSON line per playlist ({"entry": ..., "tracks": [...] or null}).
+    Every line is fsync'ed, so after a crash the next sync resumes from the
+    last completed playlist. Removed once the sync is committed.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self.done = {}  # playlist id -> snapshot_id of its latest record
+        self._offsets = {}  # playlist id -> byte offset of its latest record
+        if os.path.exists(path):
+            self._recover()
+        self._fh = open(path, "ab")
+
+    def _recover(self):
+        """Index the records of an interrupted sync, dropping a torn last line."""
+        good = 0
+        with open(self.path, "rb") as f:
+            for line in f:
+                if not line.endswith(b"\n"):
+                    break
+                try:
+                    entry = json.loads(line)["entry"]
+                except (ValueError, KeyError):
+                    break
+                self.done[entry["id"]] = entry.get("snapshot_id")
+                self._offsets[entry["id"]] = good
+                good += len(line)
+        with open(self.path, "r+b") as f:
+            f.truncate(good)
+
+    def append(self, entry: dict, tracks: list = None):
+        line = _compact({"entry": entry, "tracks": tracks}).encode("utf-8") + b"\n"
+        self._offsets[entry["id"]] = self._fh.tell()
+        self._fh.write(line)
+        self._fh.flush()
+        os.fsync(self._fh.fileno())
+        self.done[entry["id"]] = entry.get("snapshot_id")
+
+    def records(self, order: list):
+        """Yield (entry, tracks) for the ids in `order` that were logged."""
+        with open(self.path, "rb") as f:
+            for pid in order:
+                if pid in self._offsets:
+                    f.seek(self._offsets[pid])
+                    rec = json.loads(f.readline())
+                    yield rec["entry"], rec["tracks"]
+
+    def close(self):
+        self._fh.close()
+
+    def discard(self):
+        self.close()
+        os.remove(self.path)
+
+
+class GenerationJournal:
+    """
+    Record of an in-progress generation, so a failed one can be resumed on
+    the same playlists instead of starting over. JSON lines: first the plan
+    ({"plan": [{"name", "uris"}, ...]}), then {"i", "playlist_id"} when
+    playlist i is created and {"i", "batches"} each time its committed
+    prefix of ADD_BATCH_SIZE batches grows. Every line is fsync'ed; the file
+    is removed once every playlist is complete. With path None nothing is
+    written (the job is not resumable).
+    """
+
+    def __init__(self, path: str = GENERATE_JOURNAL):
+        self.path = path
+        self.plan = []  # [{"name", "uris", "playlist_id", "batches"}]
+        self._lock = threading.Lock()
+        self._fh = None
+        if path and os.path.exists(path):
+            self._recover()
+
+    def _recover(self):
+        """Replay the record of an interrupted generation (torn line dropped)."""
+        good = 0
+        with open(self.path, "rb") as f:
+            for line in f:
+                if not line.endswith(b"\n"):
+                    break
+                try:
+                    rec = json.loads(line)
+                    if "plan" in rec:
+                        self.plan = [
+                            dict(pl, playlist_id=None, batches=0) for pl in rec["plan"]
+                        ]
+                    else:
+                        self.plan[rec["i"]].update(
+                            {k: v for k, v in rec.items() if k != "i"}
+                        )
+                except (ValueError, KeyError, IndexError, TypeError):
+                    break
+                good += len(line)
+        with open(self.path, "r+b") as f:
+            f.truncate(good)
+
+    def pending(self) -> bool:
+        return bool(self.plan)
+
+    def remaining(self) -> int:
+        """Tracks still to be added."""
+        return sum(
+            max(len(pl["uris"]) - pl["batches"] * ADD_BATCH_SIZE, 0) for pl in self.plan
+        )
+
+    def start(self, names: list, chunks: list):
+        """Begin a new generation, replacing any previous record."""
+        with self._lock:
+            self.plan = [
+                {"name": name, "uris": uris, "playlist_id": None, "batches": 0}
+                for name, uris in zip(names, chunks)
+            ]
+            if self._fh is not None:
+                self._fh.close()
+            self._fh = open(self.path, "wb") if self.path else None
+            self._write(
+                {"plan": [{"name": pl["name"], "uris": pl["uris"]} for pl in self.plan]}
+            )
+
+    def created(self, i: int, playlist_id: str):
+        self._update(i, playlist_id=playlist_id)
+
+    def committed(self, i: int, batches: int):
+        self._update(i, batches=batches)
+
+    def discard(self):
+        with self._lock:
+            if self._fh is not None:
+                self._fh.close()
+                self._fh = None
+            self.plan = []
+            if self.path and os.path.exists(self.path):
+                os.remove(self.path)
+
+    def _update(self, i: int, **fields):
+        with self._lock:
+            if self._fh is None and self.path:
+                self._fh = open(self.path, "ab")
+            self.plan[i].update(fields)
+            self._write(dict(i=i, **fields))
+
+    def _write(self, rec: dict):
+        if self._fh is None:
+            return
+        self._fh.write(_compact(rec).encode("utf-8") + b"\n")
+        self._fh.flush()
+        os.fsync(self._fh.fileno())
+
+
+class JsonStore:
+    """
+    Local DB kept in memory and persisted as a single data.json.
+
+    Store interface (shared with PackedStore and SqliteStore):
+    - has_playlists() / playlist_summaries() / playlist_tracks(id) for the UI
+    - playlist_meta() for incremental sync (snapshot_id, latest_added_at, total)
+    - begin_sync(), put_playlist(entry, tracks), commit_sync(order) for
+      UpdateDBWorker; tracks=None keeps the stored tracks of an unchanged
+      playlist, and playlists not put before commit_sync are dropped.
+    - journaled(): {id: snapshot_id} already saved by an interrupted sync,
+      which the worker does not need to fetch again.
+
+    During a sync each finished playlist goes to a SyncJournal; commit_sync
+    streams the journal into a temp file and swaps it in with os.replace.
+    """
+
+    def __init__(self, path: str = DATA_JSON):
+        self.path = path
+        self._journal = None
+        # La UI lee mientras una sync en segundo plano puede cambiar el DB
+        self._lock = threading.RLock()
+        self._load()
+
+    def _load(self):
+        db = load_db(self.path)
+        by_id = {pl["id"]: pl for pl in (db or {}).get("playlists", [])}
+        with self._lock:
+            self.db, self._by_id = db, by_id
+
+    def has_playlists(self) -> bool:
+        return bool(self.db and self.db.get("playlists"))
+
+    def playlist_summaries(self) -> list:
+        """(id, name, track count) of every playlist, biggest first."""
+        if not self.db:
+            return []
+        rows = [
+            (pl["id"], pl["name"], len(pl.get("tracks", [])))
+            for pl in self.db.get("playlists", [])
+        ]
+        rows.sort(key=lambda r: r[2], reverse=True)
+        return rows
+
+    def playlist_tracks(self, playlist_id: str) -> list:
+        with self._lock:
+            return self.tracks_at(self.playlist_indices(playlist_id))
+
+    def playlist_indices(self, playlist_id: str) -> list:
+        """Indices of a playlist's tracks in the track table, in order."""
+        pl = self._by_id.get(playlist_id)
+        return pl.get("tracks", []) if pl else []
+
+    def tracks_at(self, indices) -> list:
+        """Resolve track table indices to track dicts."""
+        tracks = (self.db or {}).get("tracks", [])
+        return [tracks[i] for i in indices]
+
+    def iter_tracks(self):
+        """Yield (index, track) for every track in the table."""
+        return enumerate((self.db or {}).get("tracks", []))
+
+    def playlist_meta(self) -> dict:
+        return {
+            pl["id"]: {k: v for k, v in pl.items() if k != "tracks"}
+            for pl in (self.db or {}).get("playlists", [])
+        }
+
+    def begin_sync(self):
+        if self._journal is not None:
+            self._journal.close()  # left open by a failed sync
+        self._journal = SyncJournal(self.path + ".journal")
+
+    def journaled(self) -> dict:
+        return dict(self._journal.done)
+
+    def put_playlist(self, entry: dict, tracks: list = None):
+        self._journal.append(entry, tracks)
+
+    def commit_sync(self, order: list):
+        tmp_path = self.path + ".tmp"
+        with tempfile.TemporaryFile("w+", encoding="utf-8") as tracks_fh, open(
+            tmp_path, "w", encoding="utf-8"
+        ) as out:
+
+            def sink(track):
+                if table.count:
+                    tracks_fh.write(",")
+                tracks_fh.write(_compact(track))
+
+            table = TrackTable(sink)
+            generated_at = datetime.now().isoformat(timespec="seconds")
+            out.write(
+                f'{{"version":{DB_VERSION},"generated_at":{_compact(generated_at)},'
+                '"playlists":['
+            )
+            for i, entry in enumerate(self._final_playlists(order, table)):
+                if i:
+                    out.write(",")
+                out.write(_compact(entry))
+            out.write('],"tracks":[')
+            tracks_fh.seek(0)
+            shutil.copyfileobj(tracks_fh, out)
+            out.write("]}")
+            out.flush()
+            os.fsync(out.fileno())
+        os.replace(tmp_path, self.path)
+        self._journal.discard()
+        self._journal = None
+        self._load()
+
+    def _final_playlists(self, order: list, table: TrackTable):
+        """Yield the synced playlists in `order`, with tracks as table indices."""
+        stored = {pl["id"]: pl for pl in (self.db or {}).get("playlists", [])}
+        for entry, tracks in self._journal.records(order):
+            if tracks is None:
+                prev = stored.get(entry["id"])
+                tracks = playlist_tracks(self.db, prev) if prev else []
+            entry["tracks"] = [table.add(t) for t in tracks]
+            yield entry
+
+
+class PackedStore(JsonStore):
+    """
+    Local DB in a compact binary file (data.pack) that is memory-mapped.
+
+    Layout: b"SRPK", uint32 header length, then a small JSON header with the
+    playlist index (id, name, owner, snapshot_id, count, byte offset). After
+    it come one uint32 index array per playlist, a uint64 offset table for
+    the track blob (n + 1 entries) and the blob of compact JSON tracks.
+    All integers are little-endian. Opening only reads the header; track
+    arrays are decoded when a playlist is actually asked for. A file with a
+    bad magic, another version or truncated data raises ValueError.
+    """
+
+    MAGIC = b"SRPK"
+
+    def __init__(self, path: str = DATA_PACK):
+        self.path = path
+        self.db = None  # never loaded as a whole
+        self._journal = None
+        self._lock = threading.RLock()  # playlist_tracks también lo toma
+        self._file = None
+        self._mm = None
+        self._open()
+
+    def _open(self):
+        self._header = {"playlists": []}
+        self._by_id = {}
+        self._offsets = None
+        if not os.path.exists(self.path) or os.path.getsize(self.path) == 0:
+            return
+        self._file = open(self.path, "rb")
+        self._mm = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+        try:
+            self._header = self._read_header()
+        except ValueError:
+            self._close()
+            raise
+        self._by_id = {pl["id"]: pl for pl in self._header["playlists"]}
+
+    def _read_header(self) -> dict:
+        """Decode the header and check that everything it points to is there."""
+        mm = self._mm
+        if len(mm) < 8 or mm[:4] != self.MAGIC:
+            raise ValueError(f"{self.path} is not a packed library (bad magic)")
+        (header_len,) = struct.unpack_from("<I", mm, 4)
+        try:
+            header = json.loads(mm[8 : 8 + header_len].decode("utf-8"))
+            version = header["version"]
+            tracks = header["tracks"]
+            playlists = header["playlists"]
+        except (ValueError, KeyError, TypeError):
+            raise ValueError(f"{self.path} is truncated or corrupt (header)") from None
+        if version != DB_VERSION:
+            raise ValueError(
+                f"{self.path} has version {version}; this app reads version {DB_VERSION}"
+            )
+        # Fin de los datos: offset final de la tabla, leído sin cargarla
+        table_end = tracks["offsets_at"] + 8 * (tracks["count"] + 1)
+        if table_end > len(mm) or any(
+            pl["offset"] + 4 * pl["count"] > tracks["offsets_at"] for pl in playlists
+        ):
+            raise ValueError(f"{self.path} is truncated or corrupt (index)")
+        (blob_len,) = struct.unpack_from("<Q", mm, table_end - 8)
+        if tracks["blob_at"] + blob_len > len(mm):
+            raise ValueError(f"{self.path} is truncated or corrupt (tracks)")
+        return header
+
+    def _close(self):
+        # Windows cannot replace a file that is still mapped
+        if self._mm is not None:
+            self._mm.close()
+            self._file.close()
+        self._mm = None
+        self._file = None
+
+    def _array(self, typecode: str, offset: int, count: int) -> array:
+        arr = array(typecode)
+        arr.frombytes(self._mm[offset : offset + arr.itemsize * count])
+        if sys.byteorder == "big":
+            arr.byteswap()
+        return arr
+
+    def has_playlists(self) -> bool:
+        return bool(self._header["playlists"])
+
+    def playlist_summaries(self) -> list:
+        """(id, name, track count) of every playlist, biggest first."""
+        rows = [(pl["id"], pl["name"], pl["count"]) for pl in self._header["playlists"]]
+        rows.sort(key=lambda r: r[2], reverse=True)
+        return rows
+
+    def playlist_indices(self, playlist_id: str) -> array:
+        with self._lock:
+            pl = self._by_id.get(playlist_id) if self._mm is not None else None
+            if not pl:
+                return array("I")
+            return self._array("I", pl["offset"], pl["count"])
+
+    def tracks_at(self, indices) -> list:
+        with self._lock:
+            if self._mm is None:
+                return []
+            offsets = self._track_offsets()
+            blob_at = self._header["tracks"]["blob_at"]
+            mm = self._mm
+            return [
+                json.loads(mm[blob_at + offsets[i] : blob_at + offsets[i + 1]])
+                for i in indices
+            ]
+
+    def iter_tracks(self):
+        count = self._header.get("tracks", {}).get("count", 0)
+        return enumerate(self.tracks_at(range(count)))
+
+    def _track_offsets(self) -> array:
+        if self._offsets is None:
+            info = self._header["tracks"]
+            self._offsets = self._array("Q", info["offsets_at"], info["count"] + 1)
+        return self._offsets
+
+    def playlist_meta(self) -> dict:
+        return {
+            pl["id"]: {k: v for k, v in pl.items() if k not in ("count", "offset")}
+            for pl in self._header["playlists"]
+        }
+
+    def commit_sync(self, order: list):
+        with tempfile.TemporaryFile() as blob_fh:
+            offsets = array("Q", [0])
+
+            def sink(track):
+                raw = _compact(track).encode("utf-8")
+                blob_fh.write(raw)
+                offsets.append(offsets[-1] + len(raw))
+
+            table = TrackTable(sink)
+            playlists = []
+            for entry, tracks in self._journal.records(order):
+                if tracks is None:
+                    tracks = self.playlist_tracks(entry["id"])
+                entry["tracks"] = array("I", (table.add(t) for t in tracks))
+                playlists.append(entry)
+            blob_fh.seek(0)
+            self._write(playlists, offsets, blob_fh)
+        self._journal.discard()
+        self._journal = None
+
+    def _write(self, playlists: list, offsets: array, blob_fh):
+        arrays = [pl.pop("tracks") for pl in playlists]
+        if sys.byteorder == "big":
+            offsets.byteswap()
+            for arr in arrays:
+                arr.byteswap()
+
+        # The header stores absolute offsets, which depend on its own size:
+        # re-encode until its length stops changing (offsets only grow).
+        index = [dict(pl, count=len(arr)) for pl, arr in zip(playlists, arrays)]
+        header = {
+            "version": DB_VERSION,
+            "generated_at": datetime.now().isoformat(timespec="seconds"),
+            "playlists": index,
+            "tracks": {"count": len(offsets) - 1},
+        }
+
+        def encode(base):
+            pos = base
+            for entry, arr in zip(index, arrays):
+                entry["offset"] = pos
+                pos += arr.itemsize * len(arr)
+            header["tracks"]["offsets_at"] = pos
+            header["tracks"]["blob_at"] = pos + offsets.itemsize * len(offsets)
+            return json.dumps(header, ensure_ascii=False).encode("utf-8")
+
+        raw = encode(0)
+        while True:
+            raw_next = encode(8 + len(raw))
+            if len(raw_next) == len(raw):
+                raw = raw_next
+                break
+            raw = raw_next
+
+        tmp_path = self.path + ".tmp"
+        with open(tmp_path, "wb") as f:
+            f.write(self.MAGIC)
+            f.write(struct.pack("<I", len(raw)))
+            f.write(raw)
+            for arr in arrays:
+                f.write(arr.tobytes())
+            f.write(offsets.tobytes())
+            shutil.copyfileobj(blob_fh, f)
+            f.flush()
+            os.fsync(f.fileno())
+        with self._lock:
+            self._close()
+            os.replace(tmp_path, self.path)
+            self._open()
+
+
+SQLITE_SCHEMA = """
+CREATE TABLE IF NOT EXISTS meta (
+    key TEXT PRIMARY KEY,
+    value TEXT
+);
+CREATE TABLE IF NOT EXISTS playlists (
+    id TEXT PRIMARY KEY,
+    name TEXT NOT NULL,
+    owner TEXT,
+    snapshot_id TEXT,
+    latest_added_at TEXT,
+    total INTEGER,
+    position INTEGER,
+    track_count INTEGER NOT NULL DEFAULT 0
+);
+CREATE TABLE IF NOT EXISTS tracks (
+    pk INTEGER PRIMARY KEY,
+    key TEXT UNIQUE,
+    id TEXT,
+    name TEXT,
+    uri TEXT,
+    artists TEXT,
+    album TEXT
+);
+CREATE TABLE IF NOT EXISTS membership (
+    playlist_id TEXT NOT NULL REFERENCES playlists(id),
+    position INTEGER NOT NULL,
+    track_pk INTEGER NOT NULL REFERENCES tracks(pk),
+    PRIMARY KEY (playlist_id, position)
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS membership_track ON membership(track_pk);
+"""
+
+
+class SqliteStore:
+    """
+    Local DB in SQLite (playlists, tracks, membership). Same interface as
+    JsonStore, but nothing is loaded up front: every put_playlist is its own
+    transaction, and the UI only queries counts or the chosen playlist.
+    """
+
+    def __init__(self, path: str = SQLITE_DB):
+        if sqlite3.sqlite_version_info < SQLITE_MIN_VERSION:
+            raise RuntimeError(
+                f'SQLite {sqlite3.sqlite_version} is too old for "storage": "sqlite"'
+                f" (needs {'.'.join(map(str, SQLITE_MIN_VERSION))}); use \"json\" or"
+                ' "packed" in settings.json instead.'
+            )
+        self.path = path
+        # The connection is shared by the UI and the sync worker thread
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._lock = threading.Lock()
+        with self._lock:
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.executescript(SQLITE_SCHEMA)
+            self._migrate()
+
+    def _migrate(self):
+        """Add track_count (kept by put_playlist) to DBs created before it."""
+        columns = {row[1] for row in self._conn.execute("PRAGMA table_info(playlists)")}
+        if "track_count" not in columns:
+            with self._conn:
+                self._conn.execute(
+                    "ALTER TABLE playlists ADD COLUMN track_count INTEGER NOT NULL DEFAULT 0"
+                )
+                self._conn.execute(
+                    "UPDATE playlists SET track_count = (SELECT COUNT(*) FROM membership m"
+                    " WHERE m.playlist_id = playlists.id)"
+                )
+
+    def has_playlists(self) -> bool:
+        with self._lock:
+            row = self._conn.execute("SELECT 1 FROM playlists LIMIT 1").fetchone()
+        return row is not None
+
+    def playlist_summaries(self) -> list:
+        """(id, name, track count) of every playlist, biggest first."""
+        with self._lock:
+            return self._conn.execute(
+                "SELECT id, name, track_count FROM playlists ORDER BY track_count DESC"
+            ).fetchall()
+
+    def playlist_tracks(self, playlist_id: str) -> list:
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT t.id, t.name, t.uri, t.artists, t.album"
+                " FROM membership m JOIN tracks t ON t.pk = m.track_pk"
+                " WHERE m.playlist_id = ? ORDER BY m.position",
+                (playlist_id,),
+            ).fetchall()
+        return [self._track(*row) for row in rows]
+
+    def playlist_indices(self, playlist_id: str) -> list:
+        """Track primary keys of a playlist, in order."""
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT track_pk FROM membership WHERE playlist_id = ?"
+                " ORDER BY position",
+                (playlist_id,),
+            ).fetchall()
+        return [pk for (pk,) in rows]
+
+    def tracks_at(self, indices) -> list:
+        indices = list(indices)
+        found = {}
+        with self._lock:
+            # Lotes por debajo del límite de parámetros de SQLite
+            for i in range(0, len(indices), 900):
+                chunk = indices[i : i + 900]
+                rows = self._conn.execute(
+                    "SELECT pk, id, name, uri, artists, album FROM tracks"
+                    f" WHERE pk IN ({','.join('?' * len(chunk))})",
+                    chunk,
+                ).fetchall()
+                for pk, *row in rows:
+                    found[pk] = self._track(*row)
+        return [found[pk] for pk in indices if pk in found]
+
+    def iter_tracks(self):
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT pk, id, name, uri, artists, album FROM tracks"
+            ).fetchall()
+        return ((pk, self._track(*row)) for pk, *row in rows)
+
+    @staticmethod
+    def _track(tid, name, uri, artists, album) -> dict:
+        return {
+            "id": tid,
+            "name": name,
+            "uri": uri,
+            "artists": json.loads(artists) if artists else [],
+            "album": album,
+        }
+
+    def playlist_meta(self) -> dict:
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT id, snapshot_id, latest_added_at, total FROM playlists"
+            ).fetchall()
+        return {
+            pid: {
+                "id": pid,
+                "snapshot_id": snapshot_id,
+                "latest_added_at": latest_added_at,
+                "total": total,
+            }
+            for pid, snapshot_id, latest_added_at, total in rows
+        }
+
+    def begin_sync(self):
+        self._seen = []
+
+    def journaled(self) -> dict:
+        # Every put_playlist is already committed; playlist_meta() covers it
+        return {}
+
+    def put_playlist(self, entry: dict, tracks: list = None):
+        """Upsert one playlist (and its tracks) in a single transaction."""
+        with self._lock, self._conn:
+            self._conn.execute(
+                "INSERT INTO playlists (id, name, owner, snapshot_id,"
+                " latest_added_at, total) VALUES (?, ?, ?, ?, ?, ?)"
+                " ON CONFLICT(id) DO UPDATE SET name = excluded.name,"
+                " owner = excluded.owner, snapshot_id = excluded.snapshot_id,"
+                " latest_added_at = excluded.latest_added_at, total = excluded.total",
+                (
+                    entry["id"],
+                    entry["name"],
+                    entry.get("owner", ""),
+                    entry.get("snapshot_id"),
+                    entry.get("latest_added_at"),
+                    entry.get("total"),
+                ),
+            )
+            if tracks is not None:
+                self._conn.execute(
+                    "DELETE FROM membership WHERE playlist_id = ?", (entry["id"],)
+                )
+                pks = self._track_pks(tracks)
+                self._conn.executemany(
+                    "INSERT INTO membership (playlist_id, position, track_pk)"
+                    " VALUES (?, ?, ?)",
+                    ((entry["id"], pos, pk) for pos, pk in enumerate(pks)),
+                )
+                self._conn.execute(
+                    "UPDATE playlists SET track_count = ? WHERE id = ?",
+                    (len(pks), entry["id"]),
+                )
+        self._seen.append(entry["id"])
+
+    def commit_sync(self, order: list):
+        """Drop playlists not seen in this sync and orphaned tracks."""
+        position = {pid: i for i, pid in enumerate(order)}
+        with self._lock, self._conn:
+            self._conn.execute("CREATE TEMP TABLE IF NOT EXISTS seen (id TEXT)")
+            self._conn.execute("DELETE FROM seen")
+            self._conn.executemany(
+                "INSERT INTO seen (id) VALUES (?)", ((pid,) for pid in self._seen)
+            )
+            self._conn.execute(
+                "DELETE FROM membership WHERE playlist_id NOT IN (SELECT id FROM seen)"
+            )
+            self._conn.execute(
+                "DELETE FROM playlists WHERE id NOT IN (SELECT id FROM seen)"
+            )
+            self._conn.execute(
+                "DELETE FROM tracks WHERE pk NOT IN (SELECT track_pk FROM membership)"
+            )
+            self._conn.executemany(
+                "UPDATE playlists SET position = ? WHERE id = ?",
+                ((position.get(pid), pid) for pid in self._seen),
+            )
+            self._conn.execute(
+                "INSERT OR REPLACE INTO meta (key, value) VALUES ('generated_at', ?)",
+                (datetime.now().isoformat(timespec="seconds"),),
+            )
+        del self._seen
+
+    def _track_pks(self, tracks: list) -> list:
+        """Upsert tracks and return their primary keys, in order."""
+        pks = []
+        for t in tracks:
+            row = (
+                t.get("id") or t.get("uri"),
+                t.get("id"),
+                t.get("name"),
+                t.get("uri"),
+                json.dumps(t.get("artists") or [], ensure_ascii=False),
+                t.get("album"),
+            )
+            if row[0] is None:
+                # Sin id ni URI no hay con qué deduplicar: fila nueva
+                cur = self._conn.execute(
+                    "INSERT INTO tracks (key, id, name, uri, artists, album)"
+                    " VALUES (?, ?, ?, ?, ?, ?)",
+                    row,
+                )
+                pks.append(cur.lastrowid)
+                continue
+            # Sin RETURNING (SQLite 3.35+): upsert y luego la pk por su clave
+            self._conn.execute(
+                "INSERT INTO tracks (key, id, name, uri, artists, album)"
+                " VALUES (?, ?, ?, ?, ?, ?)"
+                " ON CONFLICT(key) DO UPDATE SET name = excluded.name,"
+                " uri = excluded.uri, artists = excluded.artists,"
+                " album = excluded.album",
+                row,
+            )
+            (pk,) = self._conn.execute(
+                "SELECT pk FROM tracks WHERE key = ?", (row[0],)
+            ).fetchone()
+            pks.append(pk)
+        return pks
+
+
+def import_json(store, json_path: str = DATA_JSON):
+    """Copy an existing data.json (any version) into another store."""
+    db = load_db(json_path)
+    if not db:
+        return store
+    store.begin_sync()
+    for pl in db.get("playlists", []):
+        entry = {k: v for k, v in pl.items() if k != "tracks"}
+        store.put_playlist(entry, playlist_tracks(db, pl))
+    store.commit_sync([pl["id"] for pl in db.get("playlists", [])])
+    return store
+
+
+def open_store(settings: dict = None, recover: bool = False):
+    """
+    Open the storage backend selected in settings.json ("storage").
+    With `recover`, a file that cannot be read (corrupt pack or SQLite DB)
+    is renamed to *.corrupt and an empty store is opened in its place, for
+    the next sync to fill.
+    """
+    settings = settings if settings is not None else load_settings()
+    storage = settings.get("storage")
+    try:
+        return _open_store(storage)
+    except (ValueError, sqlite3.DatabaseError):
+        if not recover:
+            raise
+    path = {"sqlite": SQLITE_DB, "packed": DATA_PACK}.get(storage, DATA_JSON)
+    # Sin el fichero destino, lo ilegible era el data.json a importar
+    bad = path if os.path.exists(path) else DATA_JSON
+    os.replace(bad, bad + ".corrupt")
+    return _open_store(storage)
+
+
+def _open_store(storage: str):
+    if storage == "sqlite":
+        if not os.path.exists(SQLITE_DB) and os.path.exists(DATA_JSON):
+            return import_json(SqliteStore(SQLITE_DB), DATA_JSON)
+        return SqliteStore(SQLITE_DB)
+    if storage == "packed":
+        if not os.path.exists(DATA_PACK) and os.path.exists(DATA_JSON):
+            return import_json(PackedStore(DATA_PACK), DATA_JSON)
+        return PackedStore(DATA_PACK)
+    return JsonStore(DATA_JSON)
+
+
+# "0"/"1" -> byte 0/1, para recorrer un bitmap con itertools.compress
+_BIT_BYTES = bytes.maketrans(b"01", b"\x00\x01")
+
+
+def _bitmap(indices) -> int:
+    """Int bitmap with bit i set for every track index i."""
+    indices = list(indices)
+    if not indices:
+        return 0
+    buf = bytearray(max(indices) // 8 + 1)
+    for i in indices:
+        buf[i >> 3] |= 1 << (i & 7)
+    return int.from_bytes(buf, "little")
+
+
+def _bit_positions(bits: int) -> list:
+    """Sorted track indices of the bits set in `bits`."""
+    flags = bin(bits)[:1:-1].encode("ascii").translate(_BIT_BYTES)
+    return list(compress(range(len(flags)), flags))
+
+
+class TrackIndex:
+    """
+    Precomputed indexes over a store for composite track selections.
+
+    Every track is a bit position (its index in the store's track table) and
+    every playlist, artist and album is an int bitmap over them, so unions,
+    intersections and exclusions are single big-int operations. Playlist
+    bitmaps are built once here; artist and album bitmaps on the first filter
+    by them, since that needs every track. Build a new index after a sync.
+    """
+
+    def __init__(self, store):
+        self.store = store
+        self.playlists = {
+            pl_id: _bitmap(store.playlist_indices(pl_id))
+            for pl_id, _name, _count in store.playlist_summaries()
+        }
+        self._artists = None
+        self._albums = None
+
+    def select(
+        self,
+        sources: list,
+        intersect: bool = False,
+        exclude: list = (),
+        artists: list = (),
+        albums: list = (),
+    ) -> list:
+        """
+        Track indices in the union (or intersection) of the `sources`
+        playlists, minus those in any `exclude` playlist, keeping only tracks
+        by one of `artists` and from one of `albums` (case-insensitive; an
+        empty list means no filter).
+        """
+        maps = [self.playlists.get(pl_id, 0) for pl_id in sources]
+        if not maps:
+            return []
+        bits = maps[0]
+        for other in maps[1:]:
+            bits = bits & other if intersect else bits | other
+        for pl_id in exclude:
+            bits &= ~self.playlists.get(pl_id, 0)
+        if artists or albums:
+            self._build_meta()
+        if artists:
+            bits &= self._any(self._artists, artists)
+        if albums:
+            bits &= self._any(self._albums, albums)
+        return _bit_positions(bits)
+
+    def tracks(self, indices) -> list:
+        return self.store.tracks_at(indices)
+
+    def source_of(self, indices, sources: list) -> list:
+        """For each index, the first of `sources` that contains it."""
+        owner = {}
+        for pl_id in reversed(sources):  # las primeras fuentes ganan
+            for i in _bit_positions(self.playlists.get(pl_id, 0)):
+                owner[i] = pl_id
+        return [owner.get(i) for i in indices]
+
+    @staticmethod
+    def _any(index: dict, names: list) -> int:
+        bits = 0
+        for name in names:
+            bits |= index.get(name.casefold(), 0)
+        return bits
+
+    def _build_meta(self):
+        if self._artists is not None:
+            return
+        artists = {}
+        albums = {}
+        for idx, track in self.store.iter_tracks():
+            for name in track.get("artists") or []:
+                if name:
+                    artists.setdefault(name.casefold(), []).append(idx)
+            if track.get("album"):
+                albums.setdefault(track["album"].casefold(), []).append(idx)
+        self._artists = {k: _bitmap(v) for k, v in artists.items()}
+        self._albums = {k: _bitmap(v) for k, v in albums.items()}
+
+
+class GenerationHistory:
+    """
+    Persisted history of generation runs and the tracks chosen in each
+    (history.json, at most HISTORY_MAX_GENERATIONS, oldest evicted first).
+    One run is one generation, however many playlists it created.
+
+    Generations are numbered; `_last_seen` maps every track to the number of
+    the last generation that picked it, so "was it picked in the last N
+    generations?" is one dict lookup per candidate.
+    """
+
+    def __init__(self, path: str = HISTORY_JSON):
+        self.path = path
+        self._lock = threading.Lock()
+        data = {}
+        if os.path.exists(path):
+            try:
+                with open(path, "r", encoding="utf-8") as f:
+                    data = json.load(f)
+            except Exception:
+                data = {}
+        self.generations = data.get("generations", [])
+        self.next_seq = data.get("next_seq", len(self.generations))
+        self._last_seen = {}
+        for gen in self.generations:
+            for key in gen["tracks"]:
+                self._last_seen[key] = gen["seq"]
+
+    @staticmethod
+    def _key(uri: str) -> str:
+        # "spotify:track:<id>" -> "<id>"; otros URIs (locales) tal cual
+        return uri[14:] if uri.startswith("spotify:track:") else uri
+
+    def recent(self, uri: str, last_n: int) -> bool:
+        """Whether `uri` was picked in one of the last `last_n` generations."""
+        seq = self._last_seen.get(self._key(uri))
+        return seq is not None and seq >= self.next_seq - last_n
+
+    def weights(self, tracks: list, last_n: int, mode: str = "penalise") -> list:
+        """
+        Sampling weights parallel to `tracks`: tracks picked in the last
+        `last_n` generations get 0 ("exclude") or HISTORY_PENALTY.
+        """
+        low = 0.0 if mode == "exclude" else HISTORY_PENALTY
+        with self._lock:
+            return [
+                low if t.get("uri") and self.recent(t["uri"], last_n) else 1.0
+                for t in tracks
+            ]
+
+    def record(self, playlists: list, uris: list):
+        """
+        Append one generation (its `playlists` as {"playlist_id", "name"} and
+        every URI they got) and save, evicting the oldest if needed.
+        """
+        with self._lock:
+            gen = {
+                "seq": self.next_seq,
+                "at": datetime.now().isoformat(timespec="seconds"),
+                "playlists": playlists,
+                "tracks": [self._key(u) for u in uris],
+            }
+            self.next_seq += 1
+            self.generations.append(gen)
+            for key in gen["tracks"]:
+                self._last_seen[key] = gen["seq"]
+            while len(self.generations) > HISTORY_MAX_GENERATIONS:
+                old = self.generations.pop(0)
+                for key in old["tracks"]:
+                    if self._last_seen.get(key) == old["seq"]:
+                        del self._last_seen[key]
+            save_db(
+                {
+                    "version": 1,
+                    "next_seq": self.next_seq,
+                    "generations": self.generations,
+                },
+                self.path,
+            )
+
+
 @dataclass
 class SpotifyCreds:
     client_id: str
@@ -262,32 +1488,867 @@ def load_creds() -> SpotifyCreds or None:
     return None
 
 
+# ===========================
+# ---- METRICS           ----
+# ===========================
+
+
+class ApiMetrics:
+    """
+    Per-endpoint counters for every HTTP request to the API, shared by all
+    threads and the asyncio client: calls by status, latency histogram
+    (LATENCY_BUCKETS_MS), total seconds and response bytes, plus the time
+    spent sleeping before requests. Endpoints are keyed by method and path
+    with ids replaced ("GET playlists/{id}/tracks").
+
+    Counters only grow; report(since=snapshot()) gives the share of one job.
+    """
+
+    _ID = re.compile(r"(?<=/)[A-Za-z0-9]{22}(?=/|$)")
+    _USER = re.compile(r"^users/[^/]+/")
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._endpoints = {}
+        self._sleep = 0.0
+
+    def record(self, method: str, path: str, status: int, seconds: float, size: int):
+        """Count one finished request (`path` relative to the API prefix)."""
+        path = path.split("?", 1)[0].strip("/")
+        endpoint = f"{method} " + self._USER.sub(
+            "users/{id}/", self._ID.sub("{id}", path)
+        )
+        bucket = bisect.bisect_left(LATENCY_BUCKETS_MS, seconds * 1000.0)
+        with self._lock:
+            ep = self._endpoints.get(endpoint)
+            if ep is None:
+                ep = self._endpoints[endpoint] = {
+                    "status": {},
+                    "seconds": 0.0,
+                    "bytes": 0,
+                    "buckets": [0] * (len(LATENCY_BUCKETS_MS) + 1),
+                }
+            ep["status"][status] = ep["status"].get(status, 0) + 1
+            ep["seconds"] += seconds
+            ep["bytes"] += size
+            ep["buckets"][bucket] += 1
+
+    def slept(self, seconds: float):
+        with self._lock:
+            self._sleep += seconds
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            return {
+                "sleep": self._sleep,
+                "endpoints": {
+                    k: {
+                        "status": dict(v["status"]),
+                        "seconds": v["seconds"],
+                        "bytes": v["bytes"],
+                        "buckets": list(v["buckets"]),
+                    }
+                    for k, v in self._endpoints.items()
+                },
+            }
+
+    def report(self, since: dict = None) -> dict:
+        """Counters (minus `since`) with p50/p95 latency per endpoint."""
+        now = self.snapshot()
+        before = (since or {}).get("endpoints", {})
+        endpoints = {}
+        for name, ep in sorted(now["endpoints"].items()):
+            old = before.get(name)
+            if old:
+                status = {
+                    k: n - old["status"].get(k, 0) for k, n in ep["status"].items()
+                }
+                buckets = [a - b for a, b in zip(ep["buckets"], old["buckets"])]
+                seconds = ep["seconds"] - old["seconds"]
+                size = ep["bytes"] - old["bytes"]
+            else:
+                status, buckets = ep["status"], ep["buckets"]
+                seconds, size = ep["seconds"], ep["bytes"]
+            calls = sum(buckets)
+            if not calls:
+                continue
+            endpoints[name] = {
+                "calls": calls,
+                "status": {str(k): n for k, n in sorted(status.items()) if n},
+                # 429/5xx: el limitador los reintenta
+                "retried": sum(n for k, n in status.items() if k == 429 or k >= 500),
+                "seconds": round(seconds, 3),
+                "bytes": size,
+                "p50_ms": self._percentile(buckets, 0.50),
+                "p95_ms": self._percentile(buckets, 0.95),
+                "histogram_ms": {
+                    label: n for label, n in zip(self._labels(), buckets) if n
+                },
+            }
+        return {
+            "sleep_seconds": round(now["sleep"] - (since or {}).get("sleep", 0.0), 3),
+            "endpoints": endpoints,
+        }
+
+    @staticmethod
+    def _labels() -> list:
+        return [f"<={b}" for b in LATENCY_BUCKETS_MS] + [f">{LATENCY_BUCKETS_MS[-1]}"]
+
+    @staticmethod
+    def _percentile(buckets: list, q: float):
+        """Upper bound (ms) of the bucket holding quantile `q`; None past the last."""
+        target = q * sum(buckets)
+        seen = 0
+        for bound, n in zip(LATENCY_BUCKETS_MS, buckets):
+            seen += n
+            if seen >= target:
+                return bound
+        return None
+
+
+# Métricas compartidas por todas las peticiones a la API
+API_METRICS = ApiMetrics()
+
+
+def _meter_response(resp, *args, **kwargs):
+    """requests response hook that reports every response to API_METRICS."""
+    request = resp.request
+    url = request.url or ""
+    path = url.split("/v1/", 1)[1] if "/v1/" in url else urllib.parse.urlsplit(url).path
+    # elapsed llega hasta las cabeceras; sin stream=True se lee aquí el
+    # cuerpo para que su tiempo entre en la medida
+    start = time.monotonic()
+    size = len(resp.content) if not kwargs.get("stream") else 0
+    API_METRICS.record(
+        request.method,
+        path,
+        resp.status_code,
+        resp.elapsed.total_seconds() + time.monotonic() - start,
+        size,
+    )
+
+
+class JobTrace:
+    """
+    Timings of one sync or generation: wall time per phase plus the API
+    metrics and limiter counters accumulated while it ran. report() gives a
+    JSON-ready dict; write() appends it as one line to a metrics file.
+    """
+
+    def __init__(self, job: str):
+        self.job = job
+        self.phases = {}
+        self._started = time.monotonic()
+        self._at = datetime.now().isoformat(timespec="seconds")
+        self._api = API_METRICS.snapshot()
+        self._limiter = API_LIMITER.stats()
+
+    @contextlib.contextmanager
+    def phase(self, name: str):
+        start = time.monotonic()
+        try:
+            yield
+        finally:
+            self.phases[name] = round(
+                self.phases.get(name, 0.0) + time.monotonic() - start, 3
+            )
+
+    def report(self) -> dict:
+        limiter = API_LIMITER.stats()
+        return {
+            "job": self.job,
+            "at": self._at,
+            "seconds": round(time.monotonic() - self._started, 3),
+            "phases": dict(self.phases),
+            "limiter": {
+                k: (round(v - self._limiter.get(k, 0), 3) if k != "rate" else v)
+                for k, v in limiter.items()
+            },
+            **API_METRICS.report(self._api),
+        }
+
+    @staticmethod
+    def write(report: dict, path: str = METRICS_LOG):
+        """Append `report` as one JSON line (never fails the job)."""
+        try:
+            with open(path, "a", encoding="utf-8") as f:
+                f.write(json.dumps(report, ensure_ascii=False) + "\n")
+        except OSError:
+            pass
+
+
 # ===========================
 # ---- OAUTH / CLIENT    ----
 # ===========================
 
 
-def make_spotify(creds: SpotifyCreds) -> Spotify:
-    """Build a Spotify client with OAuth (opens browser on first auth)."""
-    auth = SpotifyOAuth(
+_memory_cache_handler_cls = None
+
+
+def _memory_cache_handler(cache_path: str):
+    """
+    Token cache kept in memory and written through to the file on disk. The
+    class derives from spotipy's CacheFileHandler, so it is built on first use.
+    """
+    global _memory_cache_handler_cls
+    if _memory_cache_handler_cls is None:
+
+        class _MemoryCacheFileHandler(spotipy.cache_handler.CacheFileHandler):
+            def __init__(self, cache_path: str):
+                super().__init__(cache_path=cache_path)
+                self._token_info = None
+
+            def get_cached_token(self):
+                if self._token_info is None:
+                    self._token_info = super().get_cached_token()
+                return self._token_info
+
+            def save_token_to_cache(self, token_info):
+                self._token_info = token_info
+                super().save_token_to_cache(token_info)
+
+        _memory_cache_handler_cls = _MemoryCacheFileHandler
+    return _memory_cache_handler_cls(cache_path)
+
+
+def _no_auth_prompt(*args, **kwargs):
+    raise RuntimeError("No valid cached OAuth token; sign in from the app first.")
+
+
+def make_spotify(creds: SpotifyCreds, interactive: bool = True) -> spotipy.Spotify:
+    """
+    Build a Spotify client with OAuth (opens browser on first auth).
+    With interactive=False only the cached token is used (refreshed if it
+    expired): a missing, revoked or out-of-scope token raises instead of
+    opening the browser or prompting, also later during requests.
+    Prefer SPOTIFY_SESSION.client(), which reuses one client per process.
+    """
+    auth = spotipy.oauth2.SpotifyOAuth(
         client_id=creds.client_id,
         client_secret=creds.client_secret,
         redirect_uri=creds.redirect_uri,
         scope=SCOPES,
-        open_browser=True,
-        cache_path=".cache-spotify-rand",  # token cache on disk
+        open_browser=interactive,
+        cache_handler=_memory_cache_handler(TOKEN_CACHE_PATH),  # token cache on disk
     )
+    if not interactive:
+        # spotipy pide el código de autorización por aquí (navegador o input())
+        auth.get_auth_response = _no_auth_prompt
     token = auth.get_access_token(as_dict=False)  # triggers browser if needed
     if not token:
         raise RuntimeError("No OAuth token obtained.")
-    return Spotify(auth_manager=auth)
+    return spotipy.Spotify(auth_manager=auth, requests_session=_make_session())
+
+
+def _make_session() -> requests.Session:
+    """
+    HTTP session that only retries connection errors. 429/5xx responses are
+    surfaced as SpotifyException (with Retry-After) so API_LIMITER sees them.
+    """
+    retry = requests.adapters.Retry(
+        total=3,
+        read=False,
+        status=0,
+        backoff_factor=0.3,
+        respect_retry_after_header=False,
+    )
+    # Pool big enough for every sync worker (or every upload window of a
+    # batch generation) to keep its connection alive
+    adapter = requests.adapters.HTTPAdapter(
+        max_retries=retry, pool_maxsize=max(10, SYNC_WORKERS * ADD_WINDOW)
+    )
+    session = requests.Session()
+    session.hooks["response"].append(_meter_response)
+    session.mount("http://", adapter)
+    session.mount("https://", adapter)
+    return session
 
 
 def verify_creds(creds: SpotifyCreds) -> bool:
-    """Try to authenticate and hit a trivial endpoint."""
-    sp = make_spotify(creds)
-    me = sp.current_user()
-    return bool(me and me.get("id"))
+    """Try to authenticate and hit a trivial endpoint (once per creds)."""
+    return bool(SPOTIFY_SESSION.user_id(creds))
+
+
+class RateLimiter:
+    """
+    Adaptive token bucket shared by every thread that talks to the API.
+
+    Runs at `max_rate` requests/s until a call fails with 429 or 5xx. Then the
+    rate is halved and all callers pause for Retry-After (or an exponential
+    backoff) plus jitter; each successful call ramps the rate back up a little.
+    Counters separate time spent throttled from time spent in API calls.
+    """
+
+    def __init__(
+        self,
+        max_rate: float = API_MAX_REQUESTS_PER_SECOND,
+        min_rate: float = 1.0,
+        max_retries: int = API_MAX_RETRIES,
+    ):
+        self.max_rate = max_rate
+        self.min_rate = min(min_rate, max_rate)
+        self.max_retries = max_retries
+        self.rate = max_rate
+        self._tokens = 1.0
+        self._updated = time.monotonic()
+        self._paused_until = 0.0
+        self._lock = threading.Lock()
+        # Counters (seconds are summed across threads)
+        self.requests = 0
+        self.throttle_events = 0
+        self.throttled_seconds = 0.0
+        self.useful_seconds = 0.0
+
+    def acquire(self):
+        """Block until a token is available (and any backoff pause is over)."""
+        while True:
+            wait = self._take()
+            if not wait:
+                return
+            API_METRICS.slept(wait)
+            time.sleep(wait)
+
+    async def acquire_async(self):
+        """acquire() for coroutines: waits without blocking the event loop."""
+        while True:
+            wait = self._take()
+            if not wait:
+                return
+            API_METRICS.slept(wait)
+            await asyncio.sleep(wait)
+
+    def call(self, fn, *args, **kwargs):
+        """Run one API call under the limiter, retrying on 429/5xx."""
+        return self._call(fn, args, kwargs, retry_5xx=True)
+
+    def call_once(self, fn, *args, **kwargs):
+        """
+        call() for requests that must not be repeated blindly (adding tracks
+        at a position): a 5xx may arrive after the change was applied, so
+        only 429 is retried. A 5xx still slows the limiter down, then it is
+        raised for the caller to check what actually happened.
+        """
+        return self._call(fn, args, kwargs, retry_5xx=False)
+
+    def _call(self, fn, args, kwargs, retry_5xx: bool):
+        attempt = 0
+        while True:
+            self.acquire()
+            start = time.monotonic()
+            try:
+                result = fn(*args, **kwargs)
+            except spotipy.SpotifyException as e:
+                self._add_useful(time.monotonic() - start)
+                if not self._should_retry(e, attempt, retry_5xx):
+                    raise
+                attempt += 1
+                continue
+            self._add_useful(time.monotonic() - start)
+            self._on_success()
+            return result
+
+    async def call_async(self, fn, *args, **kwargs):
+        """call() for a coroutine function, sharing the same budget."""
+        return await self._call_async(fn, args, kwargs, retry_5xx=True)
+
+    async def call_async_once(self, fn, *args, **kwargs):
+        """call_once() for a coroutine function."""
+        return await self._call_async(fn, args, kwargs, retry_5xx=False)
+
+    async def _call_async(self, fn, args, kwargs, retry_5xx: bool):
+        attempt = 0
+        while True:
+            await self.acquire_async()
+            start = time.monotonic()
+            try:
+                result = await fn(*args, **kwargs)
+            except spotipy.SpotifyException as e:
+                self._add_useful(time.monotonic() - start)
+                if not self._should_retry(e, attempt, retry_5xx):
+                    raise
+                attempt += 1
+                continue
+            self._add_useful(time.monotonic() - start)
+            self._on_success()
+            return result
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "requests": self.requests,
+                "throttle_events": self.throttle_events,
+                "throttled_seconds": round(self.throttled_seconds, 3),
+                "useful_seconds": round(self.useful_seconds, 3),
+                "rate": round(self.rate, 2),
+            }
+
+    def _take(self) -> float:
+        """Take a token and return 0, or return how long to wait for one."""
+        with self._lock:
+            now = time.monotonic()
+            self._tokens = min(
+                max(self.rate, 1.0),
+                self._tokens + (now - self._updated) * self.rate,
+            )
+            self._updated = now
+            if now >= self._paused_until and self._tokens >= 1.0:
+                self._tokens -= 1.0
+                return 0.0
+            wait = max(self._paused_until - now, (1.0 - self._tokens) / self.rate)
+            self.throttled_seconds += wait
+            return wait
+
+    def _should_retry(
+        self, e: spotipy.SpotifyException, attempt: int, retry_5xx: bool = True
+    ) -> bool:
+        """
+        On 429/5xx slow down; return True if the call should be repeated
+        (retries left, and for a 5xx only if `retry_5xx`).
+        """
+        status = e.http_status or 0
+        if status != 429 and status < 500:
+            return False
+        self._on_throttled(attempt, (e.headers or {}).get("Retry-After"))
+        return attempt < self.max_retries and (status == 429 or retry_5xx)
+
+    def _add_useful(self, seconds: float):
+        with self._lock:
+            self.requests += 1
+            self.useful_seconds += seconds
+
+    def _on_success(self):
+        with self._lock:
+            # Additive increase: ~max_rate/50 por llamada correcta
+            self.rate = min(self.max_rate, self.rate + self.max_rate / 50.0)
+
+    def _on_throttled(self, attempt: int, retry_after):
+        try:
+            pause = float(retry_after)
+        except (TypeError, ValueError):
+            pause = min(0.5 * (2**attempt), 30.0)
+        pause *= 1.0 + random.uniform(0.0, 0.3)  # jitter
+        with self._lock:
+            self.throttle_events += 1
+            self.rate = max(self.min_rate, self.rate / 2.0)
+            self._tokens = 0.0
+            self._paused_until = max(self._paused_until, time.monotonic() + pause)
+
+
+# Limitador compartido por todos los workers
+API_LIMITER = RateLimiter()
+
+
+class SpotifySession:
+    """
+    Process-wide authenticated client shared by dialogs and workers.
+
+    Keeps one Spotify instance (and its pooled HTTP session) per set of
+    credentials, caches the user id, and refreshes the OAuth token on a
+    background timer shortly before it expires, so no request has to.
+    """
+
+    def __init__(self):
+        self._lock = threading.RLock()
+        self._creds = None
+        self._sp = None
+        self._interactive = True
+        self._user_id = None
+        self._timer = None
+
+    def client(self, creds: SpotifyCreds, interactive: bool = True) -> spotipy.Spotify:
+        """
+        Shared client for `creds`. Background jobs pass interactive=False to
+        get one that never opens the browser (see make_spotify); the client
+        is rebuilt when the mode changes.
+        """
+        with self._lock:
+            # Un cliente adoptado con use() vale para los dos modos
+            stale_mode = self._interactive not in (None, interactive)
+            if self._sp is None or creds != self._creds or stale_mode:
+                self.reset()
+                self._sp = make_spotify(creds, interactive)
+                self._creds = creds
+                self._interactive = interactive
+                self._schedule_refresh()
+            return self._sp
+
+    def user_id(self, creds: SpotifyCreds) -> str:
+        with self._lock:
+            sp = self.client(creds)
+            if self._user_id is None:
+                me = API_LIMITER.call(sp.current_user)
+                self._user_id = (me or {}).get("id")
+            return self._user_id
+
+    def use(self, creds: SpotifyCreds, sp: spotipy.Spotify):
+        """
+        Adopt an already-built client for `creds` instead of authenticating
+        (e.g. one pointed at the local stand-in server of the benchmarks).
+        """
+        with self._lock:
+            self.reset()
+            self._sp = sp
+            self._creds = creds
+            self._interactive = None
+            self._schedule_refresh()
+
+    def reset(self):
+        """Forget the client (e.g. after the credentials change)."""
+        with self._lock:
+            if self._timer is not None:
+                self._timer.cancel()
+            self._creds = None
+            self._sp = None
+            self._user_id = None
+            self._timer = None
+
+    def _schedule_refresh(self):
+        token_info = self._sp.auth_manager.cache_handler.get_cached_token() or {}
+        expires_at = token_info.get("expires_at")
+        if not expires_at:
+            return
+        delay = max(expires_at - TOKEN_REFRESH_MARGIN - time.time(), 5.0)
+        self._timer = threading.Timer(delay, self._refresh, args=(self._sp,))
+        self._timer.daemon = True
+        self._timer.start()
+
+    def _refresh(self, sp: spotipy.Spotify):
+        with self._lock:
+            if sp is not self._sp:
+                return  # the client was replaced meanwhile
+            auth = sp.auth_manager
+            try:
+                token_info = auth.cache_handler.get_cached_token()
+                auth.refresh_access_token(token_info["refresh_token"])
+            except Exception:
+                pass  # spotipy will refresh on the next request instead
+            self._schedule_refresh()
+
+
+SPOTIFY_SESSION = SpotifySession()
+
+
+class AsyncSpotify:
+    """
+    Minimal asyncio client for the Spotify Web API over one pool of
+    keep-alive HTTP/1.1 connections (stdlib streams, no extra dependency).
+    It takes the access token (and API prefix) from a spotipy client, which
+    keeps the token fresh.
+    Every request goes through API_LIMITER, so throttling and retries are
+    shared with the threaded code. Create, use and close it inside one
+    event loop.
+    """
+
+    def __init__(
+        self,
+        sp: spotipy.Spotify,
+        base_url: str = None,
+        max_connections: int = ASYNC_MAX_CONNECTIONS,
+    ):
+        parts = urllib.parse.urlsplit(
+            base_url or getattr(sp, "prefix", SPOTIFY_API_URL)
+        )
+        self._auth = sp.auth_manager
+        self._host = parts.hostname
+        self._tls = parts.scheme == "https"
+        self._port = parts.port or (443 if self._tls else 80)
+        self._prefix = parts.path.rstrip("/") + "/"
+        self._idle = []  # (reader, writer) libres para reutilizar
+        self._slots = asyncio.Semaphore(max_connections)
+
+    async def close(self):
+        while self._idle:
+            _reader, writer = self._idle.pop()
+            writer.close()
+
+    async def get(self, path: str, **params) -> dict:
+        return await API_LIMITER.call_async(self._request, "GET", path, params)
+
+    async def playlist_items_all(
+        self, playlist_id: str, on_page=None, fields: str = PLAYLIST_ITEMS_FIELDS
+    ) -> list:
+        """Every item of a playlist, in order (pages fetched concurrently)."""
+        return await self._all_pages(
+            f"playlists/{playlist_id}/tracks", 100, on_page, fields=fields
+        )
+
+    async def saved_tracks_all(
+        self, offset: int = 0, total: int = None, until: str = None
+    ) -> list:
+        """
+        Saved-track pages (Liked Songs, cut down by _trim_saved_page), newest
+        first, from `offset`. With `until` (an added_at) pages are asked one
+        at a time and paging stops at the first page that reaches it;
+        otherwise, once the total is known, all pages go out at once.
+        """
+
+        async def page(o):
+            return _trim_saved_page(await self.get("me/tracks", limit=50, offset=o))
+
+        pages = []
+        if until is not None or total is None:
+            while total is None or offset < total:
+                pages.append(await page(offset))
+                total = pages[-1].get("total") or 0
+                offset += 50
+                if until is None or _reaches(pages[-1], until):
+                    break
+            if until is not None:
+                return pages
+        pages.extend(await asyncio.gather(*(page(o) for o in range(offset, total, 50))))
+        return pages
+
+    async def add_items(
+        self, playlist_id: str, uris: list, position: int = None
+    ) -> dict:
+        """Insert `uris`; like upload_tracks, a 5xx is raised, not retried."""
+        body = {"uris": uris}
+        if position is not None:
+            body["position"] = position
+        return await API_LIMITER.call_async_once(
+            self._request, "POST", f"playlists/{playlist_id}/tracks", None, body
+        )
+
+    async def _all_pages(self, path: str, limit: int, on_page, **params) -> list:
+        """The first page gives the total; all the others go out at once."""
+
+        async def page(offset):
+            resp = await self.get(path, limit=limit, offset=offset, **params)
+            items = resp.get("items", [])
+            if on_page:
+                on_page(len(items))
+            return resp.get("total", 0), items
+
+        total, items = await page(0)
+        rest = await asyncio.gather(*(page(o) for o in range(limit, total, limit)))
+        for _total, more in rest:
+            items.extend(more)
+        return items
+
+    async def _request(self, method: str, path: str, params=None, body=None) -> dict:
+        target = self._prefix + path
+        if params:
+            target += "?" + urllib.parse.urlencode(params)
+        payload = b"" if body is None else json.dumps(body).encode("utf-8")
+        token = self._auth.get_access_token(as_dict=False)
+        head = [
+            f"{method} {target} HTTP/1.1",
+            f"Host: {self._host}",
+            f"Authorization: Bearer {token}",
+            "Accept: application/json",
+            f"Content-Length: {len(payload)}",
+        ]
+        if body is not None:
+            head.append("Content-Type: application/json")
+        raw = ("\r\n".join(head) + "\r\n\r\n").encode("latin-1") + payload
+
+        async with self._slots:
+            start = time.monotonic()
+            conn = self._idle.pop() if self._idle else None
+            try:
+                if conn is None:
+                    conn = await self._connect()
+                    status, headers, data = await self._roundtrip(conn, raw)
+                else:
+                    try:
+                        status, headers, data = await self._roundtrip(conn, raw)
+                    except (OSError, asyncio.IncompleteReadError):
+                        # El servidor cerró la conexión keep-alive: una nueva
+                        conn[1].close()
+                        conn = await self._connect()
+                        status, headers, data = await self._roundtrip(conn, raw)
+            except BaseException:
+                if conn is not None:
+                    conn[1].close()
+                raise
+            if headers.get("Connection", "").lower() == "close":
+                conn[1].close()
+            else:
+                self._idle.append(conn)
+
+        API_METRICS.record(method, path, status, time.monotonic() - start, len(data))
+        if status >= 400:
+            raise spotipy.SpotifyException(
+                status,
+                -1,
+                f"{target}:\n {data[:200].decode('utf-8', 'replace')}",
+                headers=headers,
+            )
+        return json.loads(data) if data else {}
+
+    async def _connect(self):
+        return await asyncio.open_connection(
+            self._host, self._port, ssl=True if self._tls else None
+        )
+
+    @staticmethod
+    async def _roundtrip(conn, raw: bytes) -> tuple:
+        """Send one request and read (status, headers, body)."""
+        reader, writer = conn
+        writer.write(raw)
+        await writer.drain()
+        status_line = await reader.readline()
+        if not status_line:
+            raise ConnectionResetError("connection closed")
+        status = int(status_line.split()[1])
+        headers = requests.structures.CaseInsensitiveDict()
+        while True:
+            line = await reader.readline()
+            if line in (b"\r\n", b"\n", b""):
+                break
+            key, _, value = line.decode("latin-1").partition(":")
+            headers[key.strip()] = value.strip()
+        if headers.get("Transfer-Encoding", "").lower() == "chunked":
+            chunks = []
+            while True:
+                size = int((await reader.readline()).split(b";")[0], 16)
+                if not size:
+                    while (await reader.readline()) not in (b"\r\n", b"\n", b""):
+                        pass  # trailers
+                    break
+                chunks.append(await reader.readexactly(size))
+                await reader.readexactly(2)
+            data = b"".join(chunks)
+        elif "Content-Length" in headers:
+            data = await reader.readexactly(int(headers["Content-Length"]))
+        else:
+            data = await reader.read()
+            headers["Connection"] = "close"
+        return status, headers, data
+
+
+def _track_record(track: dict) -> dict:
+    """
+    Track as stored locally, from a Spotify track object. Shared by the
+    playlist and Liked Songs paths (threaded and asyncio).
+    """
+    return {
+        "id": track.get("id"),
+        "name": track.get("name"),
+        "uri": track.get("uri"),
+        "artists": [_intern(a.get("name")) for a in track.get("artists") or () if a],
+        "album": _intern((track.get("album") or {}).get("name")),
+    }
+
+
+def _intern(name):
+    """Artist and album names repeat a lot across tracks: keep one copy."""
+    return sys.intern(name) if isinstance(name, str) else name
+
+
+def _trim_saved_page(page: dict) -> dict:
+    """
+    Saved tracks cannot be filtered with `fields`: keep only what the sync
+    uses (total, added_at and the track record) as soon as a page arrives.
+    """
+    return {
+        "total": page.get("total"),
+        "items": [
+            {
+                "added_at": (it or {}).get("added_at"),
+                "track": (
+                    _track_record(it["track"]) if (it or {}).get("track") else None
+                ),
+            }
+            for it in page.get("items", [])
+        ],
+    }
+
+
+def _reaches(saved_page: dict, added_at: str) -> bool:
+    """True if a saved-track page holds a track added at or before `added_at`."""
+    return any(
+        (it or {}).get("added_at") and it["added_at"] <= added_at
+        for it in saved_page.get("items", [])
+    )
+
+
+def paginate(
+    fn, *args, limit: int = 50, prefetch: int = PAGE_PREFETCH, trim=None, **kwargs
+):
+    """
+    Yield the pages of a Spotify paging endpoint (`fn(*args, limit, offset)`)
+    in order, through API_LIMITER. The first page gives `total`; after it up
+    to `prefetch` of the remaining offsets are in flight at once on a small
+    pool and are yielded in order. With prefetch=0 pages are requested one
+    at a time, only when the caller asks for the next one. `trim(page)`, if
+    given, shrinks each page on the thread that fetched it, so the full
+    response is dropped right away.
+    """
+
+    def fetch(offset):
+        page = API_LIMITER.call(fn, *args, limit=limit, offset=offset, **kwargs)
+        return trim(page) if trim else page
+
+    page = fetch(0)
+    yield page
+    if prefetch <= 0:
+        offset = len(page.get("items", []))
+        while len(page.get("items", [])) == limit:
+            page = fetch(offset)
+            offset += len(page.get("items", []))
+            yield page
+        return
+
+    offsets = iter(range(limit, page.get("total") or 0, limit))
+    pool = ThreadPoolExecutor(max_workers=prefetch)
+    try:
+
+        def submit(offset):
+            return pool.submit(fetch, offset)
+
+        window = deque(submit(o) for o in islice(offsets, prefetch))
+        while window:
+            page = window.popleft().result()
+            for o in islice(offsets, 1):
+                window.append(submit(o))
+            yield page
+    finally:
+        pool.shutdown(cancel_futures=True)
+
+
+class ProgressReporter:
+    """
+    Coalesces per-item progress from any number of threads. `callback(pct,
+    rate, eta)` is only called when the percentage changed and at least
+    `interval_ms` passed since the last call (and always on finish()).
+    rate is items/s since start; eta is seconds left, or -1 if unknown.
+    """
+
+    def __init__(self, total: int, callback, interval_ms: int = PROGRESS_INTERVAL_MS):
+        self.total = max(total, 1)
+        self.done = 0
+        self._callback = callback
+        self._interval = interval_ms / 1000.0
+        self._start = time.monotonic()
+        self._last_time = 0.0
+        self._last_pct = -1
+        self._lock = threading.Lock()
+
+    def advance(self, n: int = 1):
+        with self._lock:
+            self.done += n
+            now = time.monotonic()
+            pct = min(int(self.done * 100 / self.total), 100)
+            if pct == self._last_pct or now - self._last_time < self._interval:
+                return
+            self._last_pct = pct
+            self._last_time = now
+            report = self._report(now, pct)
+        self._callback(*report)
+
+    def finish(self):
+        with self._lock:
+            self._last_pct = 100
+            report = self._report(time.monotonic(), 100)
+        self._callback(*report)
+
+    def _report(self, now: float, pct: int) -> tuple:
+        elapsed = now - self._start
+        rate = self.done / elapsed if elapsed > 0 else 0.0
+        remaining = max(self.total - self.done, 0)
+        eta = remaining / rate if rate > 0 else -1.0
+        return pct, rate, eta
 
 
 def _liked_name(lang_key: str) -> str:
@@ -300,173 +2361,723 @@ def _liked_name(lang_key: str) -> str:
 
 
 # ===========================
-# ---- THREADING WORKERS ----
+# ---- SAMPLING          ----
+# ===========================
+
+
+def _weighted_order(count: int, weights: list = None):
+    """
+    Yield 0..count-1 in weighted random order without replacement (A-Res
+    with exponential keys Exp(1)/w, smallest first). Heapify is O(count) and
+    each item taken costs O(log count); items with weight 0 never come out.
+    Without weights it is a lazy Fisher-Yates shuffle: O(1) per item taken.
+    """
+    if weights is None:
+        pool = list(range(count))
+        for i in range(count):
+            j = random.randrange(i, count)
+            pool[i], pool[j] = pool[j], pool[i]
+            yield pool[i]
+        return
+    keys = [(random.expovariate(1.0) / w, i) for i, w in enumerate(weights) if w > 0]
+    heapq.heapify(keys)
+    while keys:
+        yield heapq.heappop(keys)[1]
+
+
+def _quotas(sizes: dict, n: int) -> dict:
+    """
+    Tracks of one playlist from each stratum, proportional to its size (at
+    most sizes[g]). The fractional parts are rounded at random: systematic
+    sampling over the strata in random order gives stratum g its extra track
+    with probability equal to its remainder, so when there are more strata
+    than tracks every one of them can still be picked.
+    """
+    total = sum(sizes.values())
+    if not total:
+        return {}
+    n = min(n, total)
+    order = list(sizes)
+    random.shuffle(order)
+    start = random.random()
+    acc = 0.0
+    quotas = {}
+    for g in order:
+        ideal = n * sizes[g] / total
+        base = int(ideal)
+        # Un punto start + m (m entero) cae en (acc, acc + resto]: uno más
+        extra = math.floor(acc + ideal - base - start) - math.floor(acc - start)
+        acc += ideal - base
+        quotas[g] = min(base + extra, sizes[g])
+    # El redondeo en coma flotante puede dejar una de más o de menos
+    missing = n - sum(quotas.values())
+    for g in order:
+        if not missing:
+            break
+        step = 1 if missing > 0 else -1
+        if 0 <= quotas[g] + step <= sizes[g]:
+            quotas[g] += step
+            missing -= step
+    return quotas
+
+
+def _sample_capped(artists: list, n: int, k: int, weights, cap: int) -> list:
+    """k lists of n positions with at most `cap` tracks per artist in each."""
+    picks = [[] for _ in range(k)]
+    counts = [{} for _ in range(k)]
+    pending = list(range(k))
+    for j in _weighted_order(len(artists), weights):
+        artist = artists[j]
+        for p in pending:
+            if artist is None or counts[p].get(artist, 0) < cap:
+                picks[p].append(j)
+                if artist is not None:
+                    counts[p][artist] = counts[p].get(artist, 0) + 1
+                if len(picks[p]) == n:
+                    pending.remove(p)
+                break
+        if not pending:
+            break
+    return picks
+
+
+def _sample_stratified(keys: list, n: int, k: int, weights) -> list:
+    """
+    k lists of n positions, each stratum (key) represented by its size. The
+    quotas are drawn again for every list from the tracks still unused, so
+    the lists stay disjoint and strata smaller than k are not left out.
+    """
+    groups = {}
+    for j, key in enumerate(keys):
+        groups.setdefault(key, []).append(j)
+    # Cada estrato en orden aleatorio (ponderado); las listas lo van consumiendo
+    queues = {}
+    for g, members in groups.items():
+        sub = None if weights is None else [weights[j] for j in members]
+        queue = deque(members[x] for x in _weighted_order(len(members), sub))
+        if queue:
+            queues[g] = queue
+    picks = []
+    for _ in range(k):
+        quotas = _quotas({g: len(q) for g, q in queues.items() if q}, n)
+        pick = [queues[g].popleft() for g, q in quotas.items() for _ in range(q)]
+        random.shuffle(pick)  # no dejar los estratos en bloques
+        picks.append(pick)
+    return picks
+
+
+def sample_playlists(
+    tracks: list,
+    n: int,
+    k: int = 1,
+    mode: str = "uniform",
+    weights: list = None,
+    strata: list = None,
+    artist_cap: int = ARTIST_CAP,
+) -> list:
+    """
+    Draw up to `k` disjoint lists of `n` URIs from `tracks` (track dicts).
+
+    Modes: "uniform"; "artist" (at most `artist_cap` tracks per main artist
+    in each list); "album" or "playlist" (stratified: every album, or every
+    source given by the parallel `strata` list, gets a share proportional to
+    its size). `weights`, parallel to `tracks`, biases every mode (0 = never
+    pick). If the source is too small, each list gets an equal share of it
+    (at least one track, so there may be fewer than `k` lists).
+    """
+    # Una entrada por URI, para que las listas sean disjuntas
+    first = {}
+    for i, t in enumerate(tracks):
+        if t.get("uri") and t["uri"] not in first:
+            first[t["uri"]] = i
+    keep = list(first.values())
+    if not keep:
+        return []
+    n = max(1, min(n, len(keep) // k))
+    k = min(k, len(keep) // n)
+    w = None if weights is None else [weights[i] for i in keep]
+
+    if mode == "artist":
+        artists = []
+        for i in keep:
+            names = tracks[i].get("artists") or []
+            artists.append(names[0].casefold() if names and names[0] else None)
+        picks = _sample_capped(artists, n, k, w, max(1, artist_cap))
+    elif mode in ("album", "playlist"):
+        if mode == "album":
+            keys = [tracks[i].get("album") or "" for i in keep]
+        else:
+            keys = [strata[i] if strata else None for i in keep]
+        picks = _sample_stratified(keys, n, k, w)
+    elif w is None:
+        chosen = random.sample(range(len(keep)), n * k)
+        picks = [chosen[p * n : (p + 1) * n] for p in range(k)]
+    else:
+        chosen = list(islice(_weighted_order(len(keep), w), n * k))
+        picks = [chosen[p * n : (p + 1) * n] for p in range(k)]
+    return [[tracks[keep[j]]["uri"] for j in p] for p in picks if p]
+
+
+# ===========================
+# ---- SYNC / GENERATE   ----
 # ===========================
 
 
-class WorkerSignals(QtCore.QObject):
-    progress = QtCore.pyqtSignal(int)  # 0-100
-    status = QtCore.pyqtSignal(str)  # status text
-    error = QtCore.pyqtSignal(str)  # error text
-    done = QtCore.pyqtSignal(object)  # payload (e.g., result)
+def _no_progress(pct: int, rate: float, eta: float):
+    pass
 
 
-class UpdateDBWorker(QtCore.QRunnable):
+class SyncJob:
     """
-    Background task: enumerate all playlists and tracks into data.json
-    Emits progress by total tracks.
+    Enumerate all playlists and tracks into the local store (JsonStore,
+    PackedStore or SqliteStore). Reports progress by total tracks through
+    `on_progress(pct, rate, eta)`. Playlists are paged in parallel by a pool
+    of `workers` threads sharing API_LIMITER, and each one is handed to the
+    store as soon as it is complete.
+
+    If `incremental`, playlists whose snapshot_id did not change keep their
+    stored tracks instead of being re-paged, and Liked Songs are only paged
+    until the first already-known added_at.
+
+    With `use_async`, changed playlists and the rest of Liked Songs are paged
+    by one AsyncSpotify event loop instead of the thread pool: every page of
+    every playlist is in flight at once, bounded only by API_LIMITER and the
+    connection pool.
+
+    After run() (even a failed one) `metrics` holds the JobTrace report,
+    also appended to `metrics_log` if given.
+
+    With interactive=False (background syncs) the job only authenticates
+    from the token cache and fails instead of opening the browser.
     """
 
-    def __init__(self, lang_key: str, creds: SpotifyCreds):
-        super().__init__()
-        self.signals = WorkerSignals()
+    def __init__(
+        self,
+        lang_key: str,
+        creds: SpotifyCreds,
+        store,
+        incremental: bool = True,
+        workers: int = SYNC_WORKERS,
+        on_progress=None,
+        use_async: bool = False,
+        metrics_log: str = None,
+        interactive: bool = True,
+    ):
         self.lang_key = lang_key
         self.creds = creds
+        self.store = store
+        self.incremental = incremental
+        self.workers = max(1, workers)
+        self.use_async = use_async
+        self.on_progress = on_progress or _no_progress
+        self.metrics_log = metrics_log
+        self.interactive = interactive
+        self.metrics = None
 
     def run(self):
+        """Run the sync and return the updated store."""
+        trace = JobTrace("sync")
         try:
-            sp = make_spotify(self.creds)
-            # First pass: count total tracks across all playlists
-            playlists = []
-            limit = 50
-            offset = 0
-            total_playlists = None
-
-            while True:
-                resp = sp.current_user_playlists(limit=limit, offset=offset)
-                if total_playlists is None:
-                    total_playlists = resp.get("total", 0)
-                items = resp.get("items", [])
-                playlists.extend(items)
-                offset += len(items)
-                if not items or offset >= total_playlists:
-                    break
-                time.sleep(API_SLEEP_SECONDS)
+            return self._run(trace)
+        finally:
+            self.metrics = trace.report()
+            if self.metrics_log:
+                JobTrace.write(self.metrics, self.metrics_log)
+
+    def has_changes(self) -> bool:
+        """
+        Cheap check before a background sync: one request per 50 playlists
+        plus one saved track. True if a playlist was added, removed or has a
+        new snapshot_id, if the Liked Songs total or newest added_at moved,
+        or if the sync is not incremental.
+        """
+        if not self.incremental:
+            return True
+        sp = SPOTIFY_SESSION.client(self.creds, self.interactive)
+        known = self.store.playlist_meta()
+        prev_liked = known.pop(LIKED_ID, None) or {}
+        snapshots = {}
+        for resp in paginate(sp.current_user_playlists, limit=50):
+            for pl in resp.get("items", []):
+                snapshots[pl["id"]] = pl.get("snapshot_id")
+        if snapshots != {pid: meta.get("snapshot_id") for pid, meta in known.items()}:
+            return True
+        saved = API_LIMITER.call(sp.current_user_saved_tracks, limit=1)
+        items = saved.get("items") or []
+        latest = items[0].get("added_at") if items else None
+        return (saved.get("total") or 0) != (prev_liked.get("total") or 0) or (
+            latest != prev_liked.get("latest_added_at")
+        )
 
-            # Gather total tracks number
-            total_tracks = 0
-            for pl in playlists:
+    def _run(self, trace: JobTrace):
+        sp = SPOTIFY_SESSION.client(self.creds, self.interactive)
+        # First pass: count total tracks across all playlists
+        playlists = []
+        with trace.phase("list_playlists"):
+            for resp in paginate(sp.current_user_playlists, limit=50):
+                playlists.extend(resp.get("items", []))
+
+        # Stored playlist metadata, by id (empty on a full sync)
+        stored = self.store.playlist_meta()
+        known = stored if self.incremental else {}
+
+        # Reopens the journal of an interrupted sync, if there is one
+        self.store.begin_sync()
+        journaled = self.store.journaled()
+
+        # Only playlists whose snapshot changed (or are new) need paging;
+        # those already saved by an interrupted sync are not even re-put
+        unchanged = set()
+        resumed = set()
+        for pl in playlists:
+            prev = known.get(pl["id"])
+            snapshot = pl.get("snapshot_id")
+            if snapshot and journaled.get(pl["id"]) == snapshot:
+                resumed.add(pl["id"])
+            elif prev and snapshot and prev.get("snapshot_id") == snapshot:
+                unchanged.add(pl["id"])
+
+        # Gather total tracks number
+        total_tracks = 0
+        for pl in playlists:
+            if pl["id"] not in unchanged and pl["id"] not in resumed:
                 total_tracks += pl.get("tracks", {}).get("total", 0)
 
-            # --- NEW: count liked songs (saved tracks) ---
-            liked_limit = 50
-            liked_total = 0
+        # --- NEW: count liked songs (saved tracks) ---
+        # La primera página da el total y luego se reutiliza al descargar
+        prev_liked = known.get(LIKED_ID)
+        liked_resumed = LIKED_ID in journaled
+        liked_first = None
+        liked_pages = None
+        liked_total = 0
+        if not liked_resumed:
             try:
-                liked_first = sp.current_user_saved_tracks(limit=liked_limit, offset=0)
+                with trace.phase("liked"):
+                    if self.use_async:
+                        # Solo la primera página: el resto va por el cliente asyncio
+                        liked_first = _trim_saved_page(
+                            API_LIMITER.call(sp.current_user_saved_tracks, limit=50)
+                        )
+                    else:
+                        liked_pages = self._liked_pages(sp, prev_liked)
+                        liked_first = next(liked_pages)
                 liked_total = liked_first.get("total", 0) or 0
             except Exception:
-                liked_total = 0
-
-            total_tracks += liked_total
-
-            # Avoid division by zero
-            total_tracks = max(total_tracks, 1)
-
-            # Second pass: fetch tracks for each playlist
-            db = {
-                "generated_at": datetime.now().isoformat(timespec="seconds"),
-                "playlists": [],
-            }
-            done_tracks = 0
-
+                liked_first = liked_pages = None
+        if prev_liked and prev_liked.get("latest_added_at"):
+            # Solo se esperan las canciones añadidas desde la última sync
+            liked_expected = max(liked_total - prev_liked.get("total", 0), 0)
+        else:
+            liked_expected = liked_total
+        if not liked_resumed:
+            total_tracks += liked_expected
+
+        self._progress = ProgressReporter(total_tracks, self.on_progress)
+
+        # Second pass: fetch tracks for each playlist
+        with trace.phase("store"):
             for pl in playlists:
-                pl_entry = {
-                    "id": pl["id"],
-                    "name": pl["name"],
-                    "owner": pl.get("owner", {}).get("display_name") or "",
-                    "tracks": [],
+                if pl["id"] in unchanged:
+                    self.store.put_playlist(self._entry(pl))
+
+        # Descarga en paralelo las playlists que cambiaron; el orden de
+        # páginas dentro de cada playlist se conserva y cada una se guarda
+        # en cuanto termina.
+        changed = [
+            pl
+            for pl in playlists
+            if pl["id"] not in unchanged and pl["id"] not in resumed
+        ]
+        # "store" (guardar cada playlist) se mide también dentro de "playlists"
+        liked_async = None
+        liked_done = liked_resumed
+        if self.use_async:
+            liked = None
+            if liked_first is not None:
+                liked = (liked_first, prev_liked, liked_total)
+            with trace.phase("playlists"):
+                liked_async = asyncio.run(self._fetch_async(sp, changed, trace, liked))
+            changed = []
+        pool = ThreadPoolExecutor(max_workers=self.workers)
+        try:
+            with trace.phase("playlists"):
+                futures = {
+                    pool.submit(self._fetch_playlist, sp, pl["id"]): pl
+                    for pl in changed
                 }
-                # paginate tracks
-                t_limit = 100
-                t_offset = 0
-                while True:
-                    tr = sp.playlist_items(pl["id"], limit=t_limit, offset=t_offset)
-                    items = tr.get("items", [])
-                    for it in items:
-                        track = it.get("track") or {}
-                        if not track:
-                            continue
-                        pl_entry["tracks"].append(
-                            {
-                                "id": track.get("id"),
-                                "name": track.get("name"),
-                                "uri": track.get("uri"),
-                                "artists": [
-                                    a.get("name") for a in track.get("artists", []) if a
-                                ],
-                                "album": track.get("album", {}).get("name"),
-                            }
-                        )
-                        done_tracks += 1
-                        pct = int((done_tracks / total_tracks) * 100)
-                        self.signals.progress.emit(min(pct, 100))
-                    t_offset += len(items)
-                    if not items or len(items) < t_limit:
-                        break
-                    time.sleep(API_SLEEP_SECONDS)
-                db["playlists"].append(pl_entry)
-
-            # --- NEW: fetch liked/saved tracks as a virtual playlist ---
-            liked_tracks = []
-            t_limit = 50
-            t_offset = 0
-
+                for fut in as_completed(futures):
+                    # pop: no retener en memoria las playlists ya guardadas
+                    pl = futures.pop(fut)
+                    tracks = fut.result()
+                    with trace.phase("store"):
+                        self.store.put_playlist(self._entry(pl), tracks)
+        finally:
+            pool.shutdown(wait=True, cancel_futures=True)
+
+        # --- NEW: fetch liked/saved tracks as a virtual playlist ---
+        # (si la sync interrumpida ya la guardó, no se vuelve a pedir)
+        if liked_pages is not None or liked_async is not None:
             try:
-                while True:
-                    saved = sp.current_user_saved_tracks(limit=t_limit, offset=t_offset)
-                    items = saved.get("items", [])
-                    for it in items:
-                        track = (it or {}).get("track") or {}
-                        if not track:
-                            continue
-                        liked_tracks.append(
-                            {
-                                "id": track.get("id"),
-                                "name": track.get("name"),
-                                "uri": track.get("uri"),
-                                "artists": [
-                                    a.get("name") for a in track.get("artists", []) if a
-                                ],
-                                "album": track.get("album", {}).get("name"),
-                            }
+                with trace.phase("liked"):
+                    if liked_async is not None:
+                        liked_tracks, latest_added_at = liked_async
+                    else:
+                        liked_tracks, latest_added_at = self._fetch_liked(
+                            liked_first, liked_pages, prev_liked, liked_total
+                        )
+                    if liked_tracks is None:
+                        # El delta no cuadra con el total (se quitaron canciones):
+                        # se vuelve a paginar la lista completa.
+                        liked_pages = self._liked_pages(sp, None)
+                        liked_tracks, latest_added_at = self._fetch_liked(
+                            next(liked_pages), liked_pages, None, liked_total
                         )
-                        # Avanza la barra de progreso usando el total combinado
-                        done_tracks += 1
-                        pct = int((done_tracks / total_tracks) * 100)
-                        self.signals.progress.emit(min(pct, 100))
-                    t_offset += len(items)
-                    if not items or len(items) < t_limit:
-                        break
-                    time.sleep(API_SLEEP_SECONDS)
 
                 # Inserta la playlist virtual al DB
                 if liked_tracks:
-                    db["playlists"].append(
-                        {
-                            "id": "__liked__",  # ID virtual
-                            "name": _liked_name(self.lang_key),  # Nombre localizado
-                            "owner": "",  # sin dueño visible
-                            "tracks": liked_tracks,
-                        }
-                    )
+                    with trace.phase("store"):
+                        self.store.put_playlist(
+                            {
+                                "id": LIKED_ID,  # ID virtual
+                                "name": _liked_name(self.lang_key),  # Nombre localizado
+                                "owner": "",  # sin dueño visible
+                                "latest_added_at": latest_added_at,
+                                "total": liked_total,
+                            },
+                            liked_tracks,
+                        )
+                liked_done = True
 
             except Exception:
-                # Si falla, simplemente no la añadimos (no rompemos la actualización)
+                # Si falla no se rompe la actualización (se conserva la anterior)
                 pass
+        if not liked_done and LIKED_ID in stored:
+            # Como una playlist sin cambios: sin tracks, commit_sync mantiene
+            # la copia guardada y su latest_added_at/total para el delta
+            with trace.phase("store"):
+                self.store.put_playlist(
+                    {
+                        **stored[LIKED_ID],
+                        "name": stored[LIKED_ID].get("name")
+                        or _liked_name(self.lang_key),
+                        "owner": "",
+                    }
+                )
 
-            with open(DATA_JSON, "w", encoding="utf-8") as f:
-                json.dump(db, f, ensure_ascii=False, indent=2)
+        with trace.phase("commit"):
+            self.store.commit_sync([pl["id"] for pl in playlists] + [LIKED_ID])
+        self._progress.finish()
+
+        return self.store
+
+    @staticmethod
+    def _entry(pl: dict) -> dict:
+        """Playlist metadata as stored locally (without tracks)."""
+        return {
+            "id": pl["id"],
+            "name": pl["name"],
+            "owner": pl.get("owner", {}).get("display_name") or "",
+            "snapshot_id": pl.get("snapshot_id"),
+        }
+
+    async def _fetch_async(self, sp, playlists: list, trace: JobTrace, liked=None):
+        """
+        Page `playlists` concurrently and store each one as it completes, on
+        a worker thread (one at a time) so journal fsyncs and SQLite
+        transactions never stall the requests in flight. With `liked` (first page, prev_liked, total) the rest of Liked Songs
+        is paged on the same loop; returns its (tracks, latest_added_at), or
+        None if that failed (the sync goes on without it, as with threads).
+        """
+        api = AsyncSpotify(sp)
+        # Un solo escritor: los stores no admiten put_playlist concurrentes
+        store_lock = asyncio.Lock()
+
+        async def fetch(pl):
+            items = await api.playlist_items_all(
+                pl["id"], on_page=self._progress.advance
+            )
+            tracks = [
+                _track_record(it["track"]) for it in items if it and it.get("track")
+            ]
+            async with store_lock:
+                with trace.phase("store"):
+                    await asyncio.to_thread(
+                        self.store.put_playlist, self._entry(pl), tracks
+                    )
 
-            self.signals.done.emit(db)
-        except Exception as e:
-            self.signals.error.emit(
-                f"{type(e).__name__}: {str(e)}\n{traceback.format_exc()}"
+        async def fetch_liked():
+            try:
+                return await self._fetch_liked_async(api, *liked)
+            except Exception:
+                return None
+
+        try:
+            jobs = [fetch(pl) for pl in playlists]
+            if liked is not None:
+                jobs.append(fetch_liked())
+            results = await asyncio.gather(*jobs)
+        finally:
+            await api.close()
+        return results[-1] if liked is not None else None
+
+    async def _fetch_liked_async(self, api, first, prev_liked, liked_total):
+        """_fetch_liked with the pages after `first` requested by AsyncSpotify."""
+        known_latest = (prev_liked or {}).get("latest_added_at")
+        rest = []
+        if not (known_latest and _reaches(first, known_latest)):
+            rest = await api.saved_tracks_all(
+                offset=50, total=liked_total, until=known_latest
+            )
+        tracks, latest_added_at = self._fetch_liked(
+            first, (page for page in rest), prev_liked, liked_total
+        )
+        if tracks is None:
+            # El delta no cuadra con el total: se vuelve a paginar la lista completa
+            pages = await api.saved_tracks_all()
+            tracks, latest_added_at = self._fetch_liked(
+                pages[0], (page for page in pages[1:]), None, liked_total
             )
+        return tracks, latest_added_at
+
+    def _fetch_playlist(self, sp, playlist_id):
+        """Page all tracks of one playlist, in order. Runs on the sync pool."""
+        tracks = []
+        for tr in paginate(
+            sp.playlist_items, playlist_id, limit=100, fields=PLAYLIST_ITEMS_FIELDS
+        ):
+            items = tr.get("items", [])
+            for it in items:
+                track = (it or {}).get("track")
+                if track:
+                    tracks.append(_track_record(track))
+            self._progress.advance(len(items))
+        return tracks
+
+    @staticmethod
+    def _liked_pages(sp, prev_liked):
+        """
+        Trimmed saved-track pages, newest first. Nothing is requested until
+        the first page is taken.
+        """
+        # Incremental: normalmente basta la primera página, no adelantar otras
+        known_latest = (prev_liked or {}).get("latest_added_at")
+        return paginate(
+            sp.current_user_saved_tracks,
+            limit=50,
+            prefetch=0 if known_latest else PAGE_PREFETCH,
+            trim=_trim_saved_page,
+        )
+
+    def _fetch_liked(self, first, pages, prev_liked, liked_total):
+        """
+        Consume saved-track `pages` (from _liked_pages; `first` is the page
+        already taken from it). With `prev_liked`, stop at the first
+        already-known added_at and prepend the new tracks to the known ones.
+        Returns (tracks, latest_added_at), or (None, None) if the known total
+        plus the new items does not match `liked_total` (tracks were removed)
+        and a full re-page is needed.
+        """
+        known_latest = (prev_liked or {}).get("latest_added_at")
+        liked_tracks = []
+        seen = 0
+        latest_added_at = None
+        reached_known = False
+
+        for saved in chain((first,), pages):
+            items = saved.get("items", [])
+            seen_before = seen
+            for it in items:
+                added_at = (it or {}).get("added_at")
+                if known_latest and added_at and added_at <= known_latest:
+                    reached_known = True
+                    break
+                seen += 1
+                if added_at and (latest_added_at is None or added_at > latest_added_at):
+                    latest_added_at = added_at
+                if it["track"]:
+                    liked_tracks.append(it["track"])
+            # Avanza la barra de progreso usando el total combinado
+            self._progress.advance(seen - seen_before)
+            if reached_known:
+                pages.close()
+                break
+
+        if known_latest:
+            liked_tracks.extend(self.store.playlist_tracks(LIKED_ID))
+            latest_added_at = latest_added_at or known_latest
+            if seen + prev_liked.get("total", 0) != liked_total:
+                return None, None
+        return liked_tracks, latest_added_at
 
 
-class GenerateRandomWorker(QtCore.QRunnable):
+class _UploadOrder:
     """
-    Background task: create a random playlist from local DB source and push to Spotify.
+    Ordering state shared by upload_tracks and upload_tracks_async: batches
+    still to send, those rejected (400) for arriving before an earlier one,
+    and the committed prefix.
+    """
+
+    def __init__(self, batches: list, committed: int, on_batch):
+        self.batches = batches
+        self.committed = committed
+        self.on_batch = on_batch
+        self.pending = deque(range(committed, len(batches)))
+        self.waiting = set()  # rechazados por llegar antes que un lote anterior
+        self.done = set()
+
+    def finished(self, i: int, prefix_at_send: int, error: BaseException = None):
+        """Record the outcome of batch i, sent when the prefix was `prefix_at_send`."""
+        if error is not None:
+            # Solo es "fuera de orden" si faltaba un lote anterior
+            if (
+                not isinstance(error, spotipy.SpotifyException)
+                or error.http_status != 400
+                or prefix_at_send >= i
+            ):
+                raise error
+            self.waiting.add(i)
+        else:
+            self.done.add(i)
+        while self.committed in self.done:
+            self.done.discard(self.committed)
+            self.committed += 1
+            if self.on_batch:
+                self.on_batch(self.committed, len(self.batches[self.committed - 1]))
+        # El 400 de un lote puede llegar después del éxito del anterior:
+        # se reintentan (en orden, antes que los nuevos) en cuanto el
+        # primero de ellos ya cabe, haya crecido o no el prefijo ahora
+        if self.waiting and min(self.waiting) <= self.committed:
+            self.pending.extendleft(sorted(self.waiting, reverse=True))
+            self.waiting.clear()
+
+    def result(self, playlist_id: str) -> int:
+        if self.committed < len(self.batches):
+            raise RuntimeError(
+                f"Only {self.committed} of {len(self.batches)} batches were added "
+                f"to {playlist_id}."
+            )
+        return self.committed
+
+
+def upload_tracks(
+    sp,
+    playlist_id: str,
+    uris: list,
+    committed: int = 0,
+    on_batch=None,
+    window: int = ADD_WINDOW,
+) -> int:
+    """
+    Add `uris` to a playlist with up to `window` playlist_add_items batches
+    in flight. Batch i is inserted at position i * ADD_BATCH_SIZE, which
+    Spotify rejects (400) until every batch before it is in; such a batch is
+    retried on its own once they are, so the order is always kept and the
+    batches added so far are always a prefix.
+
+    `committed` batches are skipped (resume). `on_batch(count, n_tracks)` is
+    called each time the prefix grows to `count` batches. Returns the number
+    of batches added, always all of them: raises RuntimeError otherwise.
+    A 5xx is not retried here (the batch may have been applied): it is
+    raised once every other batch in flight has finished, so the playlist's
+    total is final and says where to resume.
+    """
+    batches = [
+        uris[i : i + ADD_BATCH_SIZE] for i in range(0, len(uris), ADD_BATCH_SIZE)
+    ]
+    order = _UploadOrder(batches, committed, on_batch)
+    last_send = 0.0
+    inflight = {}
+    pool = ThreadPoolExecutor(max_workers=max(1, window))
+    try:
+        while order.pending or inflight:
+            while order.pending and len(inflight) < window:
+                i = order.pending.popleft()
+                gap = last_send + ADD_SEND_GAP - time.monotonic()
+                if gap > 0:
+                    API_METRICS.slept(gap)
+                    time.sleep(gap)
+                last_send = time.monotonic()
+                fut = pool.submit(
+                    API_LIMITER.call_once,
+                    sp.playlist_add_items,
+                    playlist_id=playlist_id,
+                    items=batches[i],
+                    position=i * ADD_BATCH_SIZE,
+                )
+                inflight[fut] = (i, order.committed)
+            finished, _ = wait(inflight, return_when=FIRST_COMPLETED)
+            for fut in finished:
+                i, prefix_at_send = inflight.pop(fut)
+                order.finished(i, prefix_at_send, fut.exception())
+    finally:
+        pool.shutdown(cancel_futures=True)
+    return order.result(playlist_id)
+
+
+async def upload_tracks_async(
+    api,
+    playlist_id: str,
+    uris: list,
+    committed: int = 0,
+    on_batch=None,
+    window: int = ADD_WINDOW,
+) -> int:
+    """upload_tracks over AsyncSpotify: the batches in flight are tasks of one loop."""
+    batches = [
+        uris[i : i + ADD_BATCH_SIZE] for i in range(0, len(uris), ADD_BATCH_SIZE)
+    ]
+    order = _UploadOrder(batches, committed, on_batch)
+    last_send = 0.0
+    inflight = {}
+    try:
+        while order.pending or inflight:
+            while order.pending and len(inflight) < window:
+                i = order.pending.popleft()
+                gap = last_send + ADD_SEND_GAP - time.monotonic()
+                if gap > 0:
+                    API_METRICS.slept(gap)
+                    await asyncio.sleep(gap)
+                last_send = time.monotonic()
+                task = asyncio.ensure_future(
+                    api.add_items(playlist_id, batches[i], position=i * ADD_BATCH_SIZE)
+                )
+                inflight[task] = (i, order.committed)
+            finished, _ = await asyncio.wait(
+                inflight, return_when=asyncio.FIRST_COMPLETED
+            )
+            for task in finished:
+                i, prefix_at_send = inflight.pop(task)
+                order.finished(i, prefix_at_send, task.exception())
+    except asyncio.CancelledError:
+        for task in inflight:
+            task.cancel()
+        raise
+    finally:
+        # Tras un error los lotes en vuelo terminan antes de salir, como con
+        # hilos: el total de la playlist ya no cambia cuando se relee
+        await asyncio.gather(*inflight, return_exceptions=True)
+    return order.result(playlist_id)
+
+
+class GenerateJob:
+    """
+    Create `playlists` random playlists from a local DB source and push them
+    to Spotify. The samples are disjoint and drawn in one pass by
+    sample_playlists() (`mode`, `weights`, `strata`, `artist_cap` are passed
+    through). With a `history`, tracks from the last `avoid_recent`
+    generations are excluded or penalised (`history_mode`) and the run is
+    recorded in it as one generation once every playlist is filled. With a `journal`, the plan and every
+    committed batch are recorded; if it already holds an interrupted
+    generation, that one is resumed instead (same tracks, same playlists,
+    only the missing batches). A 5xx while adding tracks is never retried
+    blindly (the batch may have landed): the playlist's total is re-read
+    and the upload resumes from there. Playlists are created and
+    filled by a pool of SYNC_WORKERS threads sharing API_LIMITER, so creating
+    one overlaps filling the others; with `use_async` every playlist is
+    filled by upload_tracks_async on one AsyncSpotify event loop instead.
+    Reports progress across the whole batch through `on_progress(pct, rate,
+    eta)`. After run(), `metrics` holds the JobTrace report (also appended
+    to `metrics_log` if given).
     """
 
     def __init__(
@@ -477,503 +3088,454 @@ class GenerateRandomWorker(QtCore.QRunnable):
         requested_n: int,
         new_name: str,
         tracks_in_source: list,
+        on_progress=None,
+        playlists: int = 1,
+        mode: str = "uniform",
+        weights: list = None,
+        strata: list = None,
+        artist_cap: int = ARTIST_CAP,
+        history: GenerationHistory = None,
+        avoid_recent: int = 0,
+        history_mode: str = "penalise",
+        journal: GenerationJournal = None,
+        metrics_log: str = None,
+        use_async: bool = False,
     ):
-        super().__init__()
-        self.signals = WorkerSignals()
         self.lang_key = lang_key
         self.creds = creds
         self.source_playlist_id = source_playlist_id
         self.requested_n = requested_n
         self.new_name = new_name
-        self.tracks_in_source = tracks_in_source  # list of track URIs
-
-    def run(self):
+        self.tracks_in_source = tracks_in_source  # list of track dicts
+        self.on_progress = on_progress or _no_progress
+        self.playlists = max(1, playlists)
+        self.mode = mode
+        self.weights = weights  # paralelos a tracks_in_source
+        self.strata = strata
+        self.artist_cap = artist_cap
+        self.history = history
+        self.avoid_recent = avoid_recent
+        self.history_mode = history_mode
+        self.journal = journal
+        self.metrics_log = metrics_log
+        self.use_async = use_async
+        self.metrics = None
+
+    def run(self) -> dict:
+        """
+        Create and fill the playlists; return the id and name of the first
+        one plus "playlists", the list of all of them in order.
+        """
+        trace = JobTrace("generate")
         try:
-            sp = make_spotify(self.creds)
-            me = sp.current_user()
-            user_id = me["id"]
-
-            uris = [t["uri"] for t in self.tracks_in_source if t.get("uri")]
-            if not uris:
-                raise RuntimeError("Source playlist has no tracks with URIs.")
-
-            if self.requested_n > len(uris):
-                # use all available
-                chosen = uris
+            return self._run(trace)
+        finally:
+            self.metrics = trace.report()
+            if self.metrics_log:
+                JobTrace.write(self.metrics, self.metrics_log)
+
+    def _run(self, trace: JobTrace) -> dict:
+        with trace.phase("connect"):
+            sp = SPOTIFY_SESSION.client(self.creds)
+            user_id = SPOTIFY_SESSION.user_id(self.creds)
+        journal = self.journal or GenerationJournal(None)
+        if not journal.pending():
+            with trace.phase("sample"):
+                plan = self._plan()
+            journal.start(*plan)
+
+        progress = ProgressReporter(journal.remaining(), self.on_progress)
+        with trace.phase("upload"):
+            if self.use_async:
+                created = asyncio.run(
+                    self._create_all_async(sp, user_id, journal, progress)
+                )
             else:
-                chosen = random.sample(uris, self.requested_n)
-
-            # Create playlist
-            playlist = sp.user_playlist_create(
-                user=user_id,
-                name=self.new_name,
-                public=False,
-                description="Generated by Spotify Random Playlists",
+                created = self._create_all(sp, user_id, journal, progress)
+        playlists = [{"playlist_id": pl["id"], "name": pl["name"]} for pl in created]
+        if self.history is not None:
+            # Toda la tanda es una sola generación para avoid_recent
+            self.history.record(
+                playlists, [u for pl in journal.plan for u in pl["uris"]]
             )
-
-            # Add in batches
-            total = len(chosen)
-            added = 0
-            for i in range(0, total, ADD_BATCH_SIZE):
-                batch = chosen[i : i + ADD_BATCH_SIZE]
-                sp.playlist_add_items(playlist_id=playlist["id"], items=batch)
-                added += len(batch)
-                pct = int((added / total) * 100)
-                self.signals.progress.emit(min(pct, 100))
-                time.sleep(API_SLEEP_SECONDS)
-
-            self.signals.done.emit(
-                {"playlist_id": playlist["id"], "name": playlist["name"]}
+        journal.discard()
+        progress.finish()
+
+        return {
+            "playlist_id": created[0]["id"],
+            "name": created[0]["name"],
+            "playlists": playlists,
+        }
+
+    def _plan(self) -> tuple:
+        """Sample the playlists: (names, lists of URIs)."""
+        weights = self.weights
+        if self.history is not None and self.avoid_recent > 0:
+            recent = self.history.weights(
+                self.tracks_in_source, self.avoid_recent, self.history_mode
             )
-        except Exception as e:
-            self.signals.error.emit(
-                f"{type(e).__name__}: {str(e)}\n{traceback.format_exc()}"
+            if weights is not None:
+                recent = [a * b for a, b in zip(weights, recent)]
+            weights = recent
+
+        chunks = sample_playlists(
+            self.tracks_in_source,
+            self.requested_n,
+            self.playlists,
+            mode=self.mode,
+            weights=weights,
+            strata=self.strata,
+            artist_cap=self.artist_cap,
+        )
+        if not chunks:
+            raise RuntimeError("Source playlist has no tracks with URIs.")
+        if len(chunks) == 1:
+            names = [self.new_name]
+        else:
+            names = [f"{self.new_name} #{i + 1}" for i in range(len(chunks))]
+        return names, chunks
+
+    def _create_all(self, sp, user_id, journal, progress) -> list:
+        pool = ThreadPoolExecutor(max_workers=min(SYNC_WORKERS, len(journal.plan)))
+        try:
+            futures = [
+                pool.submit(self._create_filled, sp, user_id, journal, i, progress)
+                for i in range(len(journal.plan))
+            ]
+            return [fut.result() for fut in futures]
+        finally:
+            pool.shutdown(cancel_futures=True)
+
+    async def _create_all_async(self, sp, user_id, journal, progress) -> list:
+        api = AsyncSpotify(sp)
+
+        async def create_filled(i):
+            # Crear o comprobar la playlist son llamadas spotipy: en un hilo
+            playlist = await asyncio.to_thread(
+                self._open_playlist, sp, user_id, journal, i, progress
             )
+            plan = journal.plan[i]
+            for attempt in range(API_MAX_RETRIES + 1):
+                if plan["batches"] * ADD_BATCH_SIZE >= len(plan["uris"]):
+                    break
+                try:
+                    await upload_tracks_async(
+                        api,
+                        playlist["id"],
+                        plan["uris"],
+                        committed=plan["batches"],
+                        on_batch=self._on_batch(journal, i, progress),
+                    )
+                except spotipy.SpotifyException as e:
+                    if not self._resumable(e, attempt):
+                        raise
+                    await asyncio.to_thread(
+                        self._reread_committed, sp, journal, i, progress
+                    )
+            return playlist
 
-
-# =======================
-# ---- DIALOGS (UI)  ----
-# =======================
-
-
-class CredentialsDialog(QtWidgets.QDialog):
-    """Dialog to set Spotify OAuth credentials and verify."""
-
-    def __init__(self, parent, lang_key: str, initial: SpotifyCreds = None):
-        super().__init__(parent)
-        self.lang_key = lang_key
-        self.setWindowTitle(LANG[lang_key]["credentials_title"])
-        self.setModal(True)
-
-        self.clientIdEdit = QtWidgets.QLineEdit()
-        self.clientSecretEdit = QtWidgets.QLineEdit()
-        self.clientSecretEdit.setEchoMode(QtWidgets.QLineEdit.Password)
-        self.redirectUriEdit = QtWidgets.QLineEdit()
-
-        if initial:
-            self.clientIdEdit.setText(initial.client_id)
-            self.clientSecretEdit.setText(initial.client_secret)
-            self.redirectUriEdit.setText(initial.redirect_uri)
-
-        form = QtWidgets.QFormLayout()
-        form.addRow(LANG[lang_key]["client_id"], self.clientIdEdit)
-        form.addRow(LANG[lang_key]["client_secret"], self.clientSecretEdit)
-        form.addRow(LANG[lang_key]["redirect_uri"], self.redirectUriEdit)
-
-        self.infoLabel = QtWidgets.QLabel(LANG[lang_key]["must_auth_browser"])
-        self.infoLabel.setWordWrap(True)
-        self.infoLabel.setStyleSheet("color: #666;")
-
-        self.btnVerify = QtWidgets.QPushButton(LANG[lang_key]["verify"])
-        self.btnCancel = QtWidgets.QPushButton(LANG[lang_key]["cancel"])
-        self.btnVerify.clicked.connect(self.on_verify)
-        self.btnCancel.clicked.connect(self.reject)
-
-        btns = QtWidgets.QHBoxLayout()
-        btns.addStretch(1)
-        btns.addWidget(self.btnVerify)
-        btns.addWidget(self.btnCancel)
-
-        layout = QtWidgets.QVBoxLayout(self)
-        layout.addLayout(form)
-        layout.addWidget(self.infoLabel)
-        layout.addLayout(btns)
-
-        self.resize(480, 220)
-
-    def on_verify(self):
-        cid = self.clientIdEdit.text().strip()
-        csec = self.clientSecretEdit.text().strip()
-        ruri = self.redirectUriEdit.text().strip()
-        creds = SpotifyCreds(cid, csec, ruri)
         try:
-            ok = verify_creds(creds)
-            if ok:
-                save_creds(creds)
-                QtWidgets.QMessageBox.information(
-                    self,
-                    LANG[self.lang_key]["credentials_ok"],
-                    LANG[self.lang_key]["credentials_ok_msg"],
-                )
-                self.accept()
-                return
-            else:
-                QtWidgets.QMessageBox.critical(
-                    self,
-                    LANG[self.lang_key]["error_title"],
-                    LANG[self.lang_key]["credentials_fail"].format(err="Unknown"),
-                )
-        except Exception as e:
-            QtWidgets.QMessageBox.critical(
-                self,
-                LANG[self.lang_key]["error_title"],
-                LANG[self.lang_key]["credentials_fail"].format(err=str(e)),
+            return await asyncio.gather(
+                *(create_filled(i) for i in range(len(journal.plan)))
             )
+        finally:
+            await api.close()
+
+    def _create_filled(self, sp, user_id, journal, i, progress):
+        playlist = self._open_playlist(sp, user_id, journal, i, progress)
+        plan = journal.plan[i]
+        for attempt in range(API_MAX_RETRIES + 1):
+            if plan["batches"] * ADD_BATCH_SIZE >= len(plan["uris"]):
+                break
+            try:
+                # Add in batches, several in flight
+                upload_tracks(
+                    sp,
+                    playlist["id"],
+                    plan["uris"],
+                    committed=plan["batches"],
+                    on_batch=self._on_batch(journal, i, progress),
+                )
+            except spotipy.SpotifyException as e:
+                if not self._resumable(e, attempt):
+                    raise
+                self._reread_committed(sp, journal, i, progress)
+        return playlist
+
+    @staticmethod
+    def _resumable(e: spotipy.SpotifyException, attempt: int) -> bool:
+        """A 5xx from adding tracks: resume from the playlist's real total."""
+        return (e.http_status or 0) >= 500 and attempt < API_MAX_RETRIES
+
+    def _open_playlist(self, sp, user_id, journal, i, progress) -> dict:
+        """Create playlist i of the plan, or find how far an interrupted one got."""
+        plan = journal.plan[i]
+        if plan["playlist_id"]:
+            self._reread_committed(sp, journal, i, progress)
+            return {"id": plan["playlist_id"], "name": plan["name"]}
+        playlist = API_LIMITER.call(
+            sp.user_playlist_create,
+            user=user_id,
+            name=plan["name"],
+            public=False,
+            description="Generated by Spotify Random Playlists",
+        )
+        journal.created(i, playlist["id"])
+        return playlist
+
+    @staticmethod
+    def _reread_committed(sp, journal, i, progress):
+        """Set playlist i's committed batches from its total on Spotify."""
+        # Los lotes añadidos siempre forman un prefijo, así que el total dice
+        # cuántos entraron, incluidos los que fallaron después de aplicarse
+        plan = journal.plan[i]
+        total = API_LIMITER.call(
+            sp.playlist, plan["playlist_id"], fields="tracks.total"
+        )["tracks"]["total"]
+        batches = -(-min(total, len(plan["uris"])) // ADD_BATCH_SIZE)
+        if batches != plan["batches"]:
+            progress.advance((batches - plan["batches"]) * ADD_BATCH_SIZE)
+            journal.committed(i, batches)
+
+    @staticmethod
+    def _on_batch(journal, i, progress):
+        def on_batch(count, n_tracks):
+            journal.committed(i, count)
+            progress.advance(n_tracks)
+
+        return on_batch
 
 
-class LanguageDialog(QtWidgets.QDialog):
-    """Dialog to select UI language."""
-
-    def __init__(self, parent, lang_key: str):
-        super().__init__(parent)
-        self.setModal(True)
-        self.lang_key = lang_key
-        self.setWindowTitle(LANG[lang_key]["language_title"])
-
-        self.combo = QtWidgets.QComboBox()
-        # Display labels localized to current language
-        # but store language codes as data
-        labels = {"es": "Español", "en": "English", "zh": "中文（简体）"}
-        for code, label in labels.items():
-            self.combo.addItem(label, code)
-        # set current
-        idx = self.combo.findData(lang_key)
-        if idx >= 0:
-            self.combo.setCurrentIndex(idx)
-
-        form = QtWidgets.QFormLayout()
-        form.addRow(LANG[lang_key]["select_language"], self.combo)
-
-        self.btnSave = QtWidgets.QPushButton(LANG[lang_key]["save"])
-        self.btnCancel = QtWidgets.QPushButton(LANG[lang_key]["cancel"])
-        self.btnSave.clicked.connect(self.accept)
-        self.btnCancel.clicked.connect(self.reject)
-
-        btns = QtWidgets.QHBoxLayout()
-        btns.addStretch(1)
-        btns.addWidget(self.btnSave)
-        btns.addWidget(self.btnCancel)
+# ===========================
+# ---- COMMAND LINE      ----
+# ===========================
 
-        layout = QtWidgets.QVBoxLayout(self)
-        layout.addLayout(form)
-        layout.addLayout(btns)
-        self.resize(360, 140)
+CLI_COMMANDS = ("sync", "generate", "resume", "sources")
 
-    def selected_language(self) -> str:
-        return self.combo.currentData()
 
+def _emit(event: str, **fields):
+    """Print one machine-readable JSON line to stdout."""
+    print(json.dumps(dict(event=event, **fields), ensure_ascii=False), flush=True)
 
-# =======================
-# ---- MAIN WINDOW   ----
-# =======================
 
+def _emit_progress(pct: int, rate: float, eta: float):
+    _emit("progress", pct=pct, rate=round(rate, 1), eta=round(eta, 1))
 
-class MainWindow(QtWidgets.QMainWindow):
-    def __init__(self, lang_key: str):
-        super().__init__()
-        self.lang_key = lang_key
-        self.thread_pool = QtCore.QThreadPool()
-
-        self.setWindowTitle(LANG[lang_key]["app_title"])
-        self.setMinimumSize(720, 520)
-
-        # ---- Menu ----
-        menubar = self.menuBar()
-        self.menuOptions = menubar.addMenu(LANG[lang_key]["menu_options"])
-
-        self.actCreds = QtWidgets.QAction(LANG[lang_key]["menu_credentials"], self)
-        self.actLang = QtWidgets.QAction(LANG[lang_key]["menu_language"], self)
-        self.menuOptions.addAction(self.actCreds)
-        self.menuOptions.addAction(self.actLang)
-
-        self.actCreds.triggered.connect(self.open_credentials)
-        self.actLang.triggered.connect(self.open_language)
-
-        # ---- Central Widget ----
-        central = QtWidgets.QWidget()
-        self.setCentralWidget(central)
-        v = QtWidgets.QVBoxLayout(central)
-
-        # Update DB
-        self.btnUpdate = QtWidgets.QPushButton(LANG[lang_key]["btn_update_db"])
-        self.btnUpdate.setFixedWidth(350)
-        self.btnUpdate.setCursor(QtGui.QCursor(QtCore.Qt.PointingHandCursor))
-        self.btnUpdate.clicked.connect(self.on_update_db)
-
-        topRow = QtWidgets.QHBoxLayout()
-        topRow.addStretch(1)
-        topRow.addWidget(self.btnUpdate)
-        topRow.addStretch(1)
-
-        self.progressDB = QtWidgets.QProgressBar()
-        self.progressDB.setRange(0, 100)
-        self.progressDB.setValue(0)
-        self.progressDB.setTextVisible(True)
-        self.progressDB.setFixedWidth(420)
-
-        progRow = QtWidgets.QHBoxLayout()
-        progRow.addStretch(1)
-        progRow.addWidget(self.progressDB)
-        progRow.addStretch(1)
-
-        v.addLayout(topRow)
-        v.addLayout(progRow)
-
-        v.addWidget(self._hline())
-
-        # Random generation section
-
-        self.secTitle = QtWidgets.QLabel(f"<b>{LANG[lang_key]['random_section']}</b>")
-        v.addWidget(self.secTitle)
-        # secTitle = QtWidgets.QLabel(f"<b>{LANG[lang_key]['random_section']}</b>")
-        # secTitle = QtWidgets.QLabel()
-        # v.addWidget(secTitle)
-
-        form = QtWidgets.QFormLayout()
-
-        # Labels como widgets dedicados (para poder re-traducir)
-        lblNumSongs = QtWidgets.QLabel()
-        lblSource = QtWidgets.QLabel()
-        lblPlaylistName = QtWidgets.QLabel()
-
-        self.spinCount = QtWidgets.QSpinBox()
-        self.spinCount.setMinimum(1)
-        self.spinCount.setMaximum(10000)
-        self.spinCount.setValue(20)
-
-        self.comboSource = QtWidgets.QComboBox()
-        self.comboSource.setMinimumWidth(360)
-
-        self.editName = QtWidgets.QLineEdit()
-        self.hintName = QtWidgets.QLabel(LANG[lang_key]["name_hint"])
-        self.hintName.setStyleSheet("color:#666; font-size: 13px;")
-        self.hintName.setWordWrap(True)
-        self.tracksLabel = QtWidgets.QLabel(LANG[lang_key]["num_songs"])
-        self.playlistEleccion = QtWidgets.QLabel(LANG[lang_key]["source_playlist"])
-        self.playlistName = QtWidgets.QLabel(LANG[lang_key]["playlist_name"])
-
-        form.addRow(self.tracksLabel, self.spinCount)
-        form.addRow(self.playlistEleccion, self.comboSource)
-        form.addRow(self.playlistName, self.editName)
-        form.addRow("", self.hintName)
-
-        v.addLayout(form)
-
-        self.btnGenerate = QtWidgets.QPushButton(LANG[lang_key]["btn_generate"])
-        self.btnGenerate.setFixedWidth(220)
-        self.btnGenerate.setCursor(QtGui.QCursor(QtCore.Qt.PointingHandCursor))
-        self.btnGenerate.clicked.connect(self.on_generate)
-
-        genRow = QtWidgets.QHBoxLayout()
-        genRow.addStretch(1)
-        genRow.addWidget(self.btnGenerate)
-        genRow.addStretch(1)
-
-        v.addLayout(genRow)
-
-        self.progressGen = QtWidgets.QProgressBar()
-        self.progressGen.setRange(0, 100)
-        self.progressGen.setValue(0)
-        self.progressGen.setTextVisible(True)
-        self.progressGen.setFixedWidth(420)
-
-        genProgRow = QtWidgets.QHBoxLayout()
-        genProgRow.addStretch(1)
-        genProgRow.addWidget(self.progressGen)
-        genProgRow.addStretch(1)
-
-        v.addLayout(genProgRow)
-
-        # Load local DB (if exists) to fill comboSource
-        self.local_db = self.load_local_db()
-        self.refresh_source_combo()
-
-        self._set_enabled(True)
-
-    # -------- Helpers UI --------
-    def _hline(self):
-        line = QtWidgets.QFrame()
-        line.setFrameShape(QtWidgets.QFrame.HLine)
-        line.setFrameShadow(QtWidgets.QFrame.Sunken)
-        return line
-
-    def retranslate(self):
-        """Update texts when language changes."""
-        self.setWindowTitle(LANG[self.lang_key]["app_title"])
-        self.menuOptions.setTitle(LANG[self.lang_key]["menu_options"])
-        self.actCreds.setText(LANG[self.lang_key]["menu_credentials"])
-        self.actLang.setText(LANG[self.lang_key]["menu_language"])
-        self.btnUpdate.setText(LANG[self.lang_key]["btn_update_db"])
-        self.hintName.setText(LANG[self.lang_key]["name_hint"])
-        self.btnGenerate.setText(LANG[self.lang_key]["btn_generate"])
-        self.tracksLabel.setText(LANG[self.lang_key]["num_songs"])
-        self.playlistEleccion.setText(LANG[self.lang_key]["source_playlist"])
-        self.playlistName.setText(LANG[self.lang_key]["playlist_name"])
-        self.secTitle.setText(f"<b>{LANG[self.lang_key]['random_section']}</b>")
-        # Labels in the form are static; easiest is to reconstruct:
-        # (In a production app, keep references to QLabel form items.)
-
-    def _set_enabled(self, enabled: bool):
-        """Enable/disable interactive widgets."""
-        self.menuBar().setEnabled(enabled)
-        self.btnUpdate.setEnabled(enabled)
-        self.spinCount.setEnabled(enabled)
-        self.comboSource.setEnabled(enabled)
-        self.editName.setEnabled(enabled)
-        self.btnGenerate.setEnabled(enabled)
-
-    def show_error(self, msg: str):
-        QtWidgets.QMessageBox.critical(self, LANG[self.lang_key]["error_title"], msg)
-
-    def show_info(self, title: str, msg: str):
-        QtWidgets.QMessageBox.information(self, title, msg)
-
-    def load_local_db(self):
-        if not os.path.exists(DATA_JSON):
-            return None
-        try:
-            with open(DATA_JSON, "r", encoding="utf-8") as f:
-                return json.load(f)
-        except Exception:
-            return None
-
-    # def refresh_source_combo(self):
-    #     self.comboSource.clear()
-    #     if not self.local_db or not self.local_db.get("playlists"):
-    #         self.comboSource.addItem("—")
-    #         return
-    #     for pl in self.local_db["playlists"]:
-    #         self.comboSource.addItem(pl["name"], pl["id"])
-
-    def refresh_source_combo(self):
-        self.comboSource.clear()
-        if not self.local_db or not self.local_db.get("playlists"):
-            self.comboSource.addItem("—")
-            return
 
-        # Ordenar playlists de mayor a menor según el número de canciones
-        playlists_sorted = sorted(
-            self.local_db["playlists"],
-            key=lambda p: len(p.get("tracks", [])),
-            reverse=True,
+def cli_main(argv: list) -> int:
+    """
+    Headless entry point (no Qt import). Every line on stdout is a JSON
+    event: "progress", "source", "discarded", "done" (with timings and the
+    job's JobTrace report under "metrics") or "error".
+    """
+    parser = argparse.ArgumentParser(
+        prog="songs_roulette.py",
+        description="Sync the local database or generate playlists without the GUI.",
+    )
+    sub = parser.add_subparsers(dest="command", required=True)
+    p_sync = sub.add_parser("sync", help="update the local database")
+    p_sync.add_argument(
+        "--full", action="store_true", help="re-download every playlist"
+    )
+    p_sync.add_argument("--workers", type=int, help="parallel playlist downloads")
+    p_sync.add_argument(
+        "--async",
+        dest="use_async",
+        action="store_true",
+        help="page playlists with the asyncio client",
+    )
+    p_gen = sub.add_parser("generate", help="create a random playlist")
+    p_gen.add_argument(
+        "--source",
+        required=True,
+        action="append",
+        help=f"source playlist id ({LIKED_ID} = Liked Songs); repeat to combine",
+    )
+    p_gen.add_argument(
+        "--intersect",
+        action="store_true",
+        help="only tracks in every source (default: in any)",
+    )
+    p_gen.add_argument(
+        "--exclude", action="append", default=[], help="skip tracks of this playlist"
+    )
+    p_gen.add_argument(
+        "--artist", action="append", default=[], help="only tracks by this artist"
+    )
+    p_gen.add_argument(
+        "--album", action="append", default=[], help="only tracks from this album"
+    )
+    p_gen.add_argument(
+        "--mode",
+        choices=SAMPLE_MODES,
+        default="uniform",
+        help="artist: cap tracks per artist; album/playlist: stratify",
+    )
+    p_gen.add_argument(
+        "--artist-cap",
+        type=int,
+        default=ARTIST_CAP,
+        help="tracks per artist (--mode artist)",
+    )
+    p_gen.add_argument(
+        "--avoid-recent",
+        type=int,
+        metavar="N",
+        help="avoid tracks picked in the last N generations",
+    )
+    p_gen.add_argument(
+        "--history-mode",
+        choices=("exclude", "penalise"),
+        help="skip recent tracks or only make them less likely",
+    )
+    p_gen.add_argument("-n", type=int, default=20, help="number of tracks")
+    p_gen.add_argument(
+        "--playlists", type=int, default=1, help="disjoint playlists to create"
+    )
+    p_gen.add_argument("--name", default="", help="playlist name")
+    p_resume = sub.add_parser("resume", help="finish an interrupted generation")
+    for p in (p_gen, p_resume):
+        p.add_argument(
+            "--async",
+            dest="use_async",
+            action="store_true",
+            help="add the tracks with the asyncio client",
         )
+    sub.add_parser("sources", help="list the playlists in the local database")
+    args = parser.parse_args(argv)
 
-        for pl in playlists_sorted:
-            name = f"{pl['name']}  ({len(pl.get('tracks', []))})"
-            self.comboSource.addItem(name, pl["id"])
-
-    def get_creds_or_prompt(self) -> SpotifyCreds or None:
-        creds = load_creds()
-        if creds:
-            # quick verify silently
-            try:
-                if verify_creds(creds):
-                    return creds
-            except Exception:
-                # Fall back to dialog
-                pass
+    settings = load_settings()
+    lang_key = settings.get("language", DEFAULT_LANG)
+    if lang_key not in LANG:
+        lang_key = DEFAULT_LANG
 
-        dlg = CredentialsDialog(self, self.lang_key, initial=creds)
-        if dlg.exec_() == QtWidgets.QDialog.Accepted:
-            return load_creds()
-        return None
+    metrics_log = METRICS_LOG if settings.get("metrics_log", True) else None
+    start = time.monotonic()
+    try:
+        store = open_store(settings)
+        if args.command == "sources":
+            for pl_id, name, count in store.playlist_summaries():
+                _emit("source", id=pl_id, name=name, count=count)
+            _emit("done", elapsed=round(time.monotonic() - start, 3))
+            return 0
 
-    # -------- Menu actions --------
-    def open_credentials(self):
         creds = load_creds()
-        dlg = CredentialsDialog(self, self.lang_key, initial=creds)
-        if dlg.exec_() == QtWidgets.QDialog.Accepted:
-            # Verified and saved inside dialog
-            pass
-
-    def open_language(self):
-        dlg = LanguageDialog(self, self.lang_key)
-        if dlg.exec_() == QtWidgets.QDialog.Accepted:
-            new_lang = dlg.selected_language()
-            if new_lang and new_lang in LANG and new_lang != self.lang_key:
-                self.lang_key = new_lang
-                settings = load_settings()
-                settings["language"] = new_lang
-                save_settings(settings)
-                self.retranslate()
-
-    # -------- Actions --------
-    def on_update_db(self):
-        creds = self.get_creds_or_prompt()
-        if not creds:
-            return
-        self._set_enabled(False)
-        self.progressDB.setValue(0)
-
-        worker = UpdateDBWorker(self.lang_key, creds)
-        worker.signals.progress.connect(self.progressDB.setValue)
-        worker.signals.error.connect(self._on_worker_error)
-        worker.signals.done.connect(self._on_db_done)
-        self.thread_pool.start(worker)
-
-    def _on_worker_error(self, msg: str):
-        self._set_enabled(True)
-        self.show_error(msg)
-
-    def _on_db_done(self, db):
-        self.local_db = db
-        self.refresh_source_combo()
-        self._set_enabled(True)
-        self.show_info(
-            LANG[self.lang_key]["db_updated_ok"],
-            LANG[self.lang_key]["db_updated_ok_msg"],
-        )
-
-    def on_generate(self):
-        # Preconditions: must have local DB
-        if not self.local_db or not self.local_db.get("playlists"):
-            self.show_error(LANG[self.lang_key]["no_playlists"])
-            return
-
-        creds = self.get_creds_or_prompt()
         if not creds:
-            return
-
-        count = int(self.spinCount.value())
-        idx = self.comboSource.currentIndex()
-        src_id = self.comboSource.itemData(idx)
-        if not src_id or src_id == "—":
-            self.show_error(LANG[self.lang_key]["no_playlists"])
-            return
-
-        # Resolve tracks for selected playlist from local DB
-        tracks = []
-        for pl in self.local_db["playlists"]:
-            if pl["id"] == src_id:
-                tracks = pl.get("tracks", [])
-                break
-
-        if not tracks:
-            self.show_error(LANG[self.lang_key]["no_playlists"])
-            return
-
-        entered_name = self.editName.text().strip()
-        if not entered_name:
-            entered_name = "RANDOM - " + datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-
-        # If fewer tracks than requested, warn but continue
-        if count > len(tracks):
-            QtWidgets.QMessageBox.warning(
-                self, APP_NAME, LANG[self.lang_key]["not_enough_tracks"]
+            _emit("error", message="No saved credentials; set them once in the GUI.")
+            return 2
+
+        if args.command == "sync":
+            job = SyncJob(
+                lang_key,
+                creds,
+                store,
+                incremental=not args.full and settings.get("incremental_sync", True),
+                workers=args.workers or int(settings.get("sync_workers", SYNC_WORKERS)),
+                on_progress=_emit_progress,
+                use_async=args.use_async or settings.get("async_api", False),
+                metrics_log=metrics_log,
             )
-            count = len(tracks)
-
-        self._set_enabled(False)
-        self.progressGen.setValue(0)
-
-        worker = GenerateRandomWorker(
-            self.lang_key, creds, src_id, count, entered_name, tracks_in_source=tracks
+            job.run()
+            _emit(
+                "done",
+                elapsed=round(time.monotonic() - start, 3),
+                playlists=len(store.playlist_summaries()),
+                api=API_LIMITER.stats(),
+                metrics=job.metrics,
+            )
+            return 0
+
+        use_async = args.use_async or settings.get("async_api", False)
+        journal = GenerationJournal()
+        if args.command == "resume":
+            if not journal.pending():
+                _emit("error", message="There is no interrupted generation to resume.")
+                return 2
+            left = journal.remaining()
+            job = GenerateJob(
+                lang_key,
+                creds,
+                "",
+                0,
+                "",
+                tracks_in_source=[],
+                on_progress=_emit_progress,
+                history=GenerationHistory(),
+                journal=journal,
+                metrics_log=metrics_log,
+                use_async=use_async,
+            )
+            result = job.run()
+            _emit(
+                "done",
+                elapsed=round(time.monotonic() - start, 3),
+                tracks=left,
+                api=API_LIMITER.stats(),
+                metrics=job.metrics,
+                **result,
+            )
+            return 0
+        if journal.pending():
+            # Un "generate" explícito empieza de cero
+            _emit("discarded", playlists=[pl["name"] for pl in journal.plan])
+            journal.discard()
+
+        strata = None
+        if len(args.source) == 1 and not (args.exclude or args.artist or args.album):
+            tracks = store.playlist_tracks(args.source[0])
+        else:
+            index = TrackIndex(store)
+            selected = index.select(
+                args.source,
+                intersect=args.intersect,
+                exclude=args.exclude,
+                artists=args.artist,
+                albums=args.album,
+            )
+            tracks = index.tracks(selected)
+            if args.mode == "playlist":
+                strata = index.source_of(selected, args.source)
+        if not tracks:
+            _emit("error", message="No tracks match the selected sources and filters.")
+            return 2
+        name = args.name or "RANDOM - " + datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+        count = max(1, min(args.n, len(tracks)))
+        job = GenerateJob(
+            lang_key,
+            creds,
+            "+".join(args.source),
+            count,
+            name,
+            tracks_in_source=tracks,
+            on_progress=_emit_progress,
+            playlists=args.playlists,
+            mode=args.mode,
+            strata=strata,
+            artist_cap=args.artist_cap,
+            history=GenerationHistory(),
+            avoid_recent=(
+                args.avoid_recent
+                if args.avoid_recent is not None
+                else int(settings.get("avoid_recent", 0))
+            ),
+            history_mode=args.history_mode or settings.get("history_mode", "penalise"),
+            journal=journal,
+            metrics_log=metrics_log,
+            use_async=use_async,
         )
-        worker.signals.progress.connect(self.progressGen.setValue)
-        worker.signals.error.connect(self._on_worker_error_gen)
-        worker.signals.done.connect(self._on_gen_done)
-        self.thread_pool.start(worker)
-
-    def _on_worker_error_gen(self, msg: str):
-        self._set_enabled(True)
-        self.show_error(msg)
-
-    def _on_gen_done(self, payload):
-        self._set_enabled(True)
-        self.progressGen.setValue(100)
-        QtWidgets.QMessageBox.information(
-            self, APP_NAME, LANG[self.lang_key]["playlist_done"]
+        result = job.run()
+        _emit(
+            "done",
+            elapsed=round(time.monotonic() - start, 3),
+            tracks=count,
+            api=API_LIMITER.stats(),
+            metrics=job.metrics,
+            **result,
         )
+        return 0
+    except Exception as e:
+        _emit("error", message=f"{type(e).__name__}: {e}")
+        return 1
 
 
 # =======================
@@ -982,26 +3544,17 @@ class MainWindow(QtWidgets.QMainWindow):
 
 
 def main():
-    # High-DPI friendly
-    QtWidgets.QApplication.setAttribute(QtCore.Qt.AA_EnableHighDpiScaling, True)
-    QtWidgets.QApplication.setAttribute(QtCore.Qt.AA_UseHighDpiPixmaps, True)
-
-    app = QtWidgets.QApplication(sys.argv)
-
-    # Load language setting
-    settings = load_settings()
-    lang_key = settings.get("language", DEFAULT_LANG)
-    if lang_key not in LANG:
-        lang_key = DEFAULT_LANG
-
-    win = MainWindow(lang_key)
-    win.show()
+    # Headless commands never import Qt
+    if len(sys.argv) > 1 and sys.argv[1] in CLI_COMMANDS + ("-h", "--help"):
+        sys.exit(cli_main(sys.argv[1:]))
 
-    # On first run, if no creds or invalid, the first "Update DB" or "Generate" will prompt.
-    # If you want to force asking at startup, uncomment:
-    # _ = win.get_creds_or_prompt()
+    # Run as a script this module is __main__: registered under its own name,
+    # the GUI's `from songs_roulette import ...` reuses it instead of loading
+    # a second copy with its own API_LIMITER and SPOTIFY_SESSION
+    sys.modules.setdefault("songs_roulette", sys.modules[__name__])
+    from songs_roulette_gui import main as gui_main
 
-    sys.exit(app.exec_())
+    gui_main()
 
 
 if __name__ == "__main__":
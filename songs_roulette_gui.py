@@ -0,0 +1,1206 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+Spotify Random Playlists GUI
+- PyQt5 front-end for songs_roulette.py (dialogs, main window, Qt workers)
+- Imported only when the app starts without a CLI command, so headless
+  runs never load Qt.
+
+Author: (you)
+License: MIT
+"""
+
+import json
+import os
+import sys
+import time
+import traceback
+from datetime import datetime
+
+# ---- Third-party deps ----
+# pip install PyQt5
+from PyQt5 import QtCore, QtGui, QtWidgets
+
+from songs_roulette import (
+    APP_NAME,
+    ARTIST_CAP,
+    AUTO_SYNC_IDLE_SECONDS,
+    AUTO_SYNC_MIN_GAP_MINUTES,
+    AUTO_SYNC_MINUTES,
+    DEFAULT_LANG,
+    HISTORY_MAX_GENERATIONS,
+    LANG,
+    METRICS_LOG,
+    SEARCH_DEBOUNCE_MS,
+    SYNC_WORKERS,
+    TOKEN_CACHE_PATH,
+    GenerateJob,
+    GenerationHistory,
+    GenerationJournal,
+    SpotifyCreds,
+    SyncJob,
+    TrackIndex,
+    load_creds,
+    load_settings,
+    open_store,
+    save_creds,
+    save_settings,
+    verify_creds,
+)
+
+# Con esta variable de entorno la ventana imprime sus hitos de arranque
+# (JSON, una línea por hito) y se cierra: lo usa benchmarks/startup.py
+STARTUP_PROBE_ENV = "SONGS_ROULETTE_STARTUP_PROBE"
+
+# Eventos que cuentan como actividad del usuario para la sync automática
+_INPUT_EVENTS = frozenset(
+    (
+        QtCore.QEvent.KeyPress,
+        QtCore.QEvent.MouseButtonPress,
+        QtCore.QEvent.MouseMove,
+        QtCore.QEvent.Wheel,
+    )
+)
+
+# ===========================
+# ---- THREADING WORKERS ----
+# ===========================
+
+
+class WorkerSignals(QtCore.QObject):
+    progress = QtCore.pyqtSignal(int)  # 0-100
+    throughput = QtCore.pyqtSignal(float, float)  # items/s, ETA s (-1 unknown)
+    status = QtCore.pyqtSignal(str)  # status text
+    error = QtCore.pyqtSignal(str)  # error text
+    done = QtCore.pyqtSignal(object)  # payload (e.g., result)
+    metrics = QtCore.pyqtSignal(object)  # JobTrace report, also on error
+
+
+class UpdateDBWorker(QtCore.QRunnable):
+    """
+    Background task: run a SyncJob (all playlists and tracks into the local
+    store) and report through WorkerSignals. Emits progress by total tracks.
+    Emits done((store, index)) with a TrackIndex rebuilt over the synced
+    store. With `only_if_changed` the job first runs SyncJob.has_changes()
+    and emits done(None) without syncing if nothing changed. With
+    interactive=False it never opens the browser (see SyncJob). A `store`
+    of None (the DB failed to load) is reopened here with open_store(recover=True).
+    """
+
+    def __init__(
+        self,
+        lang_key: str,
+        creds: SpotifyCreds,
+        store,
+        incremental: bool = True,
+        workers: int = SYNC_WORKERS,
+        use_async: bool = False,
+        metrics_log: str = None,
+        only_if_changed: bool = False,
+        interactive: bool = True,
+    ):
+        super().__init__()
+        self.signals = WorkerSignals()
+        self.only_if_changed = only_if_changed
+        self.job = SyncJob(
+            lang_key,
+            creds,
+            store,
+            incremental=incremental,
+            workers=workers,
+            on_progress=self._report_progress,
+            use_async=use_async,
+            metrics_log=metrics_log,
+            interactive=interactive,
+        )
+
+    def run(self):
+        try:
+            if self.job.store is None:  # no se pudo cargar la base de datos
+                self.job.store = open_store(recover=True)
+            if self.only_if_changed and not self.job.has_changes():
+                self.signals.done.emit(None)
+                return
+            store = self.job.run()
+            self.signals.done.emit((store, TrackIndex(store)))
+        except Exception as e:
+            self.signals.error.emit(
+                f"{type(e).__name__}: {str(e)}\n{traceback.format_exc()}"
+            )
+        finally:
+            self.signals.metrics.emit(self.job.metrics)
+
+    def _report_progress(self, pct: int, rate: float, eta: float):
+        self.signals.progress.emit(pct)
+        self.signals.throughput.emit(rate, eta)
+
+
+class LoadDBWorker(QtCore.QRunnable):
+    """
+    Background task: open the local store, read the source playlist summaries
+    and the generation history and build the TrackIndex used to combine
+    sources, so the window can paint before any disk I/O.
+    Emits done((store, summaries, history, index)).
+    """
+
+    def __init__(self):
+        super().__init__()
+        self.signals = WorkerSignals()
+
+    def run(self):
+        try:
+            store = open_store()
+            self.signals.done.emit(
+                (
+                    store,
+                    store.playlist_summaries(),
+                    GenerationHistory(),
+                    TrackIndex(store),
+                )
+            )
+        except Exception as e:
+            self.signals.error.emit(
+                f"{type(e).__name__}: {str(e)}\n{traceback.format_exc()}"
+            )
+
+
+class GenerateRandomWorker(QtCore.QRunnable):
+    """
+    Background task: run a GenerateJob (one or more disjoint random playlists
+    from a local DB source, pushed to Spotify) and report through WorkerSignals.
+    """
+
+    def __init__(
+        self,
+        lang_key: str,
+        creds: SpotifyCreds,
+        source_playlist_id: str,
+        requested_n: int,
+        new_name: str,
+        tracks_in_source: list,
+        playlists: int = 1,
+        mode: str = "uniform",
+        strata: list = None,
+        artist_cap: int = ARTIST_CAP,
+        history: GenerationHistory = None,
+        avoid_recent: int = 0,
+        history_mode: str = "penalise",
+        journal: GenerationJournal = None,
+        metrics_log: str = None,
+        use_async: bool = False,
+    ):
+        super().__init__()
+        self.signals = WorkerSignals()
+        self.job = GenerateJob(
+            lang_key,
+            creds,
+            source_playlist_id,
+            requested_n,
+            new_name,
+            tracks_in_source,
+            on_progress=self._report_progress,
+            playlists=playlists,
+            mode=mode,
+            strata=strata,
+            artist_cap=artist_cap,
+            history=history,
+            avoid_recent=avoid_recent,
+            history_mode=history_mode,
+            journal=journal,
+            metrics_log=metrics_log,
+            use_async=use_async,
+        )
+
+    def run(self):
+        try:
+            self.signals.done.emit(self.job.run())
+        except Exception as e:
+            self.signals.error.emit(
+                f"{type(e).__name__}: {str(e)}\n{traceback.format_exc()}"
+            )
+        finally:
+            self.signals.metrics.emit(self.job.metrics)
+
+    def _report_progress(self, pct: int, rate: float, eta: float):
+        self.signals.progress.emit(pct)
+        self.signals.throughput.emit(rate, eta)
+
+
+# =======================
+# ---- MODELS        ----
+# =======================
+
+
+class PlaylistListModel(QtCore.QAbstractListModel):
+    """
+    (id, name, track count) rows from store.playlist_summaries(), which every
+    store answers from stored metadata. Labels are built in data(), so only
+    the rows a view actually paints cost anything; set_playlists() is a
+    plain model reset. The id is under QtCore.Qt.UserRole and the bare name
+    under NameRole (what the search filters on).
+    """
+
+    NameRole = QtCore.Qt.UserRole + 1
+
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self._rows = []
+
+    def set_playlists(self, rows: list):
+        self.beginResetModel()
+        self._rows = rows
+        self.endResetModel()
+
+    def rowCount(self, parent=QtCore.QModelIndex()):
+        return 0 if parent.isValid() else len(self._rows)
+
+    def data(self, index, role=QtCore.Qt.DisplayRole):
+        if not index.isValid():
+            return None
+        pl_id, name, count = self._rows[index.row()]
+        if role == QtCore.Qt.DisplayRole:
+            return f"{name}  ({count})"
+        if role == QtCore.Qt.UserRole:
+            return pl_id
+        if role == self.NameRole:
+            return name
+        return None
+
+
+class _ListPopupStyle(QtWidgets.QProxyStyle):
+    """
+    Combo popup as a plain drop-down list. Styles with a menu-like popup
+    (Fusion, macOS) measure every row to size it, which takes about a
+    second with tens of thousands of playlists.
+    """
+
+    def styleHint(self, hint, option=None, widget=None, returnData=None):
+        if hint == QtWidgets.QStyle.SH_ComboBox_Popup:
+            return 0
+        return super().styleHint(hint, option, widget, returnData)
+
+
+# =======================
+# ---- DIALOGS (UI)  ----
+# =======================
+
+
+class CredentialsDialog(QtWidgets.QDialog):
+    """Dialog to set Spotify OAuth credentials and verify."""
+
+    def __init__(self, parent, lang_key: str, initial: SpotifyCreds = None):
+        super().__init__(parent)
+        self.lang_key = lang_key
+        self.setWindowTitle(LANG[lang_key]["credentials_title"])
+        self.setModal(True)
+
+        self.clientIdEdit = QtWidgets.QLineEdit()
+        self.clientSecretEdit = QtWidgets.QLineEdit()
+        self.clientSecretEdit.setEchoMode(QtWidgets.QLineEdit.Password)
+        self.redirectUriEdit = QtWidgets.QLineEdit()
+
+        if initial:
+            self.clientIdEdit.setText(initial.client_id)
+            self.clientSecretEdit.setText(initial.client_secret)
+            self.redirectUriEdit.setText(initial.redirect_uri)
+
+        form = QtWidgets.QFormLayout()
+        form.addRow(LANG[lang_key]["client_id"], self.clientIdEdit)
+        form.addRow(LANG[lang_key]["client_secret"], self.clientSecretEdit)
+        form.addRow(LANG[lang_key]["redirect_uri"], self.redirectUriEdit)
+
+        self.infoLabel = QtWidgets.QLabel(LANG[lang_key]["must_auth_browser"])
+        self.infoLabel.setWordWrap(True)
+        self.infoLabel.setStyleSheet("color: #666;")
+
+        self.btnVerify = QtWidgets.QPushButton(LANG[lang_key]["verify"])
+        self.btnCancel = QtWidgets.QPushButton(LANG[lang_key]["cancel"])
+        self.btnVerify.clicked.connect(self.on_verify)
+        self.btnCancel.clicked.connect(self.reject)
+
+        btns = QtWidgets.QHBoxLayout()
+        btns.addStretch(1)
+        btns.addWidget(self.btnVerify)
+        btns.addWidget(self.btnCancel)
+
+        layout = QtWidgets.QVBoxLayout(self)
+        layout.addLayout(form)
+        layout.addWidget(self.infoLabel)
+        layout.addLayout(btns)
+
+        self.resize(480, 220)
+
+    def on_verify(self):
+        cid = self.clientIdEdit.text().strip()
+        csec = self.clientSecretEdit.text().strip()
+        ruri = self.redirectUriEdit.text().strip()
+        creds = SpotifyCreds(cid, csec, ruri)
+        try:
+            ok = verify_creds(creds)
+            if ok:
+                save_creds(creds)
+                QtWidgets.QMessageBox.information(
+                    self,
+                    LANG[self.lang_key]["credentials_ok"],
+                    LANG[self.lang_key]["credentials_ok_msg"],
+                )
+                self.accept()
+                return
+            else:
+                QtWidgets.QMessageBox.critical(
+                    self,
+                    LANG[self.lang_key]["error_title"],
+                    LANG[self.lang_key]["credentials_fail"].format(err="Unknown"),
+                )
+        except Exception as e:
+            QtWidgets.QMessageBox.critical(
+                self,
+                LANG[self.lang_key]["error_title"],
+                LANG[self.lang_key]["credentials_fail"].format(err=str(e)),
+            )
+
+
+class LanguageDialog(QtWidgets.QDialog):
+    """Dialog to select UI language."""
+
+    def __init__(self, parent, lang_key: str):
+        super().__init__(parent)
+        self.setModal(True)
+        self.lang_key = lang_key
+        self.setWindowTitle(LANG[lang_key]["language_title"])
+
+        self.combo = QtWidgets.QComboBox()
+        # Display labels localized to current language
+        # but store language codes as data
+        labels = {"es": "Español", "en": "English", "zh": "中文（简体）"}
+        for code, label in labels.items():
+            self.combo.addItem(label, code)
+        # set current
+        idx = self.combo.findData(lang_key)
+        if idx >= 0:
+            self.combo.setCurrentIndex(idx)
+
+        form = QtWidgets.QFormLayout()
+        form.addRow(LANG[lang_key]["select_language"], self.combo)
+
+        self.btnSave = QtWidgets.QPushButton(LANG[lang_key]["save"])
+        self.btnCancel = QtWidgets.QPushButton(LANG[lang_key]["cancel"])
+        self.btnSave.clicked.connect(self.accept)
+        self.btnCancel.clicked.connect(self.reject)
+
+        btns = QtWidgets.QHBoxLayout()
+        btns.addStretch(1)
+        btns.addWidget(self.btnSave)
+        btns.addWidget(self.btnCancel)
+
+        layout = QtWidgets.QVBoxLayout(self)
+        layout.addLayout(form)
+        layout.addLayout(btns)
+        self.resize(360, 140)
+
+    def selected_language(self) -> str:
+        return self.combo.currentData()
+
+
+class StatsDialog(QtWidgets.QDialog):
+    """Read-only view of the JobTrace report of the last sync or generation."""
+
+    def __init__(self, parent, lang_key: str, metrics: dict = None):
+        super().__init__(parent)
+        self.setWindowTitle(LANG[lang_key]["menu_stats"].rstrip("…"))
+        self.setMinimumSize(640, 360)
+        v = QtWidgets.QVBoxLayout(self)
+
+        if not metrics:
+            v.addWidget(QtWidgets.QLabel(LANG[lang_key]["stats_empty"]))
+            return
+
+        summary = QtWidgets.QLabel(
+            LANG[lang_key]["stats_summary"].format(
+                job=metrics["job"],
+                seconds=metrics["seconds"],
+                sleep=metrics["sleep_seconds"],
+            )
+        )
+        summary.setWordWrap(True)
+        v.addWidget(summary)
+
+        columns = LANG[lang_key]["stats_columns"].split("|")
+        self.tree = QtWidgets.QTreeWidget()
+        self.tree.setColumnCount(len(columns))
+        self.tree.setHeaderLabels(columns)
+        self.tree.setRootIsDecorated(False)
+        # Una fila por endpoint y otra por fase (solo la columna de segundos)
+        for name, ep in metrics["endpoints"].items():
+            self._add_row(
+                name,
+                ep["calls"],
+                ep["retried"],
+                ep["p50_ms"] if ep["p50_ms"] is not None else "—",
+                ep["p95_ms"] if ep["p95_ms"] is not None else "—",
+                round(ep["bytes"] / 1024),
+                ep["seconds"],
+            )
+        for name, seconds in metrics["phases"].items():
+            self._add_row(name, "", "", "", "", "", seconds)
+        for col in range(len(columns)):
+            self.tree.resizeColumnToContents(col)
+        v.addWidget(self.tree)
+
+    def _add_row(self, *values):
+        item = QtWidgets.QTreeWidgetItem([str(x) for x in values])
+        for col in range(1, len(values)):
+            item.setTextAlignment(col, QtCore.Qt.AlignRight | QtCore.Qt.AlignVCenter)
+        self.tree.addTopLevelItem(item)
+
+
+# =======================
+# ---- MAIN WINDOW   ----
+# =======================
+
+
+class MainWindow(QtWidgets.QMainWindow):
+    db_ready = QtCore.pyqtSignal()  # local DB loaded and source list filled
+
+    def __init__(self, lang_key: str):
+        super().__init__()
+        self.lang_key = lang_key
+        self.thread_pool = QtCore.QThreadPool()
+        self.artist_cap = int(load_settings().get("artist_cap", ARTIST_CAP))
+        # Se cargan en segundo plano (LoadDBWorker) tras mostrar la ventana
+        self.local_db = None
+        self.history = None
+        self.index = None  # TrackIndex del local_db, para combinar playlists
+        self._busy = False  # sync manual o generación en curso
+        self._loading_db = True  # LoadDBWorker aún no ha terminado
+        self._auto_syncing = False
+        self._last_auto_check = 0.0  # time.monotonic() de la última sync automática
+        self.last_metrics = None  # JobTrace report del último trabajo
+
+        self.setWindowTitle(LANG[lang_key]["app_title"])
+        self.setMinimumSize(720, 520)
+
+        # ---- Menu ----
+        menubar = self.menuBar()
+        self.menuOptions = menubar.addMenu(LANG[lang_key]["menu_options"])
+
+        self.actCreds = QtWidgets.QAction(LANG[lang_key]["menu_credentials"], self)
+        self.actLang = QtWidgets.QAction(LANG[lang_key]["menu_language"], self)
+        self.actStats = QtWidgets.QAction(LANG[lang_key]["menu_stats"], self)
+        self.menuOptions.addAction(self.actCreds)
+        self.menuOptions.addAction(self.actLang)
+        self.menuOptions.addAction(self.actStats)
+
+        self.actCreds.triggered.connect(self.open_credentials)
+        self.actLang.triggered.connect(self.open_language)
+        self.actStats.triggered.connect(self.open_stats)
+
+        # ---- Central Widget ----
+        central = QtWidgets.QWidget()
+        self.setCentralWidget(central)
+        v = QtWidgets.QVBoxLayout(central)
+
+        # Update DB
+        self.btnUpdate = QtWidgets.QPushButton(LANG[lang_key]["btn_update_db"])
+        self.btnUpdate.setFixedWidth(350)
+        self.btnUpdate.setCursor(QtGui.QCursor(QtCore.Qt.PointingHandCursor))
+        self.btnUpdate.clicked.connect(self.on_update_db)
+
+        topRow = QtWidgets.QHBoxLayout()
+        topRow.addStretch(1)
+        topRow.addWidget(self.btnUpdate)
+        topRow.addStretch(1)
+
+        self.progressDB = QtWidgets.QProgressBar()
+        self.progressDB.setRange(0, 100)
+        self.progressDB.setValue(0)
+        self.progressDB.setTextVisible(True)
+        self.progressDB.setFixedWidth(420)
+
+        progRow = QtWidgets.QHBoxLayout()
+        progRow.addStretch(1)
+        progRow.addWidget(self.progressDB)
+        progRow.addStretch(1)
+
+        v.addLayout(topRow)
+        v.addLayout(progRow)
+
+        v.addWidget(self._hline())
+
+        # Random generation section
+
+        self.secTitle = QtWidgets.QLabel(f"<b>{LANG[lang_key]['random_section']}</b>")
+        v.addWidget(self.secTitle)
+        # secTitle = QtWidgets.QLabel(f"<b>{LANG[lang_key]['random_section']}</b>")
+        # secTitle = QtWidgets.QLabel()
+        # v.addWidget(secTitle)
+
+        form = QtWidgets.QFormLayout()
+
+        # Labels como widgets dedicados (para poder re-traducir)
+        lblNumSongs = QtWidgets.QLabel()
+        lblSource = QtWidgets.QLabel()
+        lblPlaylistName = QtWidgets.QLabel()
+
+        self.spinCount = QtWidgets.QSpinBox()
+        self.spinCount.setMinimum(1)
+        self.spinCount.setMaximum(10000)
+        self.spinCount.setValue(20)
+
+        self.spinPlaylists = QtWidgets.QSpinBox()
+        self.spinPlaylists.setMinimum(1)
+        self.spinPlaylists.setMaximum(100)
+        self.spinPlaylists.setValue(1)
+
+        self.comboMode = QtWidgets.QComboBox()
+
+        # 0 = no evitar nada; "history_mode" en settings.json: exclude/penalise
+        self.spinAvoid = QtWidgets.QSpinBox()
+        self.spinAvoid.setMinimum(0)
+        self.spinAvoid.setMaximum(HISTORY_MAX_GENERATIONS)
+        self.spinAvoid.setValue(int(load_settings().get("avoid_recent", 0)))
+
+        # Modelo + filtro: con miles de playlists la lista solo pinta las
+        # filas visibles y se busca escribiendo en editSearch
+        self.sourceModel = PlaylistListModel(self)
+        self.sourceFilter = QtCore.QSortFilterProxyModel(self)
+        self.sourceFilter.setSourceModel(self.sourceModel)
+        self.sourceFilter.setFilterRole(PlaylistListModel.NameRole)
+        self.sourceFilter.setFilterCaseSensitivity(QtCore.Qt.CaseInsensitive)
+        self.comboSource = QtWidgets.QComboBox()
+        self.comboSource.setMinimumWidth(360)
+        self.comboSource.setStyle(_ListPopupStyle(self.comboSource.style()))
+        self.comboSource.setModel(self.sourceFilter)
+        self.comboSource.setPlaceholderText(LANG[lang_key]["loading_db"])
+        self.comboSource.setMaxVisibleItems(20)
+        sourceView = QtWidgets.QListView()
+        sourceView.setUniformItemSizes(True)  # sin medir cada fila
+        sourceView.setLayoutMode(QtWidgets.QListView.Batched)
+        self.comboSource.setView(sourceView)
+
+        self.editSearch = QtWidgets.QLineEdit()
+        self.editSearch.setPlaceholderText(LANG[lang_key]["search_playlists"])
+        self.editSearch.setClearButtonEnabled(True)
+        self.searchTimer = QtCore.QTimer(self)
+        self.searchTimer.setSingleShot(True)
+        self.searchTimer.setInterval(SEARCH_DEBOUNCE_MS)
+        self.searchTimer.timeout.connect(self._apply_search)
+        self.editSearch.textChanged.connect(self.searchTimer.start)
+        sourceBox = QtWidgets.QHBoxLayout()
+        sourceBox.addWidget(self.comboSource, 2)
+        sourceBox.addWidget(self.editSearch, 1)
+        self.btnAddSource = QtWidgets.QPushButton(LANG[lang_key]["add_source"])
+        self.btnAddSource.clicked.connect(self._add_source)
+        sourceBox.addWidget(self.btnAddSource)
+
+        # Playlists añadidas: se genera desde su unión (o intersección)
+        self.listSources = QtWidgets.QListWidget()
+        self.listSources.setMaximumHeight(90)
+        self.listSources.setSelectionMode(QtWidgets.QAbstractItemView.ExtendedSelection)
+        self.chkIntersect = QtWidgets.QCheckBox(LANG[lang_key]["intersect_sources"])
+        self.btnRemoveSource = QtWidgets.QPushButton(LANG[lang_key]["remove_source"])
+        self.btnRemoveSource.clicked.connect(self._remove_sources)
+        combinedRow = QtWidgets.QHBoxLayout()
+        combinedRow.addWidget(self.chkIntersect, 1)
+        combinedRow.addWidget(self.btnRemoveSource)
+        combinedBox = QtWidgets.QVBoxLayout()
+        combinedBox.addWidget(self.listSources)
+        combinedBox.addLayout(combinedRow)
+
+        self.editName = QtWidgets.QLineEdit()
+        self.hintName = QtWidgets.QLabel(LANG[lang_key]["name_hint"])
+        self.hintName.setStyleSheet("color:#666; font-size: 13px;")
+        self.hintName.setWordWrap(True)
+        self.tracksLabel = QtWidgets.QLabel(LANG[lang_key]["num_songs"])
+        self.playlistsLabel = QtWidgets.QLabel(LANG[lang_key]["num_playlists"])
+        self.modeLabel = QtWidgets.QLabel(LANG[lang_key]["sample_mode"])
+        self.avoidLabel = QtWidgets.QLabel(LANG[lang_key]["avoid_recent"])
+        self.playlistEleccion = QtWidgets.QLabel(LANG[lang_key]["source_playlist"])
+        self.combinedLabel = QtWidgets.QLabel(LANG[lang_key]["combined_sources"])
+        self.playlistName = QtWidgets.QLabel(LANG[lang_key]["playlist_name"])
+
+        form.addRow(self.tracksLabel, self.spinCount)
+        form.addRow(self.playlistsLabel, self.spinPlaylists)
+        form.addRow(self.modeLabel, self.comboMode)
+        form.addRow(self.avoidLabel, self.spinAvoid)
+        form.addRow(self.playlistEleccion, sourceBox)
+        form.addRow(self.combinedLabel, combinedBox)
+        form.addRow(self.playlistName, self.editName)
+        form.addRow("", self.hintName)
+
+        v.addLayout(form)
+        self._fill_mode_combo()
+
+        self.btnGenerate = QtWidgets.QPushButton(LANG[lang_key]["btn_generate"])
+        self.btnGenerate.setFixedWidth(220)
+        self.btnGenerate.setCursor(QtGui.QCursor(QtCore.Qt.PointingHandCursor))
+        self.btnGenerate.clicked.connect(self.on_generate)
+
+        genRow = QtWidgets.QHBoxLayout()
+        genRow.addStretch(1)
+        genRow.addWidget(self.btnGenerate)
+        genRow.addStretch(1)
+
+        v.addLayout(genRow)
+
+        self.progressGen = QtWidgets.QProgressBar()
+        self.progressGen.setRange(0, 100)
+        self.progressGen.setValue(0)
+        self.progressGen.setTextVisible(True)
+        self.progressGen.setFixedWidth(420)
+
+        genProgRow = QtWidgets.QHBoxLayout()
+        genProgRow.addStretch(1)
+        genProgRow.addWidget(self.progressGen)
+        genProgRow.addStretch(1)
+
+        v.addLayout(genProgRow)
+
+        # Load local DB (if exists) to fill comboSource, once the window is up
+        self._set_enabled(True)
+        QtCore.QTimer.singleShot(0, self.load_local_db)
+
+        # ---- Auto sync ----
+        # Cada auto_sync_minutes y, entre medias, tras auto_sync_idle_seconds
+        # sin teclado ni ratón
+        settings = load_settings()
+        minutes = float(settings.get("auto_sync_minutes", AUTO_SYNC_MINUTES))
+        idle = float(settings.get("auto_sync_idle_seconds", AUTO_SYNC_IDLE_SECONDS))
+        self.autoSyncTimer = QtCore.QTimer(self)
+        self.autoSyncTimer.timeout.connect(self.auto_sync)
+        self.idleTimer = QtCore.QTimer(self)
+        self.idleTimer.setSingleShot(True)
+        self.idleTimer.timeout.connect(self._on_idle)
+        if minutes > 0:
+            self.autoSyncTimer.start(int(minutes * 60_000))
+            if idle > 0:
+                self.idleTimer.setInterval(int(idle * 1000))
+                QtWidgets.QApplication.instance().installEventFilter(self)
+                self.idleTimer.start()
+
+    # -------- Helpers UI --------
+    def _hline(self):
+        line = QtWidgets.QFrame()
+        line.setFrameShape(QtWidgets.QFrame.HLine)
+        line.setFrameShadow(QtWidgets.QFrame.Sunken)
+        return line
+
+    def retranslate(self):
+        """Update texts when language changes."""
+        self.setWindowTitle(LANG[self.lang_key]["app_title"])
+        self.menuOptions.setTitle(LANG[self.lang_key]["menu_options"])
+        self.actCreds.setText(LANG[self.lang_key]["menu_credentials"])
+        self.actLang.setText(LANG[self.lang_key]["menu_language"])
+        self.actStats.setText(LANG[self.lang_key]["menu_stats"])
+        self.btnUpdate.setText(LANG[self.lang_key]["btn_update_db"])
+        self.hintName.setText(LANG[self.lang_key]["name_hint"])
+        self.btnGenerate.setText(LANG[self.lang_key]["btn_generate"])
+        self.tracksLabel.setText(LANG[self.lang_key]["num_songs"])
+        self.playlistsLabel.setText(LANG[self.lang_key]["num_playlists"])
+        self.modeLabel.setText(LANG[self.lang_key]["sample_mode"])
+        self.avoidLabel.setText(LANG[self.lang_key]["avoid_recent"])
+        self.editSearch.setPlaceholderText(LANG[self.lang_key]["search_playlists"])
+        if self.local_db is None:
+            self.comboSource.setPlaceholderText(LANG[self.lang_key]["loading_db"])
+        self._fill_mode_combo()
+        self.playlistEleccion.setText(LANG[self.lang_key]["source_playlist"])
+        self.combinedLabel.setText(LANG[self.lang_key]["combined_sources"])
+        self.btnAddSource.setText(LANG[self.lang_key]["add_source"])
+        self.btnRemoveSource.setText(LANG[self.lang_key]["remove_source"])
+        self.chkIntersect.setText(LANG[self.lang_key]["intersect_sources"])
+        self.playlistName.setText(LANG[self.lang_key]["playlist_name"])
+        self.secTitle.setText(f"<b>{LANG[self.lang_key]['random_section']}</b>")
+        # Labels in the form are static; easiest is to reconstruct:
+        # (In a production app, keep references to QLabel form items.)
+
+    def _fill_mode_combo(self):
+        """(Re)fill the sampling mode choices in the current language."""
+        current = self.comboMode.currentIndex()
+        self.comboMode.clear()
+        self.comboMode.addItem(LANG[self.lang_key]["mode_uniform"], "uniform")
+        self.comboMode.addItem(
+            LANG[self.lang_key]["mode_artist"].format(cap=self.artist_cap), "artist"
+        )
+        self.comboMode.addItem(LANG[self.lang_key]["mode_album"], "album")
+        self.comboMode.addItem(LANG[self.lang_key]["mode_playlist"], "playlist")
+        self.comboMode.setCurrentIndex(max(current, 0))
+
+    def _set_enabled(self, enabled: bool):
+        """Enable/disable interactive widgets (DB ones only once it is loaded)."""
+        loaded = enabled and self.local_db is not None
+        self._busy = not enabled
+        self.menuBar().setEnabled(enabled)
+        # Actualizar también sirve para rehacer una base de datos que no cargó
+        self.btnUpdate.setEnabled(
+            enabled and not self._loading_db and not self._auto_syncing
+        )
+        self.spinCount.setEnabled(enabled)
+        self.spinPlaylists.setEnabled(enabled)
+        self.comboMode.setEnabled(enabled)
+        self.spinAvoid.setEnabled(enabled)
+        self.comboSource.setEnabled(loaded)
+        self.editSearch.setEnabled(loaded)
+        self._set_combine_enabled(loaded and not self._auto_syncing)
+        self.editName.setEnabled(enabled)
+        self.btnGenerate.setEnabled(loaded)
+
+    def _set_combine_enabled(self, enabled: bool):
+        # Combinar playlists lee self.index, que durante una sync en segundo
+        # plano deja de casar con la tabla de canciones del store (commit_sync
+        # la rehace) hasta que _on_auto_sync_done recibe los dos juntos
+        self.btnAddSource.setEnabled(enabled)
+        self.listSources.setEnabled(enabled)
+        self.chkIntersect.setEnabled(enabled)
+        self.btnRemoveSource.setEnabled(enabled)
+
+    def _show_throughput(self, bar: QtWidgets.QProgressBar, rate: float, eta: float):
+        """Show tracks/s and time left inside a progress bar."""
+        if eta < 0:
+            bar.resetFormat()
+            return
+        minutes, seconds = divmod(int(eta), 60)
+        bar.setFormat(
+            LANG[self.lang_key]["progress_rate"].format(
+                rate=rate, eta=f"{minutes}:{seconds:02d}"
+            )
+        )
+
+    def show_error(self, msg: str):
+        QtWidgets.QMessageBox.critical(self, LANG[self.lang_key]["error_title"], msg)
+
+    def show_info(self, title: str, msg: str):
+        QtWidgets.QMessageBox.information(self, title, msg)
+
+    def load_local_db(self):
+        """Open the local DB on the thread pool; _on_db_loaded fills the UI."""
+        worker = LoadDBWorker()
+        worker.signals.done.connect(self._on_db_loaded)
+        worker.signals.error.connect(self._on_db_load_error)
+        self.thread_pool.start(worker)
+
+    def _on_db_loaded(self, payload):
+        self.local_db, summaries, self.history, self.index = payload
+        self._loading_db = False
+        self.comboSource.setPlaceholderText("—")
+        self.refresh_source_combo(summaries)
+        self._set_enabled(True)
+        self.db_ready.emit()
+
+    def _on_db_load_error(self, msg: str):
+        self.comboSource.setPlaceholderText("—")
+        self._loading_db = False
+        self._set_enabled(True)
+        self.show_error(msg)
+
+    # def refresh_source_combo(self):
+    #     self.comboSource.clear()
+    #     if not self.local_db or not self.local_db.get("playlists"):
+    #         self.comboSource.addItem("—")
+    #         return
+    #     for pl in self.local_db["playlists"]:
+    #         self.comboSource.addItem(pl["name"], pl["id"])
+
+    def refresh_source_combo(self, summaries: list = None):
+        # Playlists ordenadas de mayor a menor según el número de canciones
+        current = self.comboSource.currentData()
+        if summaries is None:
+            summaries = self.local_db.playlist_summaries()
+        self.sourceModel.set_playlists(summaries)
+        self._select_source(current)
+        # Fuera las playlists combinadas que ya no existen tras una sync
+        known = {pl_id for pl_id, _name, _count in summaries}
+        for row in reversed(range(self.listSources.count())):
+            if self.listSources.item(row).data(QtCore.Qt.UserRole) not in known:
+                self.listSources.takeItem(row)
+
+    def _apply_search(self):
+        current = self.comboSource.currentData()
+        self.sourceFilter.setFilterFixedString(self.editSearch.text().strip())
+        self._select_source(current)
+
+    def _select_source(self, pl_id):
+        """Keep `pl_id` selected if still listed, else the first row."""
+        row = self.comboSource.findData(pl_id) if pl_id else -1
+        self.comboSource.setCurrentIndex(
+            max(row, 0) if self.sourceFilter.rowCount() else -1
+        )
+
+    def _add_source(self):
+        """Add the playlist picked in comboSource to the combined sources."""
+        pl_id = self.comboSource.currentData()
+        if not pl_id or pl_id in self._source_ids():
+            return
+        item = QtWidgets.QListWidgetItem(self.comboSource.currentText())
+        item.setData(QtCore.Qt.UserRole, pl_id)
+        self.listSources.addItem(item)
+
+    def _remove_sources(self):
+        for item in self.listSources.selectedItems():
+            self.listSources.takeItem(self.listSources.row(item))
+
+    def _source_ids(self) -> list:
+        return [
+            self.listSources.item(row).data(QtCore.Qt.UserRole)
+            for row in range(self.listSources.count())
+        ]
+
+    def get_creds_or_prompt(self) -> SpotifyCreds or None:
+        creds = load_creds()
+        if creds:
+            # quick verify silently
+            try:
+                if verify_creds(creds):
+                    return creds
+            except Exception:
+                # Fall back to dialog
+                pass
+
+        dlg = CredentialsDialog(self, self.lang_key, initial=creds)
+        if dlg.exec_() == QtWidgets.QDialog.Accepted:
+            return load_creds()
+        return None
+
+    # -------- Menu actions --------
+    def open_credentials(self):
+        creds = load_creds()
+        dlg = CredentialsDialog(self, self.lang_key, initial=creds)
+        if dlg.exec_() == QtWidgets.QDialog.Accepted:
+            # Verified and saved inside dialog
+            pass
+
+    def open_language(self):
+        dlg = LanguageDialog(self, self.lang_key)
+        if dlg.exec_() == QtWidgets.QDialog.Accepted:
+            new_lang = dlg.selected_language()
+            if new_lang and new_lang in LANG and new_lang != self.lang_key:
+                self.lang_key = new_lang
+                settings = load_settings()
+                settings["language"] = new_lang
+                save_settings(settings)
+                self.retranslate()
+
+    # -------- Actions --------
+    def open_stats(self):
+        StatsDialog(self, self.lang_key, self.last_metrics).exec_()
+
+    def _metrics_log(self):
+        """Where workers append their metrics ("metrics_log" in settings.json)."""
+        return METRICS_LOG if load_settings().get("metrics_log", True) else None
+
+    def _set_last_metrics(self, metrics):
+        if metrics:  # None: sync automática sin cambios
+            self.last_metrics = metrics
+
+    # -------- Auto sync --------
+    def eventFilter(self, obj, event):
+        # Cualquier tecla o movimiento de ratón reinicia la cuenta de inactividad
+        if event.type() in _INPUT_EVENTS:
+            self.idleTimer.start()
+        return False
+
+    def _on_idle(self):
+        if time.monotonic() - self._last_auto_check >= AUTO_SYNC_MIN_GAP_MINUTES * 60:
+            self.auto_sync()
+
+    def auto_sync(self):
+        """
+        Low-priority incremental sync on the thread pool: skipped while the
+        DB is loading or another job runs, and when there is no saved token.
+        It only refreshes the cached token and never opens the browser: a
+        stale or revoked token just fails the run, which is retried later.
+        Generating from one playlist stays available; combining playlists
+        waits until the synced store and its TrackIndex arrive together.
+        """
+        if self.local_db is None or self._busy or self._auto_syncing:
+            return
+        creds = load_creds()
+        if not creds or not os.path.exists(TOKEN_CACHE_PATH):
+            return
+        self._auto_syncing = True
+        self._last_auto_check = time.monotonic()
+        self._auto_sync_prev = self.progressDB.value()
+        self.btnUpdate.setEnabled(False)
+        self._set_combine_enabled(False)
+        self.progressDB.setFormat(LANG[self.lang_key]["auto_sync_running"])
+
+        # Un solo hilo: deja el limitador de la API libre para generar
+        worker = UpdateDBWorker(
+            self.lang_key,
+            creds,
+            self.local_db,
+            incremental=True,
+            workers=1,
+            metrics_log=self._metrics_log(),
+            only_if_changed=True,
+            interactive=False,
+        )
+        worker.signals.metrics.connect(self._set_last_metrics)
+        worker.signals.progress.connect(self.progressDB.setValue)
+        worker.signals.error.connect(self._on_auto_sync_error)
+        worker.signals.done.connect(self._on_auto_sync_done)
+        self.thread_pool.start(worker, -1)  # detrás de lo que ya esté en cola
+
+    def _on_auto_sync_done(self, payload):
+        self._auto_syncing = False
+        self.progressDB.resetFormat()
+        if payload is None:
+            self.progressDB.setValue(self._auto_sync_prev)
+        else:
+            self.local_db, self.index = payload
+            self.refresh_source_combo()
+        self.btnUpdate.setEnabled(not self._busy)
+        self._set_combine_enabled(not self._busy)
+
+    def _on_auto_sync_error(self, msg: str):
+        # En segundo plano no se interrumpe al usuario: se reintenta en la próxima
+        self._auto_syncing = False
+        self.progressDB.resetFormat()
+        self.progressDB.setValue(self._auto_sync_prev)
+        self.btnUpdate.setEnabled(not self._busy)
+        self._set_combine_enabled(not self._busy)
+
+    def on_update_db(self):
+        creds = self.get_creds_or_prompt()
+        if not creds:
+            return
+        self._set_enabled(False)
+        self.progressDB.setValue(0)
+        self.progressDB.resetFormat()
+
+        settings = load_settings()
+        worker = UpdateDBWorker(
+            self.lang_key,
+            creds,
+            self.local_db,
+            incremental=settings.get("incremental_sync", True),
+            workers=int(settings.get("sync_workers", SYNC_WORKERS)),
+            use_async=settings.get("async_api", False),
+            metrics_log=self._metrics_log(),
+        )
+        worker.signals.metrics.connect(self._set_last_metrics)
+        worker.signals.progress.connect(self.progressDB.setValue)
+        worker.signals.throughput.connect(
+            lambda rate, eta: self._show_throughput(self.progressDB, rate, eta)
+        )
+        worker.signals.error.connect(self._on_worker_error)
+        worker.signals.done.connect(self._on_db_done)
+        self.thread_pool.start(worker)
+
+    def _on_worker_error(self, msg: str):
+        self._set_enabled(True)
+        self.progressDB.resetFormat()
+        self.show_error(msg)
+
+    def _on_db_done(self, payload):
+        self.local_db, self.index = payload
+        if self.history is None:  # la carga inicial falló
+            self.history = GenerationHistory()
+        self.progressDB.resetFormat()
+        self.refresh_source_combo()
+        self._set_enabled(True)
+        self.show_info(
+            LANG[self.lang_key]["db_updated_ok"],
+            LANG[self.lang_key]["db_updated_ok_msg"],
+        )
+
+    def on_generate(self):
+        # Preconditions: must have local DB
+        if not self.local_db.has_playlists():
+            self.show_error(LANG[self.lang_key]["no_playlists"])
+            return
+
+        creds = self.get_creds_or_prompt()
+        if not creds:
+            return
+
+        # Una generación interrumpida se puede terminar en las mismas playlists
+        journal = GenerationJournal()
+        if journal.pending():
+            answer = QtWidgets.QMessageBox.question(
+                self,
+                APP_NAME,
+                LANG[self.lang_key]["resume_generation"].format(
+                    name=journal.plan[0]["name"], left=journal.remaining()
+                ),
+            )
+            if answer == QtWidgets.QMessageBox.Yes:
+                self._start_generation(
+                    GenerateRandomWorker(
+                        self.lang_key,
+                        creds,
+                        "",
+                        0,
+                        "",
+                        tracks_in_source=[],
+                        history=self.history,
+                        journal=journal,
+                        metrics_log=self._metrics_log(),
+                        use_async=load_settings().get("async_api", False),
+                    )
+                )
+                return
+            journal.discard()
+
+        count = int(self.spinCount.value())
+        sources = self._source_ids()
+        if not sources:
+            idx = self.comboSource.currentIndex()
+            src_id = self.comboSource.itemData(idx) if idx >= 0 else None
+            if not src_id or src_id == "—":
+                self.show_error(LANG[self.lang_key]["no_playlists"])
+                return
+            sources = [src_id]
+
+        # Resolve tracks for the selected playlists from local DB
+        mode = self.comboMode.currentData()
+        strata = None
+        if len(sources) == 1:
+            tracks = self.local_db.playlist_tracks(sources[0])
+        elif self._auto_syncing:
+            # self.index aún describe el store de antes de la sync
+            self.show_info(APP_NAME, LANG[self.lang_key]["combine_after_sync"])
+            return
+        else:
+            selected = self.index.select(
+                sources, intersect=self.chkIntersect.isChecked()
+            )
+            tracks = self.index.tracks(selected)
+            if mode == "playlist":
+                strata = self.index.source_of(selected, sources)
+
+        if not tracks:
+            self.show_error(
+                LANG[self.lang_key][
+                    "no_matching_tracks" if len(sources) > 1 else "no_playlists"
+                ]
+            )
+            return
+
+        entered_name = self.editName.text().strip()
+        if not entered_name:
+            entered_name = "RANDOM - " + datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+
+        # If fewer tracks than requested, warn but continue
+        if count > len(tracks):
+            QtWidgets.QMessageBox.warning(
+                self, APP_NAME, LANG[self.lang_key]["not_enough_tracks"]
+            )
+            count = len(tracks)
+
+        # Lotes: las playlists no comparten canciones
+        n_playlists = int(self.spinPlaylists.value())
+        if n_playlists > 1 and count * n_playlists > len(tracks):
+            QtWidgets.QMessageBox.warning(
+                self, APP_NAME, LANG[self.lang_key]["not_enough_for_batch"]
+            )
+
+        # Recordar N para la próxima vez
+        settings = load_settings()
+        if settings.get("avoid_recent", 0) != self.spinAvoid.value():
+            settings["avoid_recent"] = int(self.spinAvoid.value())
+            save_settings(settings)
+
+        worker = GenerateRandomWorker(
+            self.lang_key,
+            creds,
+            "+".join(sources),
+            count,
+            entered_name,
+            tracks_in_source=tracks,
+            playlists=n_playlists,
+            mode=mode,
+            strata=strata,
+            artist_cap=self.artist_cap,
+            history=self.history,
+            avoid_recent=int(self.spinAvoid.value()),
+            history_mode=load_settings().get("history_mode", "penalise"),
+            journal=journal,
+            metrics_log=self._metrics_log(),
+            use_async=settings.get("async_api", False),
+        )
+        self._start_generation(worker)
+
+    def _start_generation(self, worker):
+        self._set_enabled(False)
+        self.progressGen.setValue(0)
+        self.progressGen.resetFormat()
+        worker.signals.metrics.connect(self._set_last_metrics)
+        worker.signals.progress.connect(self.progressGen.setValue)
+        worker.signals.throughput.connect(
+            lambda rate, eta: self._show_throughput(self.progressGen, rate, eta)
+        )
+        worker.signals.error.connect(self._on_worker_error_gen)
+        worker.signals.done.connect(self._on_gen_done)
+        self.thread_pool.start(worker)
+
+    def _on_worker_error_gen(self, msg: str):
+        self._set_enabled(True)
+        self.progressGen.resetFormat()
+        self.show_error(msg)
+
+    def _on_gen_done(self, payload):
+        self._set_enabled(True)
+        self.progressGen.setValue(100)
+        self.progressGen.resetFormat()
+        QtWidgets.QMessageBox.information(
+            self, APP_NAME, LANG[self.lang_key]["playlist_done"]
+        )
+
+
+# =======================
+# ---- APP STARTUP   ----
+# =======================
+
+
+class _StartupProbe(QtCore.QObject):
+    """
+    Prints the window's first paint and the end of the DB load as JSON lines
+    ({"event": ..., "t": epoch seconds}) and quits once both happened.
+    """
+
+    def __init__(self, win: MainWindow):
+        super().__init__(win)
+        self._pending = {"first_paint", "db_ready"}
+        win.installEventFilter(self)
+        win.db_ready.connect(lambda: self._mark("db_ready"))
+
+    def eventFilter(self, obj, event):
+        if event.type() == QtCore.QEvent.Paint and "first_paint" in self._pending:
+            self._mark("first_paint")
+        return False
+
+    def _mark(self, name: str):
+        print(json.dumps({"event": name, "t": time.time()}), flush=True)
+        self._pending.discard(name)
+        if not self._pending:
+            QtCore.QTimer.singleShot(0, QtWidgets.QApplication.quit)
+
+
+def main():
+    # High-DPI friendly
+    QtWidgets.QApplication.setAttribute(QtCore.Qt.AA_EnableHighDpiScaling, True)
+    QtWidgets.QApplication.setAttribute(QtCore.Qt.AA_UseHighDpiPixmaps, True)
+
+    app = QtWidgets.QApplication(sys.argv)
+
+    # Load language setting
+    settings = load_settings()
+    lang_key = settings.get("language", DEFAULT_LANG)
+    if lang_key not in LANG:
+        lang_key = DEFAULT_LANG
+
+    win = MainWindow(lang_key)
+    if os.environ.get(STARTUP_PROBE_ENV):
+        _StartupProbe(win)
+    win.show()
+
+    # On first run, if no creds or invalid, the first "Update DB" or "Generate" will prompt.
+    # If you want to force asking at startup, uncomment:
+    # _ = win.get_creds_or_prompt()
+
+    sys.exit(app.exec_())
+
+
+if __name__ == "__main__":
+    main()
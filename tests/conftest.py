@@ -0,0 +1,8 @@
+import os
+import sys
+
+# songs_roulette.py vive en la raíz del repo, sin paquete instalable; el
+# servidor falso de Spotify, en benchmarks/
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.join(ROOT, "benchmarks"))
@@ -0,0 +1,176 @@
+import asyncio
+import json
+import re
+import threading
+
+import pytest
+from fake_spotify import FakeSpotify, FakeSpotifyServer, Library, make_handler
+from spotipy import SpotifyException
+
+import songs_roulette as sr
+
+
+class Spotipy:
+    """What AsyncSpotify takes from a spotipy client: the token source."""
+
+    class auth_manager:
+        @staticmethod
+        def get_access_token(as_dict=False):
+            return "token"
+
+
+def response(status=200, body=b"{}", headers=(), chunks=None) -> bytes:
+    head = [f"HTTP/1.1 {status} X", *headers]
+    if chunks is None:
+        head.append(f"Content-Length: {len(body)}")
+        return ("\r\n".join(head) + "\r\n\r\n").encode() + body
+    head.append("Transfer-Encoding: chunked")
+    raw = ("\r\n".join(head) + "\r\n\r\n").encode()
+    for chunk in chunks:
+        raw += f"{len(chunk):x};ext=1\r\n".encode() + chunk + b"\r\n"
+    return raw + b"0\r\nX-Trailer: 1\r\n\r\n"
+
+
+class ScriptedServer:
+    """
+    Answers every request with the next (raw response, close) of `script`;
+    with close=True the socket is closed right after, without telling the
+    client (as a server dropping an idle keep-alive connection does).
+    """
+
+    def __init__(self, script):
+        self.script = list(script)
+        self.requests = []
+        self.connections = 0
+
+    async def handle(self, reader, writer):
+        self.connections += 1
+        try:
+            while True:
+                head = await reader.readuntil(b"\r\n\r\n")
+                length = int(re.search(rb"Content-Length: (\d+)", head).group(1))
+                body = await reader.readexactly(length)
+                self.requests.append((head.split(b"\r\n")[0].decode(), body))
+                raw, close = self.script.pop(0)
+                writer.write(raw)
+                await writer.drain()
+                if close:
+                    break
+        except asyncio.IncompleteReadError:
+            pass
+        writer.close()
+
+
+def run(script, fn):
+    """Run `fn(api)` against a ScriptedServer; return (server, result)."""
+
+    async def main():
+        server = ScriptedServer(script)
+        listener = await asyncio.start_server(server.handle, "127.0.0.1", 0)
+        port = listener.sockets[0].getsockname()[1]
+        api = sr.AsyncSpotify(Spotipy(), f"http://127.0.0.1:{port}/v1/")
+        try:
+            return server, await fn(api)
+        finally:
+            await api.close()
+            listener.close()
+
+    return asyncio.run(main())
+
+
+async def get_twice(api):
+    return [await api.get("me"), await api.get("me", market="ES")]
+
+
+@pytest.fixture(autouse=True)
+def fast_limiter(monkeypatch):
+    monkeypatch.setattr(sr, "API_LIMITER", sr.RateLimiter(max_rate=10_000))
+
+
+def test_content_length_bodies_share_one_connection():
+    script = [(response(body=b'{"n": 1}'), False), (response(body=b'{"n": 2}'), False)]
+    server, result = run(script, get_twice)
+    assert result == [{"n": 1}, {"n": 2}]
+    assert server.connections == 1
+    assert server.requests[1][0] == "GET /v1/me?market=ES HTTP/1.1"
+
+
+def test_chunked_body_with_extensions_and_trailers():
+    body = json.dumps({"items": list(range(50))}).encode()
+    chunked = response(chunks=[body[:7], body[7:30], body[30:]])
+    script = [(chunked, False), (response(body=b'{"ok": true}'), False)]
+    server, result = run(script, get_twice)
+    # Si el cuerpo o los trailers no se consumen enteros, la segunda
+    # respuesta de la misma conexión se leería mal
+    assert result == [{"items": list(range(50))}, {"ok": True}]
+    assert server.connections == 1
+
+
+def test_body_without_length_is_read_to_eof_and_not_reused():
+    script = [(b'HTTP/1.1 200 OK\r\n\r\n{"a": 1}', True), (response(body=b"{}"), False)]
+    server, result = run(script, get_twice)
+    assert result == [{"a": 1}, {}]
+    assert server.connections == 2
+
+
+def test_reconnects_when_an_idle_connection_was_closed():
+    script = [(response(body=b'{"n": 1}'), True), (response(body=b'{"n": 2}'), False)]
+    server, result = run(script, get_twice)
+    assert result == [{"n": 1}, {"n": 2}]
+    assert server.connections == 2
+    assert len(server.requests) == 2
+
+
+def test_connection_close_header_is_honoured():
+    script = [
+        (response(body=b"{}", headers=["Connection: close"]), True),
+        (response(body=b"{}"), False),
+    ]
+    server, _ = run(script, get_twice)
+    assert server.connections == 2
+
+
+def test_429_is_retried_after_retry_after():
+    script = [
+        (response(429, b'{"error": {}}', headers=["Retry-After: 0"]), False),
+        (response(body=b'{"ok": 1}'), False),
+    ]
+    server, result = run(script, lambda api: api.get("me"))
+    assert result == {"ok": 1}
+    assert len(server.requests) == 2
+    assert sr.API_LIMITER.throttle_events == 1
+
+
+def test_add_items_posts_json_and_does_not_retry_5xx():
+    script = [(response(502, b"{}", headers=["Retry-After: 0"]), False)]
+    with pytest.raises(SpotifyException) as err:
+        run(script, lambda api: api.add_items("pl", ["spotify:track:a"], position=100))
+    assert err.value.http_status == 502
+
+
+def test_pages_a_library_from_the_fake_server():
+    library = Library(playlists=3, tracks=450, liked=230, seed=1)
+    server = FakeSpotifyServer(("127.0.0.1", 0), make_handler(FakeSpotify(library)))
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    pid = next(iter(library.playlists))
+
+    async def main():
+        api = sr.AsyncSpotify(
+            Spotipy(), f"http://127.0.0.1:{server.server_address[1]}/v1/"
+        )
+        try:
+            items = await api.playlist_items_all(pid, fields="items(track(id)),total")
+            pages = await api.saved_tracks_all()
+        finally:
+            await api.close()
+        return items, pages
+
+    try:
+        items, pages = asyncio.run(main())
+    finally:
+        server.shutdown()
+    assert [it["track"]["id"] for it in items] == [
+        it["track"]["id"] for it in library.playlists[pid]["items"]
+    ]
+    saved = [it["track"]["id"] for page in pages for it in page["items"]]
+    assert saved == [it["track"]["id"] for it in library.liked]
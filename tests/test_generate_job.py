@@ -0,0 +1,116 @@
+import os
+
+import pytest
+from spotipy import SpotifyException
+
+import songs_roulette as sr
+
+CREDS = sr.SpotifyCreds("test", "test", "http://127.0.0.1/callback")
+
+
+class FakeSpotify:
+    class auth_manager:
+        class cache_handler:
+            @staticmethod
+            def get_cached_token():
+                return None
+
+    def current_user(self):
+        return {"id": "me"}
+
+    def __init__(self):
+        self.playlists = {}
+        # Posiciones cuyo próximo add_items falla con 502 (una vez), antes o
+        # después de aplicarse, o siempre
+        self.fail_before_apply = set()
+        self.fail_after_apply = set()
+        self.always_fail = set()
+
+    def user_playlist_create(self, user, name, public=False, description=""):
+        pid = f"new{len(self.playlists)}"
+        self.playlists[pid] = []
+        return {"id": pid, "name": name}
+
+    def playlist(self, playlist_id, fields=None):
+        return {"tracks": {"total": len(self.playlists[playlist_id])}}
+
+    def playlist_add_items(self, playlist_id, items, position=None):
+        added = self.playlists[playlist_id]
+        if position in self.always_fail or position in self.fail_before_apply:
+            self.fail_before_apply.discard(position)
+            raise server_error()
+        if position > len(added):
+            raise SpotifyException(400, -1, "Index out of bounds")
+        added[position:position] = items
+        if position in self.fail_after_apply:
+            self.fail_after_apply.discard(position)
+            raise server_error()
+        return {"snapshot_id": "x"}
+
+
+@pytest.fixture
+def session(monkeypatch):
+    monkeypatch.setattr(sr, "API_LIMITER", sr.RateLimiter(max_rate=1000))
+    monkeypatch.setattr(sr, "ADD_SEND_GAP", 0)
+    sp = FakeSpotify()
+    sr.SPOTIFY_SESSION.use(CREDS, sp)
+    yield sp
+    sr.SPOTIFY_SESSION.reset()
+
+
+def server_error():
+    return SpotifyException(502, -1, "injected", headers={"Retry-After": "0"})
+
+
+def test_5xx_after_the_batch_was_applied_does_not_duplicate_it(tmp_path, session):
+    # El servidor aplica el lote y aun así responde 502
+    session.fail_after_apply = {100, 300}
+    uris = [f"spotify:track:t{i}" for i in range(450)]
+    tracks = [{"uri": u} for u in uris]
+    result = sr.GenerateJob("en", CREDS, "src", 450, "x", tracks).run()
+    added = session.playlists[result["playlist_id"]]
+    assert sorted(added) == sorted(uris)
+    assert len(added) == len(set(added))
+
+
+def test_5xx_before_the_batch_was_applied_is_resent(tmp_path, session):
+    session.fail_before_apply = {0, 200}
+    tracks = [{"uri": f"spotify:track:t{i}"} for i in range(300)]
+    result = sr.GenerateJob("en", CREDS, "src", 300, "x", tracks).run()
+    assert len(set(session.playlists[result["playlist_id"]])) == 300
+
+
+def test_persistent_5xx_keeps_journal_and_history(tmp_path, session):
+    session.always_fail = {200}
+    tracks = [{"id": f"t{i}", "uri": f"spotify:track:t{i}"} for i in range(600)]
+    journal = sr.GenerationJournal(str(tmp_path / "generate.journal"))
+    history = sr.GenerationHistory(str(tmp_path / "history.json"))
+    job = sr.GenerateJob(
+        "en", CREDS, "src", 600, "x", tracks, journal=journal, history=history
+    )
+    with pytest.raises(SpotifyException):
+        job.run()
+    resumed = sr.GenerationJournal(journal.path)
+    assert resumed.pending()
+    assert resumed.plan[0]["batches"] == 2
+    assert history.generations == []
+
+
+def test_a_batch_of_playlists_is_one_generation(tmp_path, session):
+    tracks = [{"id": f"t{i}", "uri": f"spotify:track:t{i}"} for i in range(100)]
+    history = sr.GenerationHistory(str(tmp_path / "history.json"))
+
+    def generate(**kwargs):
+        return sr.GenerateJob(
+            "en", CREDS, "src", 10, "mix", tracks, history=history, **kwargs
+        ).run()
+
+    first = generate(playlists=4)
+    assert len(history.generations) == 1
+    assert history.generations[0]["playlists"] == first["playlists"]
+    assert len(history.generations[0]["tracks"]) == 40
+
+    # "Última generación" = toda la tanda anterior, no solo su última playlist
+    picked = {u for pl in session.playlists.values() for u in pl}
+    second = generate(avoid_recent=1, history_mode="exclude")
+    assert not set(session.playlists[second["playlist_id"]]) & picked
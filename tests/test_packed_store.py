@@ -0,0 +1,89 @@
+import pytest
+
+import songs_roulette as sr
+
+
+def track(n):
+    return {
+        "id": f"t{n}",
+        "name": f"Track {n}",
+        "uri": f"spotify:track:t{n}",
+        "artists": ["Artist"],
+        "album": "Album",
+    }
+
+
+@pytest.fixture
+def path(tmp_path):
+    return str(tmp_path / sr.DATA_PACK)
+
+
+def sync(store, playlists: dict):
+    """One sync: `playlists` maps id -> tracks (None = unchanged)."""
+    store.begin_sync()
+    for pl_id, tracks in playlists.items():
+        store.put_playlist(
+            {"id": pl_id, "name": pl_id.upper(), "snapshot_id": "s1"}, tracks
+        )
+    store.commit_sync(list(playlists))
+    return store
+
+
+@pytest.fixture
+def packed(path):
+    sync(
+        sr.PackedStore(path),
+        {"a": [track(i) for i in range(5)], "b": [track(4), track(9)]},
+    )
+    with open(path, "rb") as f:
+        return f.read()
+
+
+def test_round_trip(path, packed):
+    assert packed[:4] == sr.PackedStore.MAGIC
+    store = sr.PackedStore(path)
+    assert store.playlist_tracks("a") == [track(i) for i in range(5)]
+    assert store.playlist_tracks("b") == [track(4), track(9)]
+    assert store.playlist_summaries() == [("a", "A", 5), ("b", "B", 2)]
+    assert store.playlist_meta()["b"] == {"id": "b", "name": "B", "snapshot_id": "s1"}
+    assert list(store.playlist_indices("b")) == [4, 5]
+    assert len(list(store.iter_tracks())) == 6
+
+
+def test_incremental_sync_keeps_unchanged(path, packed):
+    store = sync(sr.PackedStore(path), {"b": None, "c": [track(7)]})
+    assert sr.PackedStore(path).playlist_tracks("b") == [track(4), track(9)]
+    assert [pl_id for pl_id, _, _ in store.playlist_summaries()] == ["b", "c"]
+
+
+def test_empty_file_is_an_empty_library(path):
+    open(path, "wb").close()
+    assert not sr.PackedStore(path).has_playlists()
+
+
+@pytest.mark.parametrize(
+    "damage, message",
+    [
+        (lambda raw: b"XXXX" + raw[4:], "bad magic"),
+        (lambda raw: raw.replace(b'"version": 2', b'"version": 9', 1), "version 9"),
+        (lambda raw: raw[:40], "header"),
+        (lambda raw: raw[:-3], "tracks"),
+    ],
+)
+def test_invalid_file_is_rejected(path, packed, damage, message):
+    with open(path, "wb") as f:
+        f.write(damage(packed))
+    with pytest.raises(ValueError, match=message):
+        sr.PackedStore(path)
+
+
+def test_open_store_can_set_an_unreadable_pack_aside(path, monkeypatch):
+    monkeypatch.setattr(sr, "DATA_PACK", path)
+    with open(path, "wb") as f:
+        f.write(b"not a pack")
+    with pytest.raises(ValueError, match="bad magic"):
+        sr.open_store({"storage": "packed"})
+    store = sr.open_store({"storage": "packed"}, recover=True)
+    assert isinstance(store, sr.PackedStore) and not store.has_playlists()
+    with open(path + ".corrupt", "rb") as f:
+        assert f.read() == b"not a pack"
@@ -0,0 +1,48 @@
+import random
+from collections import Counter
+
+import songs_roulette as sr
+
+
+def _tracks(albums):
+    """One track per entry of `albums` (its album name), URIs u0, u1, ..."""
+    return [{"uri": f"u{i}", "album": album} for i, album in enumerate(albums)]
+
+
+def test_album_mode_varies_between_seeds():
+    # Más álbumes que canciones pedidas: antes ganaban siempre los mismos
+    tracks = _tracks(f"a{i}" for i in range(300))
+    samples = set()
+    for seed in range(10):
+        random.seed(seed)
+        samples.add(frozenset(sr.sample_playlists(tracks, 10, mode="album")[0]))
+    assert len(samples) == 10
+
+
+def test_album_mode_picks_small_albums_in_proportion():
+    # 250 álbumes de una canción + 25 de dos: los sencillos son el 83 %
+    tracks = _tracks([f"s{i}" for i in range(250)] + [f"d{i // 2}" for i in range(50)])
+    singles = {t["uri"] for t in tracks[:250]}
+    random.seed(0)
+    counts = Counter()
+    for _ in range(500):
+        for uri in sr.sample_playlists(tracks, 10, mode="album")[0]:
+            counts[uri in singles] += 1
+    assert 0.78 < counts[True] / sum(counts.values()) < 0.88
+
+
+def test_album_mode_keeps_strata_smaller_than_k():
+    tracks = _tracks(f"a{i}" for i in range(300))
+    picks = sr.sample_playlists(tracks, 10, k=3, mode="album")
+    assert [len(p) for p in picks] == [10, 10, 10]
+    assert len({uri for p in picks for uri in p}) == 30
+
+
+def test_album_mode_is_proportional_and_disjoint():
+    tracks = _tracks(["A"] * 600 + ["B"] * 300 + ["C"] * 100)
+    album = {t["uri"]: t["album"] for t in tracks}
+    random.seed(1)
+    picks = sr.sample_playlists(tracks, 50, k=3, mode="album")
+    assert len({uri for p in picks for uri in p}) == 150
+    for p in picks:
+        assert Counter(album[uri] for uri in p) == {"A": 30, "B": 15, "C": 5}
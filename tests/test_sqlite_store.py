@@ -0,0 +1,111 @@
+import json
+import sqlite3
+
+import pytest
+
+import songs_roulette as sr
+
+
+def track(n, album="A"):
+    return {
+        "id": f"t{n}",
+        "name": f"Track {n}",
+        "uri": f"spotify:track:t{n}",
+        "artists": [f"Artist {n % 3}"],
+        "album": album,
+    }
+
+
+def entry(pl_id, **extra):
+    return {
+        "id": pl_id,
+        "name": pl_id.upper(),
+        "owner": "me",
+        "snapshot_id": "s1",
+        **extra,
+    }
+
+
+@pytest.fixture
+def path(tmp_path):
+    return str(tmp_path / sr.SQLITE_DB)
+
+
+def sync(store, playlists: dict):
+    """One sync: `playlists` maps id -> tracks (None = unchanged)."""
+    store.begin_sync()
+    for pl_id, tracks in playlists.items():
+        store.put_playlist(entry(pl_id), tracks)
+    store.commit_sync(list(playlists))
+    return store
+
+
+def test_schema(path):
+    sr.SqliteStore(path)
+    conn = sqlite3.connect(path)
+    tables = {row[0] for row in conn.execute("SELECT name FROM sqlite_master")}
+    assert {"meta", "playlists", "tracks", "membership", "membership_track"} <= tables
+
+
+def test_round_trip_stores_shared_tracks_once(path):
+    a = [track(i) for i in range(5)]
+    b = [track(i) for i in range(3, 8)]
+    sync(sr.SqliteStore(path), {"a": a, "b": b})
+
+    store = sr.SqliteStore(path)
+    assert store.playlist_tracks("a") == a
+    assert store.playlist_tracks("b") == b
+    assert sorted(store.playlist_summaries()) == [("a", "A", 5), ("b", "B", 5)]
+    assert store.playlist_meta()["a"]["snapshot_id"] == "s1"
+    assert len(list(store.iter_tracks())) == 8
+    assert store.tracks_at(store.playlist_indices("b")) == b
+
+
+def test_each_playlist_is_committed_before_commit_sync(path):
+    store = sr.SqliteStore(path)
+    store.begin_sync()
+    store.put_playlist(entry("a"), [track(1)])
+    # Otra conexión ya la ve: cada put_playlist es su propia transacción
+    other = sr.SqliteStore(path)
+    assert other.playlist_tracks("a") == [track(1)]
+
+
+def test_incremental_sync_keeps_unchanged_and_drops_removed(path):
+    sync(sr.SqliteStore(path), {"a": [track(1), track(2)], "b": [track(3)]})
+    store = sync(sr.SqliteStore(path), {"a": None, "c": [track(2), track(4)]})
+
+    assert store.playlist_tracks("a") == [track(1), track(2)]
+    assert store.playlist_tracks("b") == []
+    assert sorted(pl_id for pl_id, _, _ in store.playlist_summaries()) == ["a", "c"]
+    # La canción que solo estaba en "b" ya no queda huérfana en la tabla
+    assert sorted(t["id"] for _, t in store.iter_tracks()) == ["t1", "t2", "t4"]
+
+
+def test_tracks_without_id_or_uri_are_kept_apart(path):
+    local = {"id": None, "name": "Local", "uri": None, "artists": [], "album": None}
+    store = sync(sr.SqliteStore(path), {"a": [local, local, track(1)]})
+    assert store.playlist_tracks("a") == [local, local, track(1)]
+
+
+def test_import_json_from_a_v1_data_json(tmp_path, path):
+    json_path = tmp_path / sr.DATA_JSON
+    v1 = {
+        "playlists": [
+            dict(entry("a"), tracks=[track(1), track(2)]),
+            dict(
+                entry(sr.LIKED_ID, latest_added_at="2024", total=2), tracks=[track(2)]
+            ),
+        ]
+    }
+    json_path.write_text(json.dumps(v1), encoding="utf-8")
+
+    store = sr.import_json(sr.SqliteStore(path), str(json_path))
+    assert store.playlist_tracks("a") == [track(1), track(2)]
+    assert store.playlist_tracks(sr.LIKED_ID) == [track(2)]
+    assert store.playlist_meta()[sr.LIKED_ID]["latest_added_at"] == "2024"
+
+
+def test_old_sqlite_library_is_rejected(path, monkeypatch):
+    monkeypatch.setattr(sqlite3, "sqlite_version_info", (3, 22, 0))
+    with pytest.raises(RuntimeError, match="too old"):
+        sr.SqliteStore(path)
@@ -0,0 +1,168 @@
+import json
+import webbrowser
+
+import pytest
+from fake_spotify import FakeSpotify, Library
+from spotipy import SpotifyException
+
+import songs_roulette as sr
+
+CREDS = sr.SpotifyCreds("test", "test", "http://127.0.0.1/callback")
+STORES = {
+    "json": lambda tmp: sr.JsonStore(str(tmp / sr.DATA_JSON)),
+    "packed": lambda tmp: sr.PackedStore(str(tmp / sr.DATA_PACK)),
+    "sqlite": lambda tmp: sr.SqliteStore(str(tmp / sr.SQLITE_DB)),
+}
+
+
+class LibraryClient:
+    """
+    The spotipy.Spotify calls SyncJob makes, answered in-process by the
+    benchmark's FakeSpotify. Paths in `fail` raise a 404 (not retried).
+    """
+
+    class auth_manager:
+        class cache_handler:
+            @staticmethod
+            def get_cached_token():
+                return None
+
+    def __init__(self, library: Library):
+        self.api = FakeSpotify(library)
+        self.fail = set()
+        self.paths = []
+
+    def _get(self, path: str, **query):
+        self.paths.append(path)
+        if path in self.fail:
+            raise SpotifyException(404, -1, f"{path}: injected")
+        status, body = self.api.get(path, query)
+        if status != 200:
+            raise SpotifyException(status, -1, path)
+        return body
+
+    def current_user_playlists(self, limit=50, offset=0):
+        return self._get("me/playlists", limit=limit, offset=offset)
+
+    def playlist_items(self, playlist_id, limit=100, offset=0, fields=None):
+        return self._get(
+            f"playlists/{playlist_id}/tracks", limit=limit, offset=offset, fields=fields
+        )
+
+    def current_user_saved_tracks(self, limit=20, offset=0):
+        return self._get("me/tracks", limit=limit, offset=offset)
+
+
+@pytest.fixture(autouse=True)
+def fast_limiter(monkeypatch):
+    monkeypatch.setattr(
+        sr, "API_LIMITER", sr.RateLimiter(max_rate=10_000, max_retries=0)
+    )
+
+
+@pytest.fixture
+def client():
+    sp = LibraryClient(Library(playlists=4, tracks=120, liked=130, seed=3))
+    sr.SPOTIFY_SESSION.use(CREDS, sp)
+    yield sp
+    sr.SPOTIFY_SESSION.reset()
+
+
+def sync(store, incremental=True):
+    return sr.SyncJob("en", CREDS, store, incremental=incremental, workers=2).run()
+
+
+@pytest.mark.parametrize("kind", sorted(STORES))
+def test_failed_liked_songs_keep_the_previous_copy(tmp_path, client, kind):
+    store = sync(STORES[kind](tmp_path), incremental=False)
+    liked = store.playlist_tracks(sr.LIKED_ID)
+    meta = store.playlist_meta()[sr.LIKED_ID]
+    assert len(liked) == 130
+
+    client.fail.add("me/tracks")
+    client.api.library.mutate(playlists=0.5, liked=5)
+    store = sync(STORES[kind](tmp_path))
+    assert store.playlist_tracks(sr.LIKED_ID) == liked
+    kept = store.playlist_meta()[sr.LIKED_ID]
+    assert (kept["latest_added_at"], kept["total"]) == (meta["latest_added_at"], 130)
+
+    # La siguiente sync sigue siendo incremental: solo pide lo nuevo
+    client.fail.clear()
+    client.paths.clear()
+    store = sync(STORES[kind](tmp_path))
+    assert len(store.playlist_tracks(sr.LIKED_ID)) == 135
+    assert client.paths.count("me/tracks") == 1
+
+
+def fetched(client) -> set:
+    return {p.split("/")[1] for p in client.paths if p.startswith("playlists/")}
+
+
+@pytest.mark.parametrize("kind", sorted(STORES))
+def test_interrupted_sync_resumes_only_unfinished_playlists(tmp_path, client, kind):
+    ids = list(client.api.library.playlists)
+    # Un solo worker: las dos primeras se guardan antes de que falle la tercera
+    client.fail.add(f"playlists/{ids[2]}/tracks")
+    with pytest.raises(SpotifyException):
+        sr.SyncJob(
+            "en", CREDS, STORES[kind](tmp_path), incremental=False, workers=1
+        ).run()
+
+    client.fail.clear()
+    client.paths.clear()
+    store = sync(STORES[kind](tmp_path))
+    assert ids[2] in fetched(client)
+    assert not fetched(client) & {ids[0], ids[1]}
+    for pl_id, pl in client.api.library.playlists.items():
+        assert len(store.playlist_tracks(pl_id)) == len(pl["items"])
+    assert len(store.playlist_tracks(sr.LIKED_ID)) == 130
+
+
+@pytest.mark.parametrize("kind", sorted(STORES))
+def test_unchanged_playlists_journaled_without_tracks_survive_a_crash(
+    tmp_path, client, kind
+):
+    library = client.api.library
+    ids = list(library.playlists)
+    before = sync(STORES[kind](tmp_path), incremental=False)
+    kept = {pl_id: before.playlist_tracks(pl_id) for pl_id in ids}
+
+    # Cambia una playlist y falla al bajarla: las demás ya están en el
+    # journal con tracks=None ("sin cambios")
+    library.playlists[ids[1]]["snapshot"] += 1
+    client.fail.add(f"playlists/{ids[1]}/tracks")
+    with pytest.raises(SpotifyException):
+        sync(STORES[kind](tmp_path))
+
+    client.fail.clear()
+    client.paths.clear()
+    store = sync(STORES[kind](tmp_path))
+    assert fetched(client) == {ids[1]}
+    for pl_id in ids:
+        assert store.playlist_tracks(pl_id) == kept[pl_id]
+    assert len(store.playlist_tracks(sr.LIKED_ID)) == 130
+
+
+@pytest.mark.parametrize(
+    "token",
+    [
+        None,
+        {
+            "access_token": "x",
+            "refresh_token": "r",
+            "expires_at": 4e9,
+            "scope": "other",
+        },
+    ],
+)
+def test_background_sync_never_prompts_for_auth(tmp_path, monkeypatch, token):
+    cache = tmp_path / "token"
+    if token:
+        cache.write_text(json.dumps(token))
+    monkeypatch.setattr(sr, "TOKEN_CACHE_PATH", str(cache))
+    monkeypatch.setattr(webbrowser, "open", lambda *a, **k: pytest.fail("browser"))
+    monkeypatch.setattr("builtins.input", lambda *a: pytest.fail("prompt"))
+    sr.SPOTIFY_SESSION.reset()
+    job = sr.SyncJob("en", CREDS, STORES["json"](tmp_path), interactive=False)
+    with pytest.raises(RuntimeError, match="cached OAuth token"):
+        job.has_changes()
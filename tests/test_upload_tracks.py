@@ -0,0 +1,93 @@
+import asyncio
+import threading
+import time
+
+import pytest
+from spotipy import SpotifyException
+
+import songs_roulette as sr
+
+
+class FakePlaylist:
+    """
+    playlist_add_items with a configurable delay before a batch reaches the
+    playlist ("arrive") and before its response gets back ("respond"), keyed
+    by position and only for the first attempt.
+    """
+
+    def __init__(self, arrive=None, respond=None):
+        self.items = []
+        self.arrive = dict(arrive or {})
+        self.respond = dict(respond or {})
+        self.calls = 0
+        self._lock = threading.Lock()
+
+    def playlist_add_items(self, playlist_id, items, position=None):
+        with self._lock:
+            self.calls += 1
+        time.sleep(self.arrive.pop(position, 0))
+        with self._lock:
+            ok = position is None or position <= len(self.items)
+            if ok:
+                self.items[position:position] = items
+        time.sleep(self.respond.pop(position, 0))
+        if not ok:
+            raise SpotifyException(400, -1, "Index out of bounds")
+        return {"snapshot_id": "x"}
+
+
+class FakeAsyncPlaylist(FakePlaylist):
+    """The same playlist behind AsyncSpotify.add_items."""
+
+    async def add_items(self, playlist_id, uris, position=None):
+        return await asyncio.to_thread(
+            self.playlist_add_items, playlist_id, uris, position
+        )
+
+
+@pytest.fixture(autouse=True)
+def fast_limiter(monkeypatch):
+    monkeypatch.setattr(sr, "API_LIMITER", sr.RateLimiter(max_rate=1000))
+    monkeypatch.setattr(sr, "ADD_SEND_GAP", 0)
+
+
+def test_in_order_upload_adds_every_batch():
+    sp = FakePlaylist()
+    uris = [f"spotify:track:{i}" for i in range(450)]
+    assert sr.upload_tracks(sp, "pl", uris) == 5
+    assert sp.items == uris
+
+
+def test_rejection_answered_after_previous_success_is_retried():
+    # Los lotes 1-3 llegan antes que el 0 (400), pero su respuesta vuelve
+    # después del éxito del 0: antes se quedaban aparcados para siempre
+    sp = FakePlaylist(
+        arrive={0: 0.2},
+        respond={100: 0.4, 200: 0.4, 300: 0.4},
+    )
+    uris = [f"spotify:track:{i}" for i in range(600)]
+    batches = []
+    assert (
+        sr.upload_tracks(sp, "pl", uris, on_batch=lambda n, _: batches.append(n)) == 6
+    )
+    assert sp.items == uris
+    assert batches == [1, 2, 3, 4, 5, 6]
+
+
+def test_resume_skips_committed_batches():
+    sp = FakePlaylist()
+    uris = [f"spotify:track:{i}" for i in range(300)]
+    sp.items = uris[:200]
+    assert sr.upload_tracks(sp, "pl", uris, committed=2) == 3
+    assert sp.calls == 1
+    assert sp.items == uris
+
+
+def test_async_upload_retries_late_rejection():
+    sp = FakeAsyncPlaylist(
+        arrive={0: 0.2},
+        respond={100: 0.4, 200: 0.4, 300: 0.4},
+    )
+    uris = [f"spotify:track:{i}" for i in range(600)]
+    assert asyncio.run(sr.upload_tracks_async(sp, "pl", uris)) == 6
+    assert sp.items == uris